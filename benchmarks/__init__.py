@@ -0,0 +1,4 @@
+"""
+Micro-benchmarks for the hot paths of firestore_odm, run offline with
+    the in-memory backend. See benchmarks/run.py.
+"""
@@ -0,0 +1,158 @@
+"""
+Benchmark cases. Each case is a setup function registered with
+    @benchmark, that returns the function to time (called with no
+    arguments, once per operation).
+"""
+from firestore_odm.cmp import v
+from firestore_odm.context import Context as CTX
+from firestore_odm.utils import snapshot_to_obj
+
+from . import models
+
+# Name of each case to its setup function, in the order registered
+BENCHMARKS = dict()
+
+
+def benchmark(name):
+    """ Registers a setup function as the benchmark case name.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def _snapshot(obj):
+    """ Saves obj to the backend in Context, and returns the snapshot
+            read back.
+    """
+    obj.save()
+    return obj.doc_ref.get()
+
+
+def _snapshot_obj(obj):
+    """ Saves obj to the backend in Context, and returns the object
+            read back, which tracks changes.
+    """
+    return snapshot_to_obj(_snapshot(obj), super_cls=type(obj))
+
+
+@benchmark("export_flat")
+def export_flat():
+    obj = models.new_standard_city("SF")
+    return obj._export_as_dict
+
+
+@benchmark("export_embedded")
+def export_embedded():
+    obj = models.new_tourist_city("SF")
+    return obj._export_as_dict
+
+
+@benchmark("export_relationships")
+def export_relationships():
+    obj = models.new_region("west")
+    return obj._export_as_dict
+
+
+@benchmark("hydrate_flat")
+def hydrate_flat():
+    city_cls = models.get_model("BenchCity")
+    snapshot = _snapshot(models.new_standard_city("SF"))
+    return lambda: snapshot_to_obj(snapshot, super_cls=city_cls)
+
+
+@benchmark("hydrate_polymorphic")
+def hydrate_polymorphic():
+    city_cls = models.get_model("BenchCity")
+    snapshots = [_snapshot(models.new_standard_city("SF")),
+                 _snapshot(models.new_municipality("TOK"))]
+    state = {"i": 0}
+
+    def run():
+        state["i"] ^= 1
+        return snapshot_to_obj(snapshots[state["i"]], super_cls=city_cls)
+    return run
+
+
+@benchmark("hydrate_embedded")
+def hydrate_embedded():
+    city_cls = models.get_model("BenchCity")
+    snapshot = _snapshot(models.new_tourist_city("SF"))
+    return lambda: snapshot_to_obj(snapshot, super_cls=city_cls)
+
+
+@benchmark("hydrate_relationships")
+def hydrate_relationships():
+    region_cls = models.get_model("BenchRegion")
+    snapshot = _snapshot(models.new_region("west"))
+    return lambda: snapshot_to_obj(snapshot, super_cls=region_cls)
+
+
+@benchmark("new_flat")
+def new_flat():
+    return lambda: models.new_standard_city("SF")
+
+
+@benchmark("new_embedded")
+def new_embedded():
+    return lambda: models.new_tourist_city("SF")
+
+
+@benchmark("setattr_plain")
+def setattr_plain():
+    class Plain:
+        population = 0
+    obj = Plain()
+    return lambda: setattr(obj, "population", 870001)
+
+
+@benchmark("setattr_untracked")
+def setattr_untracked():
+    obj = models.new_standard_city("SF")
+    return lambda: setattr(obj, "population", 870001)
+
+
+@benchmark("setattr_tracked")
+def setattr_tracked():
+    obj = _snapshot_obj(models.new_standard_city("SF"))
+    return lambda: setattr(obj, "population", 870001)
+
+
+@benchmark("where_query")
+def where_query():
+    city_cls = models.get_model("BenchCity")
+    collection = city_cls._get_collection()
+    return lambda: city_cls._where_query(
+        v.country == "USA", v.population >= 100000,
+        cur_where=collection, capital=False)
+
+
+@benchmark("build_query")
+def build_query():
+    city_cls = models.get_model("BenchCity")
+    return lambda: city_cls._get_query(
+        v.country == "USA", capital=False, order_by="population",
+        descending=True, limit=10)
+
+
+@benchmark("get_memory")
+def get_memory():
+    city_cls = models.get_model("BenchCity")
+    models.new_standard_city("SF").save()
+    doc_ref = city_cls._doc_ref_from_id("SF")
+    return lambda: city_cls.get(doc_ref=doc_ref)
+
+
+@benchmark("save_memory")
+def save_memory():
+    obj = models.new_standard_city("SF")
+    return obj.save
+
+
+def setup_context():
+    """ Points Context to a new in-memory backend, so that cases run
+            offline and do not share documents.
+    """
+    from firestore_odm.memory import MemoryBackend
+    CTX.use_backend(MemoryBackend())
@@ -0,0 +1,134 @@
+"""
+Synthetic models for benchmarks, modeled on tests/city_fixtures.py:
+    flat (BenchCity), polymorphic (BenchStandardCity, BenchMunicipality),
+    nested with Embedded (BenchTouristCity) and Relationship-heavy
+    (BenchRegion). Read the models with get_model.
+"""
+from firestore_odm import fields
+from firestore_odm.model_registry import ModelRegistry
+from firestore_odm.primary_object import PrimaryObject
+from firestore_odm.schema import Schema
+from firestore_odm.serializable import Serializable
+
+
+class BenchCitySchema(Schema):
+    city_name = fields.Raw()
+
+    country = fields.Raw()
+    capital = fields.Raw()
+    population = fields.Integer()
+
+
+class BenchStandardCitySchema(BenchCitySchema):
+    city_state = fields.Raw()
+    regions = fields.Raw(many=True)
+
+
+class BenchMunicipalitySchema(BenchCitySchema):
+    pass
+
+
+class BenchLocationSchema(Schema):
+    latitude = fields.Raw()
+    longitude = fields.Raw()
+
+
+class BenchLandmarkSchema(Schema):
+    name = fields.Raw()
+    year = fields.Integer()
+    location = fields.Embedded()
+
+
+class BenchTouristCitySchema(BenchCitySchema):
+    location = fields.Embedded()
+    landmarks = fields.Embedded(many=True)
+
+
+class BenchRegionSchema(Schema):
+    region_name = fields.Raw()
+    capital_city = fields.Relationship(nested=False)
+    cities = fields.Relationship(nested=False, many=True)
+    neighbors = fields.Relationship(nested=False, many=True)
+
+
+def _declare_models():
+    """ Declares the models, unless they are already registered.
+    """
+    if ModelRegistry.get_cls_from_name("BenchCity") is None:
+        class BenchCity(PrimaryObject):
+            class Meta:
+                schema_cls = BenchCitySchema
+                collection_name = "BenchCity"
+
+        class BenchStandardCity(BenchCity):
+            class Meta:
+                schema_cls = BenchStandardCitySchema
+
+        class BenchMunicipality(BenchCity):
+            class Meta:
+                schema_cls = BenchMunicipalitySchema
+
+        class BenchLocation(Serializable):
+            class Meta:
+                schema_cls = BenchLocationSchema
+
+        class BenchLandmark(Serializable):
+            class Meta:
+                schema_cls = BenchLandmarkSchema
+
+        class BenchTouristCity(BenchCity):
+            class Meta:
+                schema_cls = BenchTouristCitySchema
+
+        class BenchRegion(PrimaryObject):
+            class Meta:
+                schema_cls = BenchRegionSchema
+                collection_name = "BenchRegion"
+
+
+def get_model(name):
+    """ Returns the model named name (eg. "BenchCity"). The models are
+            declared on the first call rather than on import, so that
+            importing the module does not register models.
+    """
+    _declare_models()
+    return ModelRegistry.get_cls_from_name(name)
+
+
+def new_standard_city(doc_id):
+    return get_model("BenchStandardCity").new(
+        doc_id=doc_id, city_name="San Francisco", country="USA",
+        capital=False, population=870000, city_state="CA",
+        regions=["west_coast", "norcal"])
+
+
+def new_municipality(doc_id):
+    return get_model("BenchMunicipality").new(
+        doc_id=doc_id, city_name="Tokyo", country="Japan", capital=True,
+        population=9000000)
+
+
+def new_tourist_city(doc_id, n_landmarks=10):
+    location_cls = get_model("BenchLocation")
+    location = location_cls.new(latitude=37.77, longitude=-122.42)
+    landmarks = [
+        get_model("BenchLandmark").new(
+            name="Landmark {}".format(i), year=1900 + i,
+            location=location_cls.new(latitude=37.8, longitude=-122.4))
+        for i in range(n_landmarks)
+    ]
+    return get_model("BenchTouristCity").new(
+        doc_id=doc_id, city_name="San Francisco", country="USA",
+        capital=False, population=870000, location=location,
+        landmarks=landmarks)
+
+
+def new_region(doc_id, n_cities=20):
+    region_cls = get_model("BenchRegion")
+    cities = [get_model("BenchCity")._doc_ref_from_id("city{}".format(i))
+              for i in range(n_cities)]
+    return region_cls.new(
+        doc_id=doc_id, region_name="West Coast", capital_city=cities[0],
+        cities=cities,
+        neighbors=[region_cls._doc_ref_from_id("region{}".format(i))
+                   for i in range(n_cities // 4)])
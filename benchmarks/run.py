@@ -0,0 +1,167 @@
+"""
+Runs the benchmark cases (see cases.py) and compares the results with
+    a baseline, eg.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --filter hydrate --min-time 1
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --check --tolerance 0.25
+
+For each case, reports operations per second (best of --repeat rounds)
+    and the peak memory allocated by one operation, as traced by
+    tracemalloc.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from .cases import BENCHMARKS, setup_context
+
+# Baseline results stored with the repo
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Result of a case. peak_bytes is the peak traced allocation of one
+#   operation
+Result = namedtuple("Result", ['name', 'ops_per_sec', 'peak_bytes'])
+
+
+def _calibrate(func, min_time) -> int:
+    """ Returns a number of calls of func that takes at least min_time
+            seconds.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return number
+        number *= 10 if elapsed < min_time / 10 else 2
+
+
+def _peak_bytes(func) -> int:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def run_case(name, min_time=0.2, repeat=5) -> Result:
+    """ Runs the case name, and returns its Result.
+
+    :param name: name of a case in BENCHMARKS
+    :param min_time: minimum seconds of each round
+    :param repeat: number of rounds
+    :return:
+    """
+    setup_context()
+    func = BENCHMARKS[name]()
+    func()
+
+    number = _calibrate(func, min_time / repeat)
+    best = None
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return Result(name=name, ops_per_sec=number / best,
+                  peak_bytes=_peak_bytes(func))
+
+
+def load_baseline(path=BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return dict()
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH) -> None:
+    baseline = {result.name: {"ops_per_sec": round(result.ops_per_sec, 1),
+                              "peak_bytes": result.peak_bytes}
+                for result in results}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(result, baseline, tolerance) -> tuple:
+    """ Returns (ratio, regressed) of the result to its baseline, where
+            ratio is None if the case has no baseline.
+    """
+    if result.name not in baseline:
+        return None, False
+    ratio = result.ops_per_sec / baseline[result.name]["ops_per_sec"]
+    return ratio, ratio < 1 - tolerance
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Micro-benchmarks of firestore_odm")
+    parser.add_argument("--filter", default=None,
+                        help="only run cases with names containing this")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimum seconds of timing per case")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="rounds per case; the best is reported")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="path of the baseline JSON")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown relative to the baseline that "
+                             "counts as a regression")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with status 1 if a case regressed")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS
+             if args.filter is None or args.filter in name]
+    baseline = load_baseline(args.baseline)
+
+    print("{:<24} {:>14} {:>12} {:>10}".format(
+        "case", "ops/sec", "peak KiB", "baseline"))
+    results, regressions = list(), list()
+    for name in names:
+        result = run_case(name, min_time=args.min_time, repeat=args.repeat)
+        results.append(result)
+        ratio, regressed = compare(result, baseline, args.tolerance)
+        if regressed:
+            regressions.append(name)
+        print("{:<24} {:>14,.0f} {:>12.1f} {:>10}{}".format(
+            name, result.ops_per_sec, result.peak_bytes / 1024,
+            "-" if ratio is None else "{:.2f}x".format(ratio),
+            "  REGRESSED" if regressed else ""))
+
+    if args.save_baseline:
+        save_baseline(results, path=args.baseline)
+        print("Saved baseline to {}".format(args.baseline))
+
+    if args.check and len(regressions) != 0:
+        print("Regressed: {}".format(", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
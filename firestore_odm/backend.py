@@ -0,0 +1,46 @@
+"""
+Backends create the Firestore clients that Context uses (Context.db and
+    Context.adb). See Backend.
+"""
+from google.cloud import firestore
+
+
+class Backend:
+    """
+    Creates the sync and async Firestore clients for a Config. Set
+        Config(backend=...) or call Context.use_backend to select one.
+        Defaults to FirestoreBackend.
+    """
+
+    # Whether Context.read initializes a firebase_admin app for the
+    #   backend
+    uses_firebase_app = False
+
+    def client(self, config):
+        """ Returns the client for Context.db, with the interface of
+                google.cloud.firestore.Client
+        """
+        raise NotImplementedError
+
+    def async_client(self, config):
+        """ Returns the client for Context.adb, with the interface of
+                google.cloud.firestore.AsyncClient
+        """
+        raise NotImplementedError
+
+
+class FirestoreBackend(Backend):
+    """
+    Connects to Firestore with the service account certificate of the
+        config (Config.FIREBASE_CERTIFICATE_JSON_PATH).
+    """
+
+    uses_firebase_app = True
+
+    def client(self, config):
+        return firestore.Client.from_service_account_json(
+            config.FIREBASE_CERTIFICATE_JSON_PATH)
+
+    def async_client(self, config):
+        return firestore.AsyncClient.from_service_account_json(
+            config.FIREBASE_CERTIFICATE_JSON_PATH)
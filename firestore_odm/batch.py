@@ -0,0 +1,189 @@
+"""
+Collects writes to documents so that they are committed together,
+    in WriteBatch'es or in a transaction.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from google.cloud.firestore import DocumentReference, Transaction
+
+from .context import Context as CTX
+
+# Maximum number of writes Firestore accepts in one commit
+MAX_WRITES_PER_BATCH = 500
+
+# Maximum estimated size of the writes in one commit. Firestore limits
+#   a request to 10 MiB; the rest is left for encoding overhead.
+MAX_BATCH_PAYLOAD_BYTES = 9 * 1024 * 1024
+
+# A write to a document. op is one of "set" (data is the document),
+#   "update" (data maps field paths to values) and "delete"
+Write = namedtuple(
+    "Write",
+    ['op', 'doc_ref', 'data'],
+    defaults=(None,)
+)
+
+
+def _add_write(writer, write: Write) -> None:
+    """ Adds a write to a WriteBatch or Transaction.
+
+    :param writer: WriteBatch or Transaction
+    :param write:
+    :return:
+    """
+    if write.op == "set":
+        writer.set(write.doc_ref, write.data)
+    elif write.op == "update":
+        writer.update(write.doc_ref, write.data)
+    elif write.op == "delete":
+        writer.delete(write.doc_ref)
+    else:
+        raise ValueError("Unknown write op: {}".format(write.op))
+
+
+def _estimate_value_size(val) -> int:
+    """ Returns the estimated size of a value in bytes, following the
+            storage size rules of Firestore.
+
+    :param val:
+    :return:
+    """
+    if isinstance(val, str):
+        return len(val.encode("utf-8")) + 1
+    elif isinstance(val, bool) or val is None:
+        return 1
+    elif isinstance(val, (int, float, datetime)):
+        return 8
+    elif isinstance(val, bytes):
+        return len(val)
+    elif isinstance(val, DocumentReference):
+        return len(val.path.encode("utf-8")) + 16
+    elif isinstance(val, dict):
+        return sum(len(str(key).encode("utf-8")) + 1
+                   + _estimate_value_size(elem)
+                   for key, elem in val.items())
+    elif isinstance(val, (list, tuple)):
+        return sum(_estimate_value_size(elem) for elem in val)
+    else:
+        return 16
+
+
+def estimate_write_size(write: Write) -> int:
+    """ Returns the estimated size of a write in bytes: the name of the
+            document and the data written.
+
+    :param write:
+    :return:
+    """
+    doc_ref = write.doc_ref
+    path = doc_ref.path if isinstance(doc_ref, DocumentReference) \
+        else str(doc_ref)
+    size = len(path.encode("utf-8")) + 16 + 32
+    if write.data is not None:
+        size += _estimate_value_size(write.data)
+    return size
+
+
+def chunk_writes(writes) -> list:
+    """ Splits writes into chunks for WriteBatch'es, each with up to
+            MAX_WRITES_PER_BATCH writes and MAX_BATCH_PAYLOAD_BYTES
+            of estimated size (a write larger than that is put in a
+            chunk of its own).
+
+    :param writes: a list of Write
+    :return: a list of lists of indices into writes
+    """
+    chunks = list()
+    cur, cur_size = list(), 0
+    for i, write in enumerate(writes):
+        size = estimate_write_size(write)
+        if len(cur) != 0 and (len(cur) == MAX_WRITES_PER_BATCH
+                              or cur_size + size > MAX_BATCH_PAYLOAD_BYTES):
+            chunks.append(cur)
+            cur, cur_size = list(), 0
+        cur.append(i)
+        cur_size += size
+    if len(cur) != 0:
+        chunks.append(cur)
+    return chunks
+
+
+def _commit_chunk(writes, chunk) -> None:
+    batch = CTX.db.batch()
+    for i in chunk:
+        _add_write(batch, writes[i])
+    batch.commit()
+
+
+def bulk_commit(writes, max_workers=None) -> list:
+    """ Commits writes in WriteBatch'es (see chunk_writes). A failed
+            commit does not stop other commits.
+
+    :param writes: a list of Write
+    :param max_workers: If set to a number greater than 1, up to
+                max_workers commits run concurrently in threads.
+    :return: a list of (index, exception) for each write that failed,
+                where index is the position of the write in writes
+    """
+    chunks = chunk_writes(writes)
+
+    def commit(chunk):
+        try:
+            _commit_chunk(writes, chunk)
+        except Exception as e:
+            return [(i, e) for i in chunk]
+        return []
+
+    if max_workers is not None and max_workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(commit, chunks))
+    else:
+        results = [commit(chunk) for chunk in chunks]
+
+    return [failure for result in results for failure in result]
+
+
+def commit_writes(writes, transaction: Transaction = None) -> None:
+    """ Commits writes in WriteBatch'es (see chunk_writes). Note that
+            each batch is atomic on its own, but the writes are not
+            atomic across batches.
+        If transaction is set, the writes are added to the transaction
+            instead, and committed when the transaction is committed.
+
+    :param writes: an iterable of Write
+    :param transaction: firestore transaction
+    :return:
+    """
+    writes = list(writes)
+
+    if transaction is not None:
+        for write in writes:
+            _add_write(transaction, write)
+        return
+
+    for chunk in chunk_writes(writes):
+        _commit_chunk(writes, chunk)
+
+
+async def acommit_writes(writes, transaction=None) -> None:
+    """ Commits writes with the async client (CTX.adb). See
+            commit_writes.
+
+    :param writes: an iterable of Write
+    :param transaction: async firestore transaction
+    :return:
+    """
+    writes = list(writes)
+
+    if transaction is not None:
+        for write in writes:
+            _add_write(transaction, write)
+        return
+
+    for chunk in chunk_writes(writes):
+        batch = CTX.adb.batch()
+        for i in chunk:
+            _add_write(batch, writes[i])
+        await batch.commit()
@@ -0,0 +1,121 @@
+"""
+In-process cache of documents read or written by models, keyed by
+    document path. See DocumentCache.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by DocumentCache.get when a path is not cached
+NOT_CACHED = object()
+
+
+def copy_data(val):
+    """ Returns a copy of document data where dictionaries and lists
+            are copied, so that the copy can be modified without
+            modifying val. Other values are immutable or shared
+            (eg. DocumentReference).
+
+    :param val:
+    :return:
+    """
+    if isinstance(val, dict):
+        return {key: copy_data(elem) for key, elem in val.items()}
+    elif isinstance(val, list):
+        return [copy_data(elem) for elem in val]
+    else:
+        return val
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU cache of document data (dictionaries in the format
+        stored in Firestore) with expiry. Missing documents are cached
+        as None (negative caching).
+
+    Enable for a model with Meta.cache (or the "_cache" class
+        attribute), eg.
+
+        class City(PrimaryObject):
+            class Meta:
+                cache = DocumentCache(max_size=1000, ttl=300)
+
+    get and get_many read through the cache outside of transactions,
+        and saves and deletes made in this process write through to
+        the cache.
+    """
+
+    def __init__(self, max_size=1024, ttl=60.0, negative_ttl=None,
+                 clock=time.monotonic):
+        """
+
+        :param max_size: maximum number of documents cached; the least
+                    recently used document is evicted first
+        :param ttl: seconds a document stays in the cache
+        :param negative_ttl: seconds a missing document stays in the
+                    cache (defaults to ttl)
+        :param clock: function that returns the current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """ Returns a copy of the data of the document at path, None if
+                the document is cached as missing, or NOT_CACHED.
+
+        :param path: document path, eg. "City/SF"
+        :return:
+        """
+        with self._lock:
+            entry = self._entries.get(path, None)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[path]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return NOT_CACHED
+            self._entries.move_to_end(path)
+            self.hits += 1
+            d = entry[1]
+        return copy_data(d)
+
+    def set(self, path, d) -> None:
+        """ Caches a copy of the data of the document at path.
+
+        :param path: document path
+        :param d: document data, or None if the document does not exist
+        :return:
+        """
+        ttl = self.ttl if d is not None else self.negative_ttl
+        d = copy_data(d)
+        with self._lock:
+            self._entries[path] = (self.clock() + ttl, d)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set_missing(self, path) -> None:
+        """ Caches the document at path as missing.
+        """
+        self.set(path, None)
+
+    def invalidate(self, path) -> None:
+        """ Removes the document at path from the cache.
+        """
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def clear(self) -> None:
+        """ Removes every document from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
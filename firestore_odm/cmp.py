@@ -9,6 +9,16 @@ class CMP:
     def __getattr__(self, item):
         return Condition(fieldname=item)
 
+    def any(self, *branches):
+        """
+        Returns a Disjunction of the branches: v.any(cond1, cond2, ...)
+        Note that a field named "any" cannot be compared with v.any.
+
+        :param branches: See Disjunction
+        :return:
+        """
+        return Disjunction(*branches)
+
 
 class Condition:
     """
@@ -43,6 +53,29 @@ class Condition:
     def __ne__(self, other):
         raise ValueError("Not equal is not supported for Firestore")
 
+    def is_in(self, values):
+        """
+        Maps to "in": the field equals one of the values. Lists longer
+        than Firestore accepts in one query are split into sub-queries
+        (see fanout).
+
+        :param values:
+        :return:
+        """
+        self.constraints.append(("in", values))
+        return self
+
+    def has_any(self, values):
+        """
+        Maps to "array_contains_any": the array field contains one of
+        the values. Long lists are split as in is_in.
+
+        :param values:
+        :return:
+        """
+        self.constraints.append(("array_contains_any", values))
+        return self
+
     def has(self, item):
         """
         Maps to array membership "in"
@@ -55,4 +88,34 @@ class Condition:
         return self
 
 
+class Disjunction:
+    """
+    Matches documents that match any of the branches. Each branch is a
+        Condition, or a list of Conditions that all hold.
+    Firestore runs one sub-query for each branch, and the results are
+        unioned (see fanout).
+    """
+
+    def __init__(self, *branches):
+        if len(branches) == 0:
+            raise ValueError("Disjunction needs at least one branch")
+        self.branches = [
+            list(branch) if isinstance(branch, (list, tuple)) else [branch]
+            for branch in branches
+        ]
+
+
+class Param:
+    """
+    Placeholder for a value that is bound when a prepared query is run.
+    See QueryMixin.prepare for usage
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "Param({!r})".format(self.name)
+
+
 v = CMP()
@@ -3,6 +3,8 @@ from .context import Context as CTX
 
 class CollectionMixin:
 
+    __slots__ = ()
+
     # _collection_name = None
 
     @classmethod
@@ -40,3 +42,11 @@ class CollectionMixin:
     def _get_collection(cls):
         return CTX.db.collection(cls._get_collection_name())
 
+
+    @classmethod
+    def _get_async_collection(cls):
+        """ Returns the collection of the class with the async client
+
+        :return:
+        """
+        return CTX.adb.collection(cls._get_collection_name())
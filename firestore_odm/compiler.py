@@ -0,0 +1,474 @@
+"""
+Compiles a model's Schema into plans that are computed once per class
+    and reused for every instance of the class.
+
+Serializing through marshmallow "schema_obj.dump" and then walking
+    every value again with "_export_val" resolves the shape of each
+    value with a chain of isinstance checks. The plans below resolve
+    the shape from the field declared in the schema instead, so that
+    only the values a field can actually hold are inspected.
+
+Loading is compiled in the same way: each Firestore key is mapped to
+    the attribute it is loaded into, and Relationship and Embedded
+    values are resolved from the field rather than by recursion.
+"""
+from types import MemberDescriptorType
+
+from marshmallow import fields as mfields, missing, Schema as MSchema, \
+    EXCLUDE, ValidationError
+from marshmallow.decorators import PRE_DUMP, POST_DUMP, PRE_LOAD, \
+    POST_LOAD, VALIDATES, VALIDATES_SCHEMA
+
+from . import fields
+from .model_registry import ModelRegistry
+from .utils import obj_type_serialize
+
+# Values of these types are exported and imported as they are
+_PRIMITIVE_TYPES = frozenset({str, int, float, bool, type(None)})
+
+# Marshmallow fields that always serialize to a primitive value
+_PRIMITIVE_FIELDS = (
+    mfields.String,
+    mfields.Number,
+    mfields.Boolean,
+    mfields.DateTime,
+    mfields.TimeDelta,
+)
+
+
+def _has_hooks(schema_obj, *tags):
+    """ Returns True if the schema declares any processor with one
+            of the tags (eg. "pre_dump").
+
+    :param schema_obj: instantiated marshmallow Schema
+    :param tags: processor tags from marshmallow.decorators
+    :return:
+    """
+    for key, hooks in schema_obj._hooks.items():
+        # Keys are (tag, pass_many) tuples in earlier marshmallow 3
+        tag = key[0] if isinstance(key, tuple) else key
+        if tag in tags and len(hooks) != 0:
+            return True
+    return False
+
+
+def _value_getter(schema_obj, attr_name, field):
+    """ Returns a function that reads the unserialized value of a field
+            from an object, or marshmallow.missing if it is absent.
+
+    :param schema_obj:
+    :param attr_name: name of the field in the schema
+    :param field:
+    :return:
+    """
+    attribute = field.attribute if field.attribute is not None else attr_name
+
+    is_default_accessor = \
+        type(schema_obj).get_attribute is MSchema.get_attribute
+
+    if is_default_accessor and "." not in attribute \
+            and field.dump_default is missing:
+        def get(obj):
+            return getattr(obj, attribute, missing)
+    else:
+        def get(obj):
+            value = field.get_value(
+                obj, attr_name, accessor=schema_obj.get_attribute)
+            if value is missing:
+                default = field.dump_default
+                value = default() if callable(default) else default
+            return value
+
+    return get
+
+
+def _compile_export_step(schema_obj, attr_name, field):
+    """ Returns a function that exports the value of one field of an
+            object, or marshmallow.missing if the field is to be skipped.
+
+    :param schema_obj:
+    :param attr_name: name of the field in the schema
+    :param field:
+    :return:
+    """
+    accessor = schema_obj.get_attribute
+
+    if isinstance(field, fields.Relationship):
+        # Relationships are resolved by FirestoreObjectValMixin
+        def export(obj, to_save):
+            val = field.serialize(attr_name, obj, accessor=accessor)
+            if val is missing:
+                return val
+            return obj._export_val(val, to_save=to_save)
+
+    elif isinstance(field, fields.Embedded):
+        get = _value_getter(schema_obj, attr_name, field)
+        many = field.many
+
+        def export(obj, to_save):
+            val = get(obj)
+            if val is missing or val is None and not many:
+                return val
+            # Embedded objects are exported without saving
+            export_elem = obj._export_val
+            if not many:
+                return export_elem(val)
+            elif isinstance(val, list):
+                return [export_elem(elem) for elem in val]
+            elif isinstance(val, dict):
+                return {key: export_elem(elem) for key, elem in val.items()}
+            else:
+                raise NotImplementedError
+
+    elif isinstance(field, mfields.Function) \
+            and field.serialize_func is obj_type_serialize:
+        def export(obj, to_save):
+            return obj.__class__.__name__
+
+    elif isinstance(field, _PRIMITIVE_FIELDS):
+        def export(obj, to_save):
+            return field.serialize(attr_name, obj, accessor=accessor)
+
+    else:
+        if type(field)._serialize is mfields.Raw._serialize:
+            get = _value_getter(schema_obj, attr_name, field)
+        else:
+            def get(obj):
+                return field.serialize(attr_name, obj, accessor=accessor)
+
+        def export(obj, to_save):
+            val = get(obj)
+            if val is missing or type(val) in _PRIMITIVE_TYPES:
+                return val
+            return obj._export_val(val, to_save=to_save)
+
+    return export
+
+
+class ExportPlan:
+    """ Precomputed routine for exporting an object to a dictionary.
+            Produces the same result as dumping the object with
+            the schema and walking every value with "_export_val".
+
+    Attributes:
+    ============
+    steps: list
+        A list of (attribute, data_key, export) for each field to dump.
+        None if the schema declares dump processors, in which case
+            the plan falls back to the schema.
+    embedded: dict
+        Maps attributes of Embedded fields to the "many" option of
+            the field.
+    nested_relationships: tuple
+        Attributes of Relationship fields declared with nested=True.
+    data_keys: dict
+        Maps the attribute of each field to dump to its Firestore key.
+    """
+
+    def __init__(self, schema_obj):
+        self.schema_obj = schema_obj
+        self.embedded = {
+            field.attribute or attr_name: field.many
+            for attr_name, field in schema_obj.dump_fields.items()
+            if isinstance(field, fields.Embedded)
+        }
+        self.nested_relationships = tuple(
+            field.attribute or attr_name
+            for attr_name, field in schema_obj.dump_fields.items()
+            if isinstance(field, fields.Relationship) and field.nested
+        )
+        self.data_keys = {
+            field.attribute or attr_name:
+                field.data_key if field.data_key is not None else attr_name
+            for attr_name, field in schema_obj.dump_fields.items()
+        }
+        if _has_hooks(schema_obj, PRE_DUMP, POST_DUMP):
+            self.steps = None
+        else:
+            self.steps = [
+                (
+                    field.attribute or attr_name,
+                    field.data_key if field.data_key is not None
+                    else attr_name,
+                    _compile_export_step(schema_obj, attr_name, field)
+                )
+                for attr_name, field in schema_obj.dump_fields.items()
+            ]
+
+    def __call__(self, obj, to_save=False) -> dict:
+        if self.steps is None:
+            d = self.schema_obj.dump(obj)
+            return {key: obj._export_val(val, to_save=to_save)
+                    for key, val in d.items()}
+
+        res = dict()
+        for _, data_key, export in self.steps:
+            val = export(obj, to_save)
+            if val is not missing:
+                res[data_key] = val
+        return res
+
+    def export_changes(self, obj, to_save=False) -> dict:
+        """ Exports the fields of an object assigned since the object
+                started tracking changes (see ChangeTrackingMixin), and
+                the fields changed in objects embedded in it.
+            Exports all fields if the object is not tracking changes.
+
+        :param obj:
+        :param to_save: passed to "_export_val"
+        :return: a dictionary from paths (tuples of keys) to the
+                    exported values
+        """
+        changed = getattr(obj, "_changed_fields", None)
+        if changed is None or self.steps is None:
+            return {(key,): val for key, val in self(obj, to_save).items()}
+
+        res = dict()
+        for attribute, data_key, export in self.steps:
+            if attribute in changed:
+                val = export(obj, to_save)
+                if val is not missing:
+                    res[(data_key,)] = val
+            elif attribute in self.embedded:
+                val = getattr(obj, attribute, None)
+                if isinstance(val, list):
+                    # Elements of an array cannot be updated alone
+                    if any(_get_changes(elem) != dict() for elem in val):
+                        res[(data_key,)] = export(obj, to_save)
+                    continue
+                elif isinstance(val, dict) and self.embedded[attribute]:
+                    items = [((data_key, key), elem)
+                             for key, elem in val.items()]
+                elif val is not None:
+                    items = [((data_key,), val)]
+                else:
+                    items = []
+
+                for prefix, elem in items:
+                    changes = _get_changes(elem)
+                    if changes is None:
+                        res[prefix] = obj._export_val(elem)
+                    else:
+                        for path, elem_val in changes.items():
+                            res[prefix + path] = elem_val
+        return res
+
+
+def _get_changes(obj):
+    """ Returns changes exported from an embedded object, or None if
+            the object is not tracking changes.
+
+    :param obj:
+    :return:
+    """
+    if getattr(obj, "_changed_fields", None) is None:
+        return None
+    return obj._export_changes()
+
+
+def _import_embedded(d):
+    """ Instantiates an embedded object from the dictionary stored
+            in the master document.
+
+    :param d: dictionary with "obj_type"
+    :return:
+    """
+    obj_cls = ModelRegistry.get_cls_from_name(d["obj_type"])
+    data = {key: val for key, val in d.items() if key != "obj_type"}
+    obj = obj_cls()
+    obj._import_properties(data)
+    return obj
+
+
+def _compile_import_step(data_key, field):
+    """ Returns a function that imports the value stored under the
+            data_key of a document into the value to set on an object.
+            Raises ValidationError when the value is rejected by the
+            field.
+
+    :param data_key: key of the field in the document
+    :param field:
+    :return:
+    """
+
+    if isinstance(field, fields.Relationship):
+        # Relationships are resolved by FirestoreObjectValMixin
+        def load(obj, raw, d, to_get):
+            val = field.deserialize(raw, data_key, d)
+            return obj._import_val(val, to_get=to_get)
+
+    elif isinstance(field, fields.Embedded) and not field.validators:
+        many = field.many
+
+        def load(obj, raw, d, to_get):
+            if raw is None:
+                return field.deserialize(raw, data_key, d)
+            if not many:
+                return _import_embedded(raw)
+            elif isinstance(raw, list):
+                return [_import_embedded(elem) for elem in raw]
+            elif isinstance(raw, dict):
+                return {key: _import_embedded(elem)
+                        for key, elem in raw.items()}
+            else:
+                raise NotImplementedError
+
+    elif isinstance(field, _PRIMITIVE_FIELDS):
+        def load(obj, raw, d, to_get):
+            return field.deserialize(raw, data_key, d)
+
+    elif type(field)._deserialize is mfields.Raw._deserialize \
+            and not field.validators:
+        def load(obj, raw, d, to_get):
+            if raw is None:
+                return field.deserialize(raw, data_key, d)
+            if type(raw) in _PRIMITIVE_TYPES:
+                return raw
+            return obj._import_val(raw, to_get=to_get)
+
+    else:
+        def load(obj, raw, d, to_get):
+            val = field.deserialize(raw, data_key, d)
+            if type(val) in _PRIMITIVE_TYPES:
+                return val
+            return obj._import_val(val, to_get=to_get)
+
+    return load
+
+
+class ImportPlan:
+    """ Precomputed routine for importing a document into an object.
+            Sets the same attributes to the same values as loading
+            the document with the schema and importing every value
+            with "_import_val".
+
+    When a value is rejected by a field, the document is loaded again
+        through the schema, so that the error raised is the same.
+
+    Attributes:
+    ============
+    steps: list
+        A list of (data_key, attr_name, field, load) for each field
+            to load.
+        None if the schema cannot be compiled, in which case
+            the plan falls back to the schema.
+    """
+
+    def __init__(self, schema_obj):
+        self.schema_obj = schema_obj
+        if self._is_compilable(schema_obj):
+            self.steps = list()
+            for attr_name, field in schema_obj.load_fields.items():
+                data_key = field.data_key if field.data_key is not None \
+                    else attr_name
+                self.steps.append((
+                    data_key,
+                    field.attribute or attr_name,
+                    field,
+                    _compile_import_step(data_key, field)
+                ))
+        else:
+            self.steps = None
+
+    @staticmethod
+    def _is_compilable(schema_obj):
+        if _has_hooks(schema_obj,
+                      PRE_LOAD, POST_LOAD, VALIDATES, VALIDATES_SCHEMA):
+            return False
+        if schema_obj.unknown != EXCLUDE or schema_obj.partial:
+            return False
+        # Dotted attributes are loaded as nested dictionaries
+        return not any(
+            "." in (field.attribute or attr_name)
+            for attr_name, field in schema_obj.load_fields.items()
+        )
+
+    def _load(self, obj, d, to_get):
+        res = list()
+        for data_key, attr_name, field, load in self.steps:
+            raw = d.get(data_key, missing)
+            if raw is not missing:
+                val = load(obj, raw, d, to_get)
+            elif field.required or field.load_default is not missing:
+                # Reads load_default or raises for a required field
+                val = field.deserialize(missing, data_key, d)
+                if type(val) not in _PRIMITIVE_TYPES:
+                    val = obj._import_val(val, to_get=to_get)
+            else:
+                continue
+            res.append((attr_name, val))
+        return res
+
+    def __call__(self, obj, d, to_get=False, set_attr=setattr) -> None:
+        values = None
+        if self.steps is not None:
+            try:
+                values = self._load(obj, d, to_get)
+            except ValidationError:
+                # Loads with the schema to raise the same error
+                values = None
+
+        if values is None:
+            loaded = self.schema_obj.load(d)
+            values = [(key, obj._import_val(val, to_get=to_get))
+                      for key, val in loaded.items()]
+
+        for attr_name, val in values:
+            set_attr(obj, attr_name, val)
+
+
+class ConstructionPlan:
+    """ Precomputed routine for initializing instance variables of a
+            new object to the values provided or to the default
+            values read from the fields of the schema.
+
+    Attributes:
+    ============
+    field_keys: frozenset
+        Names of the fields to initialize (fields that are not
+            dump_only).
+    defaults: list
+        A list of (key, field, value) for each field to initialize.
+            value is the default value of the field if it is
+            immutable, or marshmallow.missing if the default value
+            has to be read from the field for each object
+            (eg. a new list).
+    class_attrs: frozenset
+        Attributes of the class, which are not overwritten by
+            instance variables (eg. properties).
+    slot_attrs: frozenset
+        Instance variables declared as __slots__ in the class.
+    """
+
+    def __init__(self, obj_cls):
+        self.defaults = list()
+        for key, field in obj_cls._get_fields().items():
+            if field.dump_only:
+                continue
+            value = field.default_value
+            if type(value) not in _PRIMITIVE_TYPES:
+                value = missing
+            self.defaults.append((key, field, value))
+        self.field_keys = frozenset(key for key, _, _ in self.defaults)
+        self.class_attrs = frozenset(
+            name for name in dir(obj_cls)
+            if not isinstance(getattr(obj_cls, name, None),
+                              MemberDescriptorType)
+        )
+        self.slot_attrs = frozenset(dir(obj_cls)) - self.class_attrs
+
+    def get_values(self, kwargs) -> dict:
+        """ Returns the values to initialize the fields to.
+
+        :param kwargs: values provided
+        :return:
+        """
+        d = dict()
+        for key, field, value in self.defaults:
+            if key in kwargs:
+                d[key] = kwargs[key]
+            elif value is missing:
+                d[key] = field.default_value
+            else:
+                d[key] = value
+        return d
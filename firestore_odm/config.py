@@ -32,16 +32,21 @@ class Config:
     TESTING: bool = None
     FIREBASE_CERTIFICATE_JSON_PATH: str = None
     APP_NAME: str = None
+    # Backend that creates the Firestore clients (None for Firestore)
+    BACKEND = None
 
     def __new__(cls, certificate_filename=None, certificate_path=None,
                 testing=False, debug=False,
-                app_name=None, *args, **kwargs):
+                app_name=None, backend=None, *args, **kwargs):
         if certificate_path is not None:
             cls.FIREBASE_CERTIFICATE_JSON_PATH = certificate_path
-        else:
+        elif certificate_filename is not None:
             cls.FIREBASE_CERTIFICATE_JSON_PATH = os.path.join(
                 config_jsons_path, certificate_filename)
+        else:
+            cls.FIREBASE_CERTIFICATE_JSON_PATH = None
         cls.TESTING = testing
         cls.DEBUG = debug
         cls.APP_NAME = app_name
+        cls.BACKEND = backend
         return cls
@@ -17,14 +17,20 @@ from firebase_admin import credentials
 from google.cloud import firestore
 from celery import Celery
 
+from .backend import Backend, FirestoreBackend
 from .config import Config
 
 
 class Context:
     firebase_app: firebase_admin.App = None
     db: firestore.Client = None
+    adb: firestore.AsyncClient = None
     config: Config = None
     celery_app: Celery = None
+    backend: Backend = None
+    # Functions called with an instrumentation.Event after each model
+    #   operation (see add_hook)
+    hooks: tuple = ()
 
     # debug = None
     # testing = None
@@ -57,11 +63,49 @@ class Context:
         cls.config = config
         cls._reload_debug_flag(cls.config.DEBUG)
         cls._reload_testing_flag(cls.config.TESTING)
-        cls._reload_firebase_app(cls.config.FIREBASE_CERTIFICATE_JSON_PATH)
-        cls._reload_firestore_client(cls.config.FIREBASE_CERTIFICATE_JSON_PATH)
+        cls.backend = cls.config.BACKEND or FirestoreBackend()
+        if cls.backend.uses_firebase_app:
+            cls._reload_firebase_app(cls.config.FIREBASE_CERTIFICATE_JSON_PATH)
+        cls._reload_firestore_client()
         cls._reload_celery_app()
         return cls
 
+    @classmethod
+    def use_backend(cls, backend: Backend, config=None):
+        """ Replaces the Firestore clients with the clients of backend,
+                eg. Context.use_backend(MemoryBackend()) in tests.
+
+        :param backend: Backend
+        :param config: Config passed to the backend (defaults to the
+                    config read last)
+        :return:
+        """
+        if config is not None:
+            cls.config = config
+        cls.backend = backend
+        cls._reload_firestore_client()
+        return cls
+
+    @classmethod
+    def add_hook(cls, hook):
+        """ Registers a function to be called with an
+                instrumentation.Event after each model operation (get,
+                save, delete, queries, hydration and export), eg.
+                instrumentation.Aggregator(). Operations are only timed
+                while a hook is registered.
+
+        :param hook: function of an Event
+        :return:
+        """
+        cls.hooks = cls.hooks + (hook,)
+        return hook
+
+    @classmethod
+    def remove_hook(cls, hook):
+        """ Unregisters a function registered with add_hook.
+        """
+        cls.hooks = tuple(h for h in cls.hooks if h is not hook)
+
     @classmethod
     def _reload_celery_app(cls):
         cls.celery_app = Celery('tasks', broker='pyamqp://guest@localhost//')
@@ -94,9 +138,13 @@ class Context:
             logging.exception('Error initializing firebase_app')
 
     @classmethod
-    def _reload_firestore_client(cls, cred_path):
+    def _reload_firestore_client(cls):
         try:
             # co = ClientOptions(api_endpoint="firestore.googleapis.com")
-            cls.db = firestore.Client.from_service_account_json(cred_path)
+            cls.db = cls.backend.client(cls.config)
         except ValueError as e:
             logging.exception('Error initializing firestore client from cls.firebase_app')
+        try:
+            cls.adb = cls.backend.async_client(cls.config)
+        except ValueError as e:
+            logging.exception('Error initializing async firestore client')
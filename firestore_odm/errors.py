@@ -10,3 +10,18 @@ class PropertyEvalError(OdmError):
             of a model.
     """
     pass
+
+
+class BulkWriteError(OdmError):
+    """ An error generated when some of the writes in a bulk operation
+            (eg. save_many) fail. Other writes may have been committed.
+
+    Attributes:
+    ============
+    failures: list
+        A list of (item, exception) for each item whose write failed.
+    """
+
+    def __init__(self, failures):
+        super().__init__("{} writes failed".format(len(failures)))
+        self.failures = failures
@@ -0,0 +1,203 @@
+"""
+Runs queries with "in" or "array_contains_any" filters over more values
+    than Firestore accepts in one query, by splitting the values into
+    sub-queries that run concurrently and merging their results.
+    Disjunctions (cmp.Disjunction) run in the same way, with one
+    sub-query for each branch.
+"""
+import asyncio
+import heapq
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+# Maximum number of values Firestore accepts in an "in" or
+#   "array_contains_any" filter
+IN_QUERY_LIMIT = 30
+
+# Maximum number of sub-queries that run concurrently
+FANOUT_MAX_WORKERS = 8
+
+# Operators whose values are split into sub-queries
+FANOUT_OPS = frozenset({"in", "array_contains_any"})
+
+# Operators of filters that Firestore orders results by when a query
+#   has no order_by
+INEQUALITY_OPS = frozenset({"<", "<=", ">", ">=", "!=", "not-in"})
+
+# Marks the end of the results of a sub-query in a queue
+_DONE = object()
+
+# Carries an exception raised by a sub-query to the consumer
+_Failure = namedtuple("_Failure", ["exception"])
+
+
+def _is_oversized(f) -> bool:
+    _, op_string, value = f
+    return op_string in FANOUT_OPS and isinstance(value, (list, tuple)) \
+        and len(value) > IN_QUERY_LIMIT
+
+
+def split_filters(filters) -> list:
+    """ Splits filters with more values than IN_QUERY_LIMIT into sets
+            of filters for sub-queries, each with up to IN_QUERY_LIMIT
+            values in each "in" or "array_contains_any" filter.
+
+    :param filters: a list of (field_path, op_string, value)
+    :return: a list of lists of filters (one list if no filter needs
+                to be split)
+    """
+    choices = list()
+    for f in filters:
+        if _is_oversized(f):
+            field_path, op_string, value = f
+            value = list(value)
+            choices.append([
+                (field_path, op_string, value[i:i + IN_QUERY_LIMIT])
+                for i in range(0, len(value), IN_QUERY_LIMIT)
+            ])
+        else:
+            choices.append([f])
+    return [list(filter_set) for filter_set in product(*choices)]
+
+
+def implicit_order(filters) -> list:
+    """ Returns the field paths that Firestore orders the results of a
+            query with filters and no order_by by (before the document
+            path): the field of the first inequality filter, if any.
+    """
+    for field_path, op_string, _ in filters:
+        if op_string in INEQUALITY_OPS:
+            return [field_path]
+    return []
+
+
+def _order_key(order_by):
+    """ Returns a function that returns the sort key of a snapshot:
+            the values of the order_by fields, then the document path,
+            which Firestore uses to order documents with equal values.
+    """
+
+    def get(snapshot, field_path):
+        try:
+            return snapshot.get(field_path)
+        except KeyError:
+            return None
+
+    def key(snapshot):
+        return tuple(get(snapshot, field_path) for field_path in order_by) \
+            + (snapshot.reference.path,)
+
+    return key
+
+
+class FanoutQuery:
+    """
+    A query made of sub-queries, over chunks of the values of an "in"
+        filter or branches of a disjunction. Results are deduplicated
+        by document path and merged in the order of the sub-queries
+        with a k-way merge: by order_by, then by document path. offset
+        and limit are applied to the merged results.
+    """
+
+    def __init__(self, queries, order_by=None, descending=False,
+                 offset=None, limit=None):
+        """
+
+        :param queries: sub-queries (Query or AsyncQuery), each with
+                    limit set to offset + limit if limit is set
+        :param order_by: Firestore field paths the sub-queries are
+                    ordered by, before the document path. None (or
+                    an empty list) for sub-queries ordered by
+                    document path only
+        :param descending:
+        :param offset:
+        :param limit:
+        """
+        self.queries = queries
+        self.order_by = order_by or list()
+        self.descending = descending
+        self.offset = offset
+        self.limit = limit
+
+    def _merge(self, results):
+        """ Generator for snapshots merged from the results of the
+                sub-queries (iterables of snapshots). Results are
+                consumed lazily, so that merging stops reading once
+                limit is reached.
+        """
+        merged = heapq.merge(*results, key=_order_key(self.order_by),
+                             reverse=self.descending)
+
+        skip = self.offset or 0
+        count = 0
+        seen = set()
+        for snapshot in merged:
+            path = snapshot.reference.path
+            if path in seen:
+                continue
+            seen.add(path)
+            if skip > 0:
+                skip -= 1
+                continue
+            if self.limit is not None and count >= self.limit:
+                return
+            count += 1
+            yield snapshot
+
+    def stream(self):
+        """ Generator for the merged snapshots of sub-queries streamed
+                concurrently on a thread pool of up to
+                FANOUT_MAX_WORKERS threads.
+        """
+        stop = threading.Event()
+        n = len(self.queries)
+        queues = [queue.Queue() for _ in range(n)]
+
+        def produce(query, q):
+            try:
+                for snapshot in query.stream():
+                    if stop.is_set():
+                        break
+                    q.put(snapshot)
+            except Exception as e:
+                q.put(_Failure(e))
+            finally:
+                q.put(_DONE)
+
+        def consume(q):
+            while True:
+                item = q.get()
+                if item is _DONE:
+                    return
+                elif isinstance(item, _Failure):
+                    raise item.exception
+                else:
+                    yield item
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(n, FANOUT_MAX_WORKERS))
+        try:
+            for query, q in zip(self.queries, queues):
+                executor.submit(produce, query, q)
+            results = [consume(q) for q in queues]
+            yield from self._merge(results)
+        finally:
+            # Sub-queries still running stop at their next result
+            stop.set()
+            executor.shutdown(wait=False)
+
+    async def astream(self):
+        """ Async generator for the merged snapshots of sub-queries run
+                concurrently with the async client.
+        """
+
+        async def collect(query):
+            return [snapshot async for snapshot in query.stream()]
+
+        results = await asyncio.gather(
+            *(collect(query) for query in self.queries))
+        for snapshot in self._merge(results):
+            yield snapshot
@@ -1,14 +1,36 @@
+import contextvars
 import warnings
 
 from google.cloud.firestore import DocumentReference
 from google.cloud.firestore import Transaction
+from google.cloud.firestore_v1.field_path import FieldPath
 
 from firestore_odm.helpers import RelationshipReference
+from . import fields
+from .batch import Write, commit_writes, bulk_commit, acommit_writes
+from .errors import BulkWriteError
+from .context import Context as CTX
 # from flask_boiler.view_model import ViewModel
 from .collection_mixin import CollectionMixin
 from .serializable import Serializable
 from .factory import ClsFactory
-from firestore_odm.utils import snapshot_to_obj
+from firestore_odm.utils import snapshot_to_obj, to_sync_snapshot, \
+    dict_to_obj
+from .cache import NOT_CACHED
+from .session import current_session
+from .unit_of_work import current_unit_of_work
+from .instrumentation import instrument, record_data, record_writes, \
+    record_deletes
+
+
+# Maximum number of documents requested in one multi-get RPC
+GET_MANY_CHUNK_SIZE = 300
+
+# Data of the documents referenced by nested relationships of the
+#   document being imported with to_get, read with one multi-get.
+#   Maps document paths to document data (None for a missing document)
+_nested_data = contextvars.ContextVar("firestore_odm_nested_data",
+                                      default=None)
 
 
 class FirestoreObjectClsFactory(ClsFactory):
@@ -17,6 +39,14 @@ class FirestoreObjectClsFactory(ClsFactory):
 
 class FirestoreObjectMixin:
 
+    __slots__ = ()
+
+    # DocumentCache for documents of the class (see cache.DocumentCache)
+    _cache = None
+
+    # LiveCache serving the class from memory (see QueryMixin.live_cache)
+    _live_cache = None
+
     # @classmethod
     # def new(cls, doc_ref=None, with_dict=None, **kwargs):
     #     if doc_ref is None:
@@ -46,30 +76,611 @@ class FirestoreObjectMixin:
         return self.doc_ref.path
 
     @classmethod
+    @instrument("get")
     def get(cls, *, doc_ref=None, transaction=None, **kwargs):
         if transaction is None:
+            session = current_session()
+            if session is not None and doc_ref.path in session:
+                return session.get(doc_ref.path)
+            d = cls._get_cached(doc_ref)
+            if d is not NOT_CACHED:
+                return cls._from_cached(d, doc_ref=doc_ref)
             snapshot = doc_ref.get()
         else:
             snapshot = doc_ref.get(transaction=transaction)
-        obj = snapshot_to_obj(snapshot=snapshot, super_cls=cls)
+
+        if transaction is None and cls._cache is not None:
+            return cls._cache_snapshot(snapshot)
+        obj = snapshot_to_obj(snapshot=snapshot, super_cls=cls,
+                              use_session=transaction is None)
         return obj
 
-    def save(self, transaction: Transaction = None):
-        d = self._export_as_dict(to_save=True)
-        if transaction is None:
-            self.doc_ref.set(document_data=d)
+    @classmethod
+    def _get_cached(cls, doc_ref):
+        """ Returns the data of the document at doc_ref from the live
+                cache or the document cache of the class, None if the
+                document is known not to exist, or NOT_CACHED.
+        """
+        if cls._live_cache is not None:
+            d = cls._live_cache.get(doc_ref.path)
+            if d is not NOT_CACHED:
+                return d
+        if cls._cache is not None:
+            return cls._cache.get(doc_ref.path)
+        return NOT_CACHED
+
+    @classmethod
+    def _from_cached(cls, d, doc_ref):
+        """ Returns the instance from document data read from the cache
+                (None for a document cached as missing).
+        """
+        if d is None:
+            return None
+        return dict_to_obj(d=d, doc_ref=doc_ref, super_cls=cls)
+
+    @classmethod
+    def _cache_snapshot(cls, snapshot):
+        """ Caches a document snapshot and returns the instance from it.
+        """
+        d = snapshot.to_dict() if snapshot.exists else None
+        if d is not None:
+            record_data(d)
+        cls._cache.set(snapshot.reference.path, d)
+        return cls._from_cached(d, doc_ref=snapshot.reference)
+
+    @classmethod
+    def _update_cache(cls, write, in_transaction=False):
+        """ Writes through to the cache of the class after write is
+                committed: caches the data of a "set" write and caches
+                a deleted document as missing. Documents written with
+                "update" or in a transaction are removed from the cache
+                instead. Deletes are also recorded in the Session.
+
+        :param write: Write
+        :param in_transaction: If set to True, write is added to a
+                    transaction that may not be committed.
+        :return:
+        """
+        path = write.doc_ref.path
+        session = current_session()
+        if session is not None and write.op == "delete":
+            if in_transaction:
+                session.discard(path)
+            else:
+                session.set_missing(path)
+
+        cache = cls._cache
+        if cache is None:
+            return
+        if in_transaction or write.op == "update":
+            cache.invalidate(path)
+        elif write.op == "set":
+            cache.set(path, write.data)
+        else:
+            cache.set_missing(path)
+
+    @classmethod
+    @instrument("get_many")
+    def get_many(cls, *, doc_refs, transaction=None):
+        """ Returns instances from a list of document references,
+                retrieved with the multi-get RPC of the client
+                (in chunks of GET_MANY_CHUNK_SIZE documents).
+
+        :param doc_refs: firestore document references
+        :param transaction: firestore transaction
+        :return: a list of instances in the order of doc_refs, with
+                    None in place of documents that do not exist
+        """
+        doc_refs = list(doc_refs)
+        unique_refs = list({doc_ref.path: doc_ref
+                            for doc_ref in doc_refs}.values())
+
+        objs = dict()
+        session = current_session() if transaction is None else None
+        if session is not None:
+            for doc_ref in unique_refs:
+                if doc_ref.path in session:
+                    objs[doc_ref.path] = session.get(doc_ref.path)
+            unique_refs = [doc_ref for doc_ref in unique_refs
+                           if doc_ref.path not in objs]
+
+        cache = cls._cache if transaction is None else None
+        if transaction is None and (cache is not None
+                                    or cls._live_cache is not None):
+            uncached_refs = list()
+            for doc_ref in unique_refs:
+                d = cls._get_cached(doc_ref)
+                if d is NOT_CACHED:
+                    uncached_refs.append(doc_ref)
+                else:
+                    objs[doc_ref.path] = cls._from_cached(d, doc_ref=doc_ref)
+            unique_refs = uncached_refs
+
+        for i in range(0, len(unique_refs), GET_MANY_CHUNK_SIZE):
+            chunk = unique_refs[i:i + GET_MANY_CHUNK_SIZE]
+            for snapshot in CTX.db.get_all(chunk, transaction=transaction):
+                path = snapshot.reference.path
+                if cache is not None:
+                    objs[path] = cls._cache_snapshot(snapshot)
+                else:
+                    objs[path] = snapshot_to_obj(
+                        snapshot=snapshot, super_cls=cls,
+                        use_session=transaction is None)
+        return [objs.get(doc_ref.path, None) for doc_ref in doc_refs]
+
+    @classmethod
+    def prefetch_related(cls, objs, *, attributes, transaction=None):
+        """ Retrieves the documents referenced by relationship fields of
+                a list of objects with batched multi-gets, and attaches
+                the results to the objects, so that exporting the
+                objects as view dictionaries does not read the
+                documents one by one.
+
+        :param objs: objects to prefetch relationships for (None is
+                    skipped)
+        :param attributes: names of the relationship attributes
+        :param transaction: firestore transaction
+        :return:
+        :raises ValueError: if an attribute is not a Relationship field
+                    of the model of an object
+        """
+        objs = [obj for obj in objs if obj is not None]
+
+        for obj_cls in {type(obj) for obj in objs}:
+            fd = obj_cls._get_fields()
+            for attribute in attributes:
+                if not isinstance(fd.get(attribute, None),
+                                  fields.Relationship):
+                    raise ValueError(
+                        "{} is not a Relationship field of {}".format(
+                            attribute, obj_cls.__name__))
+
+        doc_refs = dict()
+        for obj in objs:
+            for attribute in attributes:
+                val = getattr(obj, attribute, None)
+                vals = val if isinstance(val, list) else [val]
+                for elem in vals:
+                    if isinstance(elem, DocumentReference):
+                        doc_refs[elem.path] = elem
+
+        doc_refs = list(doc_refs.values())
+        related = FirestoreObject.get_many(doc_refs=doc_refs,
+                                           transaction=transaction)
+        prefetched = {doc_ref.path: obj
+                      for doc_ref, obj in zip(doc_refs, related)}
+
+        for obj in objs:
+            object.__setattr__(obj, "_prefetched", prefetched)
+
+    def _get_field_updates(self, to_save=False) -> dict:
+        """ Returns the fields changed since the object was loaded or
+                last saved, keyed by Firestore field path strings.
+
+        :param to_save: See _export_val
+        :return:
+        """
+        changes = self._export_changes(to_save=to_save)
+        return {
+            FieldPath(*path).to_api_repr(): val
+            for path, val in changes.items()
+        }
+
+    def _mark_partial(self, attributes) -> None:
+        """ Marks the object as a partial object, where only the fields
+                with the attribute names were loaded (eg. from a query
+                with select).
+
+        :param attributes:
+        :return:
+        """
+        object.__setattr__(self, "_loaded_fields",
+                           frozenset(attributes) | {"obj_type"})
+
+    @property
+    def loaded_fields(self):
+        """ Returns the attribute names of the fields loaded into a
+                partial object, or None if the object is not partial.
+        """
+        return getattr(self, "_loaded_fields", None)
+
+    def _get_partial_object_updates(self, to_save=False) -> dict:
+        """ Returns the fields of a partial object to save: the loaded
+                fields and the fields assigned since, keyed by Firestore
+                field path strings.
+
+        :param to_save: See _export_val
+        :return:
+        """
+        data_keys = self._get_export_plan().data_keys
+        attributes = set(self._loaded_fields)
+        changed_fields = getattr(self, "_changed_fields", None)
+        if changed_fields is not None:
+            attributes |= changed_fields
+
+        d = self._export_as_dict(to_save=to_save)
+        keys = {data_keys[attribute] for attribute in attributes
+                if attribute in data_keys}
+        return {FieldPath(key).to_api_repr(): d[key]
+                for key in keys if key in d}
+
+    def _get_write(self, partial=False):
+        """ Returns the Write that saves the object, without saving
+                objects nested in relationships.
+
+        :param partial: See save
+        :return: Write, or None if partial is set and no field has
+                    changed
+        """
+        if partial and getattr(self, "_changed_fields", None) is not None:
+            field_updates = self._get_field_updates()
+            if len(field_updates) == 0:
+                return None
+            return Write(op="update", doc_ref=self.doc_ref,
+                         data=field_updates)
+        elif self.loaded_fields is not None:
+            return Write(op="update", doc_ref=self.doc_ref,
+                         data=self._get_partial_object_updates())
         else:
-            transaction.set(reference=self.doc_ref,
-                            document_data=d)
+            return Write(op="set", doc_ref=self.doc_ref,
+                         data=self._export_as_dict())
+
+    def _get_nested_objs(self, partial=False) -> list:
+        """ Returns the objects nested in relationships of the object
+                that save (without graph) saves along with it: those of
+                every nested relationship, or with partial, those of
+                the relationship fields changed.
 
+        :param partial: See save
+        :return:
+        """
+        attributes = self._get_export_plan().nested_relationships
+        changed_fields = getattr(self, "_changed_fields", None)
+        if partial and changed_fields is not None:
+            attributes = [attribute for attribute in attributes
+                          if attribute in changed_fields]
+        res = list()
+        for attribute in attributes:
+            val = getattr(self, attribute, None)
+            vals = val if isinstance(val, list) else [val]
+            for obj in vals:
+                if isinstance(obj, FirestoreObjectMixin):
+                    res.append(obj)
+        return res
+
+    def _visit_graph(self, visited: dict) -> None:
+        """ Adds the object and the objects nested in its relationships
+                (recursively) to visited, a dictionary from document
+                paths to objects. Each document is visited once, so
+                that cycles in the graph terminate.
+
+        :param visited:
+        :return:
+        """
+        path = self.doc_ref.path
+        if path in visited:
+            return
+        visited[path] = self
+
+        for attribute in self._get_export_plan().nested_relationships:
+            val = getattr(self, attribute, None)
+            vals = val if isinstance(val, list) else [val]
+            for obj in vals:
+                if isinstance(obj, FirestoreObjectMixin):
+                    obj._visit_graph(visited)
+
+    def _get_graph_writes(self, partial=False):
+        """ Returns the objects visited in the graph of the object
+                (see _visit_graph) and the writes that save them.
+
+        :param partial: See save
+        :return: a list of (obj, write) for each object, where write is
+                    None if the object has nothing to save
+        """
+        visited = dict()
+        self._visit_graph(visited)
+        return [(obj, obj._get_write(partial=partial))
+                for obj in visited.values()]
+
+    @staticmethod
+    def _on_graph_saved(graph_writes, in_transaction=False):
+        """ Updates caches and change tracking of the objects saved with
+                the writes from _get_graph_writes.
+        """
+        for obj, write in graph_writes:
+            if write is not None:
+                obj._update_cache(write, in_transaction=in_transaction)
+            obj._add_to_session()
+            obj._clear_changes()
+
+    def _add_to_session(self):
+        """ Adds the object to the Session entered, if any, unless the
+                object is a partial object.
+        """
+        session = current_session()
+        if session is not None and self.loaded_fields is None:
+            session.add(self)
+
+    @instrument("save")
+    def save(self, transaction: Transaction = None, partial=False,
+             graph=False):
+        """ Saves the object to Firestore.
+            A partial object (see loaded_fields) is saved with
+                DocumentReference.update on the fields loaded or
+                assigned, so that fields not loaded are kept.
+
+        :param transaction: firestore transaction
+        :param partial: If set to True, only the fields assigned since
+                    the object was loaded or last saved are sent with
+                    DocumentReference.update, including fields of
+                    embedded objects (as dotted paths). Objects that
+                    were neither loaded nor saved are saved in full.
+                    Note that nested relationships are only saved
+                    when the relationship field itself is changed.
+        :param graph: If set to True, the object and every object
+                    nested in its relationships (recursively) are
+                    saved once each, with writes committed in
+                    WriteBatch'es of up to MAX_WRITES_PER_BATCH (or
+                    added to the transaction). partial applies to each
+                    of the objects.
+        :return:
+
+        In a UnitOfWork, the save is registered and written when the
+            unit of work is flushed.
+        """
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None:
+            self._register_save(unit_of_work, transaction=transaction,
+                                partial=partial, graph=graph)
+            return
+
+        if graph:
+            graph_writes = self._get_graph_writes(partial=partial)
+            writes = [write for _, write in graph_writes if write is not None]
+            commit_writes(writes, transaction=transaction)
+            record_writes(writes)
+            self._on_graph_saved(graph_writes,
+                                 in_transaction=transaction is not None)
+            return
+
+        write = None
+        if partial and getattr(self, "_changed_fields", None) is not None:
+            field_updates = self._get_field_updates(to_save=True)
+            if len(field_updates) != 0:
+                if transaction is None:
+                    self.doc_ref.update(field_updates=field_updates)
+                else:
+                    transaction.update(reference=self.doc_ref,
+                                       field_updates=field_updates)
+                write = Write(op="update", doc_ref=self.doc_ref,
+                              data=field_updates)
+        elif self.loaded_fields is not None:
+            field_updates = self._get_partial_object_updates(to_save=True)
+            if transaction is None:
+                self.doc_ref.update(field_updates=field_updates)
+            else:
+                transaction.update(reference=self.doc_ref,
+                                   field_updates=field_updates)
+            write = Write(op="update", doc_ref=self.doc_ref,
+                          data=field_updates)
+        else:
+            d = self._export_as_dict(to_save=True)
+            if transaction is None:
+                self.doc_ref.set(document_data=d)
+            else:
+                transaction.set(reference=self.doc_ref,
+                                document_data=d)
+            write = Write(op="set", doc_ref=self.doc_ref, data=d)
+        if write is not None:
+            record_writes([write])
+            self._update_cache(write, in_transaction=transaction is not None)
+        self._add_to_session()
+        self._clear_changes()
+
+    def _register_save(self, unit_of_work, transaction=None, partial=False,
+                       graph=False):
+        """ Registers the save in a UnitOfWork. With graph, each object
+                in the graph is registered with partial.
+        """
+        if not graph:
+            unit_of_work.register_save(self, partial=partial,
+                                       transaction=transaction)
+            return
+        visited = dict()
+        self._visit_graph(visited)
+        for obj in visited.values():
+            unit_of_work.register_save(obj, partial=partial,
+                                       transaction=transaction)
+
+    @instrument("delete")
     def delete(self, transaction: Transaction = None):
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None:
+            unit_of_work.register_delete(self.doc_ref, obj=self,
+                                         transaction=transaction)
+            return
+
         if transaction is None:
             self.doc_ref.delete()
         else:
             transaction.delete(reference=self.doc_ref)
+        record_deletes([self.doc_ref])
+        self._update_cache(Write(op="delete", doc_ref=self.doc_ref),
+                           in_transaction=transaction is not None)
+
+    @classmethod
+    @instrument("get")
+    async def aget(cls, *, doc_ref=None, transaction=None, **kwargs):
+        """ Returns an instance from firestore document reference,
+                read with the async client (CTX.adb).
+
+        :param doc_ref: firestore document reference
+        :param transaction: async firestore transaction
+        :return:
+        """
+        if transaction is None:
+            session = current_session()
+            if session is not None and doc_ref.path in session:
+                return session.get(doc_ref.path)
+            d = cls._get_cached(doc_ref)
+            if d is not NOT_CACHED:
+                return cls._from_cached(d, doc_ref=doc_ref)
+
+        snapshot = await CTX.adb.document(doc_ref.path).get(
+            transaction=transaction)
+        snapshot = to_sync_snapshot(snapshot)
+
+        if transaction is None and cls._cache is not None:
+            return cls._cache_snapshot(snapshot)
+        obj = snapshot_to_obj(snapshot=snapshot, super_cls=cls,
+                              use_session=transaction is None)
+        return obj
+
+    @instrument("save")
+    async def asave(self, transaction=None, partial=False, graph=False):
+        """ Saves the object with the async client (CTX.adb).
+
+        :param transaction: async firestore transaction
+        :param partial: See save
+        :param graph: See save
+        :return:
+        """
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None:
+            self._register_save(unit_of_work, transaction=transaction,
+                                partial=partial, graph=graph)
+            return
+
+        if graph:
+            graph_writes = self._get_graph_writes(partial=partial)
+        else:
+            # Saves nested objects first, as save does when exporting
+            for obj in self._get_nested_objs(partial=partial):
+                await obj.asave(transaction=transaction)
+            graph_writes = [(self, self._get_write(partial=partial))]
+        writes = [write for _, write in graph_writes if write is not None]
+        await acommit_writes(writes, transaction=transaction)
+        record_writes(writes)
+        self._on_graph_saved(graph_writes,
+                             in_transaction=transaction is not None)
+
+    @instrument("delete")
+    async def adelete(self, transaction=None):
+        """ Deletes the document of the object with the async client
+                (CTX.adb).
+
+        :param transaction: async firestore transaction
+        :return:
+        """
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None:
+            unit_of_work.register_delete(self.doc_ref, obj=self,
+                                         transaction=transaction)
+            return
+
+        if transaction is None:
+            await CTX.adb.document(self.doc_ref.path).delete()
+        else:
+            transaction.delete(reference=self.doc_ref)
+        record_deletes([self.doc_ref])
+        self._update_cache(Write(op="delete", doc_ref=self.doc_ref),
+                           in_transaction=transaction is not None)
+
+    @classmethod
+    @instrument("save_many")
+    def save_many(cls, objs, *, partial=False, max_workers=None):
+        """ Saves objects with WriteBatch commits of up to
+                MAX_WRITES_PER_BATCH writes and MAX_BATCH_PAYLOAD_BYTES
+                of estimated size. Objects nested in relationships are
+                stored as references and not saved.
+
+        :param objs: objects to save
+        :param partial: See save
+        :param max_workers: If set, up to max_workers commits run
+                    concurrently.
+        :return:
+        :raises BulkWriteError: if any object fails to export or save;
+                    failures lists (obj, exception) for each of them,
+                    and other objects are saved.
+        """
+        objs = list(objs)
+        failures = list()
+
+        writes, written = list(), list()
+        for obj in objs:
+            try:
+                write = obj._get_write(partial=partial)
+            except Exception as e:
+                failures.append((obj, e))
+                continue
+            if write is not None:
+                writes.append(write)
+                written.append(obj)
+
+        failed = dict(bulk_commit(writes, max_workers=max_workers))
+        for i, obj in enumerate(written):
+            if i in failed:
+                failures.append((obj, failed[i]))
+            else:
+                record_writes([writes[i]])
+                obj._update_cache(writes[i])
+                obj._add_to_session()
+                obj._clear_changes()
+
+        if len(failures) != 0:
+            raise BulkWriteError(failures)
+
+    @classmethod
+    def _to_doc_ref(cls, item) -> DocumentReference:
+        """ Returns the DocumentReference of an item passed to
+                delete_many.
+        """
+        if isinstance(item, DocumentReference):
+            return item
+        return item.doc_ref
+
+    @classmethod
+    @instrument("delete_many")
+    def delete_many(cls, objs_or_refs, *, max_workers=None):
+        """ Deletes documents with WriteBatch commits of up to
+                MAX_WRITES_PER_BATCH writes.
+
+        :param objs_or_refs: objects or DocumentReferences to delete
+        :param max_workers: If set, up to max_workers commits run
+                    concurrently.
+        :return:
+        :raises BulkWriteError: if any document fails to be deleted;
+                    failures lists (item, exception) for each of them.
+        """
+        items = list(objs_or_refs)
+        failures = list()
+
+        writes, written = list(), list()
+        for item in items:
+            try:
+                doc_ref = cls._to_doc_ref(item)
+            except Exception as e:
+                failures.append((item, e))
+                continue
+            writes.append(Write(op="delete", doc_ref=doc_ref))
+            written.append(item)
+
+        failed = dict(bulk_commit(writes, max_workers=max_workers))
+        for i, item in enumerate(written):
+            if i in failed:
+                failures.append((item, failed[i]))
+            else:
+                record_writes([writes[i]])
+                cls._update_cache(writes[i])
+
+        if len(failures) != 0:
+            raise BulkWriteError(failures)
 
 
 class FirestoreObjectValMixin:
+
+    __slots__ = ()
+
     def _export_val(self, val, to_save=False):
 
         def is_nested_relationship(val):
@@ -99,8 +710,12 @@ class FirestoreObjectValMixin:
     def _export_val_view(self, val):
 
         def get_vm(doc_ref):
-            obj = FirestoreObject.get(doc_ref=doc_ref,
-                                      transaction=self.transaction)
+            prefetched = getattr(self, "_prefetched", None)
+            if prefetched is not None and doc_ref.path in prefetched:
+                obj = prefetched[doc_ref.path]
+            else:
+                obj = FirestoreObject.get(doc_ref=doc_ref,
+                                          transaction=self.transaction)
             return obj._export_as_view_dict()
 
         if isinstance(val, RelationshipReference):
@@ -113,6 +728,40 @@ class FirestoreObjectValMixin:
         else:
             return super()._export_val_view(val)
 
+    def _import_properties(self, d: dict, to_get=False) -> None:
+        if not to_get:
+            super()._import_properties(d, to_get=to_get)
+            return
+        token = _nested_data.set(self._get_nested_data(d))
+        try:
+            super()._import_properties(d, to_get=to_get)
+        finally:
+            _nested_data.reset(token)
+
+    def _get_nested_data(self, d: dict) -> dict:
+        """ Returns the data of the documents referenced by nested
+                relationships in d, a dictionary of the format stored
+                in Firestore, read with multi-gets of up to
+                GET_MANY_CHUNK_SIZE documents, keyed by document path.
+        """
+        plan = self._get_export_plan()
+        doc_refs = dict()
+        for attribute in plan.nested_relationships:
+            val = d.get(plan.data_keys[attribute], None)
+            vals = val if isinstance(val, list) else [val]
+            for elem in vals:
+                if isinstance(elem, DocumentReference):
+                    doc_refs[elem.path] = elem
+
+        doc_refs = list(doc_refs.values())
+        res = dict()
+        for i in range(0, len(doc_refs), GET_MANY_CHUNK_SIZE):
+            chunk = doc_refs[i:i + GET_MANY_CHUNK_SIZE]
+            for snapshot in CTX.db.get_all(chunk,
+                                           transaction=self.transaction):
+                res[snapshot.reference.path] = snapshot.to_dict()
+        return res
+
     def _import_val(self, val, to_get=False):
 
         def is_nested_relationship(val):
@@ -122,6 +771,9 @@ class FirestoreObjectValMixin:
             return isinstance(val, RelationshipReference) and not val.nested
 
         def nest_relationship(val: RelationshipReference):
+            nested_data = _nested_data.get()
+            if nested_data is not None and val.doc_ref.path in nested_data:
+                return nested_data[val.doc_ref.path]
             res = None
             if self.transaction is None:
                 res = val.doc_ref.get().to_dict()
@@ -137,14 +789,14 @@ class FirestoreObjectValMixin:
         elif is_ref_only_relationship(val):
             return val.doc_ref
         else:
-            return super()._import_val(val)
+            return super()._import_val(val, to_get=to_get)
 
 
 class SerializableFO(FirestoreObjectValMixin, Serializable):
     """
     Serializable with capacity of holding Firestore object as a field value.
     """
-    pass
+    __slots__ = ()
 
 
 class FirestoreObject(FirestoreObjectValMixin,
@@ -152,6 +804,12 @@ class FirestoreObject(FirestoreObjectValMixin,
                       Serializable,
                       CollectionMixin):
 
+    __slots__ = ()
+
+    # Instance variables to declare as slots in a model with Meta.slots
+    _slotted_attrs = ("_doc_ref", "transaction", "_prefetched",
+                      "_loaded_fields")
+
     def __init__(self, *args, doc_ref=None, **kwargs):
         super().__init__(*args, **kwargs)
         self._doc_ref = doc_ref
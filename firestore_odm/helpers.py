@@ -12,3 +12,9 @@ EmbeddedElement = namedtuple(
     ['d', 'obj'],
     defaults=(None, None)
 )
+
+Page = namedtuple(
+    "Page",
+    ['objs', 'cursor'],
+    defaults=(None, None)
+)
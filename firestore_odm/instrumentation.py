@@ -0,0 +1,414 @@
+"""
+Hooks called around model operations, eg. to attribute latency and
+    Firestore usage to models. Register a hook with Context.add_hook;
+    Aggregator is a hook that keeps totals per model and operation,
+    and to_prometheus_text exports them, eg.
+
+    aggregator = Aggregator()
+    CTX.add_hook(aggregator)
+    City.get(doc_id="SF")
+    print(to_prometheus_text(aggregator))
+
+Operations are only timed while a hook is registered: with no hook,
+    an instrumented call costs one check of Context.hooks.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from .batch import Write, estimate_write_size, _estimate_value_size
+from .context import Context as CTX
+
+# Operations reported to hooks
+OPERATIONS = (
+    "get",          # get, aget
+    "get_many",
+    "save",         # save, asave
+    "save_many",
+    "delete",       # delete, adelete
+    "delete_many",
+    "query",        # where, all, awhere, aall (and prepared queries)
+    "hydrate",      # snapshot_to_obj
+    "export",       # _export_as_dict
+)
+
+# Upper bounds (in seconds) of the buckets of the latency histograms
+#   of Aggregator
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# An operation on documents of model_cls (or its subclasses).
+#   duration is in seconds. count is the number of documents read from
+#   Firestore (for get, get_many, query), written (for save, delete)
+#   or converted (for export, and hydrate outside of a read), and bytes
+#   is their estimated size (see batch.estimate_write_size). For query, duration only
+#   includes the time spent producing results, and the event is
+#   reported when the results are exhausted or the generator is
+#   closed. Saves and deletes in a UnitOfWork are reported when it is
+#   flushed, for each model and op, with the duration of the commit
+#   (see commit_operation). error is True if the operation raised.
+Event = namedtuple(
+    "Event",
+    ['model_cls', 'op', 'duration', 'count', 'bytes', 'error'],
+    defaults=(False,)
+)
+
+# Counts of documents and bytes of the operation running in the
+#   current thread or asyncio task
+_current_span = contextvars.ContextVar("firestore_odm_span", default=None)
+
+
+class _Span:
+
+    __slots__ = ("count", "bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+
+    def add(self, d):
+        self.count += 1
+        self.bytes += _estimate_value_size(d)
+
+
+def record_data(d) -> None:
+    """ Adds a document with data d to the operation being reported.
+            Documents read are recorded from the data materialised to
+            hydrate them (see hydrate_operation), so that each read is
+            counted once.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.add(d)
+
+
+def record_writes(writes) -> None:
+    """ Adds the documents written with writes (None is skipped) to the
+            operation being reported.
+    """
+    span = _current_span.get()
+    if span is not None:
+        for write in writes:
+            if write is not None:
+                span.count += 1
+                span.bytes += estimate_write_size(write)
+
+
+def record_deletes(doc_refs) -> None:
+    """ Adds documents deleted to the operation being reported.
+    """
+    record_writes([Write(op="delete", doc_ref=doc_ref)
+                   for doc_ref in doc_refs])
+
+
+def _emit(event) -> None:
+    for hook in CTX.hooks:
+        try:
+            hook(event)
+        except Exception:
+            logging.exception("Error in instrumentation hook {}"
+                              .format(hook))
+
+
+def _model_cls(obj):
+    return obj if isinstance(obj, type) else type(obj)
+
+
+class operation:
+    """
+    Context manager that reports the block as op on documents of
+        model_cls to the hooks in Context.hooks. Used where a call
+        is too frequent for instrument, behind a check of
+        Context.hooks, eg.
+
+        if CTX.hooks:
+            with operation("export", type(self)):
+                ...
+    """
+
+    __slots__ = ("model_cls", "op", "span", "_token", "_start")
+
+    def __init__(self, op, model_cls):
+        self.model_cls = model_cls
+        self.op = op
+        self.span = _Span()
+
+    def __enter__(self):
+        self._token = _current_span.set(self.span)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        _emit(Event(model_cls=self.model_cls, op=self.op,
+                    duration=duration, count=self.span.count,
+                    bytes=self.span.bytes, error=exc_type is not None))
+        return False
+
+
+class hydrate_operation(operation):
+    """
+    operation that reports the hydration of a document with data d
+        (None for a missing document, which is not counted). The
+        document is counted once: by the operation that read it (eg.
+        get or query), or by the hydrate event if there is none.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, model_cls, d):
+        super().__init__("hydrate", model_cls)
+        if d is not None:
+            span = _current_span.get()
+            (self.span if span is None else span).add(d)
+
+
+class commit_operation:
+    """
+    Context manager that reports the block, a commit of writes
+        registered by several calls (eg. UnitOfWork.flush), to the hooks
+        in Context.hooks: an Event for each model and op of the writes,
+        with the duration of the whole block.
+    """
+
+    __slots__ = ("writes", "_start")
+
+    def __init__(self, writes):
+        """
+
+        :param writes: a list of (op, model_cls, write), where op is
+                    "save" or "delete"
+        """
+        self.writes = writes
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not CTX.hooks:
+            return False
+        duration = time.perf_counter() - self._start
+        totals = dict()
+        for op, model_cls, write in self.writes:
+            t = totals.setdefault((model_cls, op), [0, 0])
+            t[0] += 1
+            t[1] += estimate_write_size(write)
+        for (model_cls, op), (count, size) in totals.items():
+            _emit(Event(model_cls=model_cls, op=op, duration=duration,
+                        count=count, bytes=size,
+                        error=exc_type is not None))
+        return False
+
+
+def instrument(op):
+    """ Decorator that reports calls of a method as op to the hooks in
+            Context.hooks. The model class is the class of the first
+            argument (cls or self). Calls are not timed when no hook is
+            registered.
+
+    :param op: one of OPERATIONS
+    :return:
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def acall(obj, *args, **kwargs):
+                if not CTX.hooks:
+                    return await func(obj, *args, **kwargs)
+                with operation(op, _model_cls(obj)):
+                    return await func(obj, *args, **kwargs)
+            return acall
+
+        @functools.wraps(func)
+        def call(obj, *args, **kwargs):
+            if not CTX.hooks:
+                return func(obj, *args, **kwargs)
+            with operation(op, _model_cls(obj)):
+                return func(obj, *args, **kwargs)
+        return call
+    return decorator
+
+
+def instrument_stream(op):
+    """ Decorator that reports a generator (or async generator) method
+            as op to the hooks in Context.hooks, timing each step of
+            the generator. See Event.
+
+    :param op: one of OPERATIONS
+    :return:
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            def acall(cls, *args, **kwargs):
+                gen = func(cls, *args, **kwargs)
+                if not CTX.hooks:
+                    return gen
+                return _astream(_model_cls(cls), op, gen)
+            return acall
+
+        @functools.wraps(func)
+        def call(cls, *args, **kwargs):
+            gen = func(cls, *args, **kwargs)
+            if not CTX.hooks:
+                return gen
+            return _stream(_model_cls(cls), op, gen)
+        return call
+    return decorator
+
+
+def _stream(model_cls, op, gen):
+    span = _Span()
+    duration, error = 0.0, True
+    try:
+        while True:
+            token = _current_span.set(span)
+            start = time.perf_counter()
+            try:
+                obj = next(gen)
+            except StopIteration:
+                error = False
+                return
+            finally:
+                duration += time.perf_counter() - start
+                _current_span.reset(token)
+            yield obj
+    except GeneratorExit:
+        error = False
+        raise
+    finally:
+        gen.close()
+        _emit(Event(model_cls=model_cls, op=op, duration=duration,
+                    count=span.count, bytes=span.bytes, error=error))
+
+
+async def _astream(model_cls, op, gen):
+    span = _Span()
+    duration, error = 0.0, True
+    try:
+        while True:
+            token = _current_span.set(span)
+            start = time.perf_counter()
+            try:
+                obj = await gen.__anext__()
+            except StopAsyncIteration:
+                error = False
+                return
+            finally:
+                duration += time.perf_counter() - start
+                _current_span.reset(token)
+            yield obj
+    except GeneratorExit:
+        error = False
+        raise
+    finally:
+        await gen.aclose()
+        _emit(Event(model_cls=model_cls, op=op, duration=duration,
+                    count=span.count, bytes=span.bytes, error=error))
+
+
+# Totals of the events of a model and operation. buckets are the
+#   cumulative counts of calls for each bound in Aggregator.buckets
+OpTotals = namedtuple(
+    "OpTotals",
+    ['calls', 'errors', 'duration', 'documents', 'bytes', 'buckets']
+)
+
+
+class Aggregator:
+    """
+    Hook that keeps totals (see OpTotals) and a latency histogram of
+        the events of each model and operation in memory.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._totals = dict()
+        self._lock = threading.Lock()
+
+    def __call__(self, event) -> None:
+        model_cls = event.model_cls
+        key = ("" if model_cls is None else model_cls.__name__, event.op)
+        with self._lock:
+            totals = self._totals.get(key, None)
+            if totals is None:
+                totals = [0, 0, 0.0, 0, 0, [0] * len(self.buckets)]
+                self._totals[key] = totals
+            totals[0] += 1
+            totals[1] += int(event.error)
+            totals[2] += event.duration
+            totals[3] += event.count
+            totals[4] += event.bytes
+            for i, bound in enumerate(self.buckets):
+                if event.duration <= bound:
+                    totals[5][i] += 1
+
+    def totals(self) -> dict:
+        """ Returns a dictionary from (model name, op) to OpTotals.
+        """
+        with self._lock:
+            return {key: OpTotals(calls=t[0], errors=t[1], duration=t[2],
+                                  documents=t[3], bytes=t[4],
+                                  buckets=tuple(t[5]))
+                    for key, t in self._totals.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+def _escape_label(val) -> str:
+    return str(val).replace("\\", "\\\\").replace("\"", "\\\"") \
+        .replace("\n", "\\n")
+
+
+def to_prometheus_text(aggregator, namespace="firestore_odm") -> str:
+    """ Returns the totals of an Aggregator in the Prometheus text
+            exposition format, with labels model and op.
+
+    :param aggregator: Aggregator
+    :param namespace: prefix of the metric names
+    :return:
+    """
+    totals = sorted(aggregator.totals().items())
+
+    def labels(key, **extra):
+        model, op = key
+        pairs = [("model", model), ("op", op)] + list(extra.items())
+        return "{" + ",".join("{}=\"{}\"".format(name, _escape_label(val))
+                              for name, val in pairs) + "}"
+
+    lines = list()
+    name = "{}_operation_duration_seconds".format(namespace)
+    lines.append("# HELP {} Duration of model operations.".format(name))
+    lines.append("# TYPE {} histogram".format(name))
+    for key, t in totals:
+        for bound, count in zip(aggregator.buckets, t.buckets):
+            lines.append("{}_bucket{} {}".format(
+                name, labels(key, le=repr(float(bound))), count))
+        lines.append("{}_bucket{} {}".format(
+            name, labels(key, le="+Inf"), t.calls))
+        lines.append("{}_sum{} {!r}".format(name, labels(key), t.duration))
+        lines.append("{}_count{} {}".format(name, labels(key), t.calls))
+
+    for metric, attr, help_text in (
+            ("operation_errors_total", "errors",
+             "Model operations that raised."),
+            ("documents_total", "documents",
+             "Documents read, written or converted by model operations."),
+            ("bytes_total", "bytes",
+             "Estimated size of the documents of model operations."),
+    ):
+        name = "{}_{}".format(namespace, metric)
+        lines.append("# HELP {} {}".format(name, help_text))
+        lines.append("# TYPE {} counter".format(name))
+        for key, t in totals:
+            lines.append("{}{} {}".format(name, labels(key),
+                                          getattr(t, attr)))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,155 @@
+"""
+In-memory copy of a collection (or query) kept up to date by a
+    Firestore snapshot listener. See LiveCache.
+"""
+import threading
+
+from google.cloud.firestore import DocumentSnapshot
+
+from .cache import NOT_CACHED, copy_data
+
+
+class LiveCache:
+    """
+    Map from document id to document data (dictionaries in the format
+        stored in Firestore) for the results of a query, updated with
+        the incremental changes a snapshot listener receives instead of
+        re-running the query.
+
+    Created with QueryMixin.live_cache, eg. City.live_cache(). Until the
+        first snapshot is received, nothing is served from memory.
+    """
+
+    def __init__(self, obj_cls, query, complete=False):
+        """
+
+        :param obj_cls: class whose get and where are served
+        :param query: firestore Query or CollectionReference to listen to
+        :param complete: If set to True, query reads the whole collection
+                    of obj_cls, so a document id that is not in the map
+                    is a missing document, and where can be answered
+                    from memory.
+        """
+        self.obj_cls = obj_cls
+        self.complete = complete
+        self.collection_path = obj_cls._get_collection_name()
+        self.docs = dict()
+        self._refs = dict()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = query.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        """ Snapshot listener callback: applies document changes.
+
+        :param docs: all documents of the snapshot (unused)
+        :param changes: a list of DocumentChange
+        :param read_time:
+        :return:
+        """
+        with self._lock:
+            for change in changes:
+                snapshot = change.document
+                doc_id = snapshot.reference.id
+                if change.type.name == "REMOVED":
+                    self.docs.pop(doc_id, None)
+                    self._refs.pop(doc_id, None)
+                else:
+                    self.docs[doc_id] = snapshot.to_dict()
+                    self._refs[doc_id] = snapshot.reference
+        self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """ Whether the first snapshot has been received.
+        """
+        return self._ready.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        """ Blocks until the first snapshot is received.
+
+        :param timeout: seconds to wait for
+        :return: ready
+        """
+        return self._ready.wait(timeout=timeout)
+
+    def get(self, path):
+        """ Returns a copy of the data of the document at path, None if
+                the document is known not to exist, or NOT_CACHED.
+
+        :param path: document path, eg. "City/SF"
+        :return:
+        """
+        if not self.ready:
+            return NOT_CACHED
+        collection_path, _, doc_id = path.rpartition("/")
+        if collection_path != self.collection_path:
+            return NOT_CACHED
+        with self._lock:
+            d = self.docs.get(doc_id, None)
+        if d is not None:
+            return copy_data(d)
+        return None if self.complete else NOT_CACHED
+
+    def query(self, filters):
+        """ Returns a LiveQuery for documents matching filters, or None
+                if the filters can not be answered from memory (only
+                "==" filters on a complete LiveCache can).
+
+        :param filters: a list of (field_path, op_string, value)
+        :return:
+        """
+        if not (self.complete and self.ready):
+            return None
+        if any(op_string != "==" for _, op_string, _ in filters):
+            return None
+        with self._lock:
+            matches = [
+                (doc_id, d) for doc_id, d in self.docs.items()
+                if all(_get_field(d, field_path) == value
+                       for field_path, _, value in filters)
+            ]
+            matches = [(self._refs[doc_id], d) for doc_id, d
+                       in sorted(matches, key=lambda item: item[0])]
+        return LiveQuery(matches)
+
+    def close(self) -> None:
+        """ Detaches the snapshot listener, and stops serving obj_cls
+                from memory.
+        """
+        self._watch.unsubscribe()
+        if self.obj_cls.__dict__.get("_live_cache", None) is self:
+            self.obj_cls._live_cache = None
+
+
+class LiveQuery:
+    """
+    Results of a query answered by a LiveCache, streamed as document
+        snapshots like the results of a firestore Query.
+    """
+
+    def __init__(self, matches):
+        """
+
+        :param matches: a list of (doc_ref, d)
+        """
+        self.matches = matches
+
+    def stream(self):
+        for doc_ref, d in self.matches:
+            yield DocumentSnapshot(doc_ref, d, exists=True, read_time=None,
+                                   create_time=None, update_time=None)
+
+
+# Returned by _get_field when a field is not set
+_MISSING = object()
+
+
+def _get_field(d, field_path):
+    """ Returns the value at a dotted field path of document data.
+    """
+    for key in field_path.split("."):
+        if not isinstance(d, dict) or key not in d:
+            return _MISSING
+        d = d[key]
+    return d
@@ -0,0 +1,414 @@
+"""
+Load test of model operations with a mixed workload, run concurrently
+    in threads or asyncio tasks, eg.
+
+    python -m firestore_odm.loadtest --workers 16 --duration 10 \\
+        --mix get=60,get_many=10,save=20,query=10 --latency-ms 5
+
+Reports the latency percentiles (p50/p95/p99), throughput and, with the
+    in-memory backend, the RPCs of each operation type.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import namedtuple, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from firestore_odm import fields
+from firestore_odm.config import Config
+from firestore_odm.context import Context as CTX
+from firestore_odm.model_registry import ModelRegistry
+from firestore_odm.primary_object import PrimaryObject
+from firestore_odm.schema import Schema
+
+# Operation types of a workload
+OPERATIONS = ("get", "get_many", "save", "query")
+
+# Countries of the documents seeded, queried with equality filters
+COUNTRIES = ("USA", "Japan", "China", "France", "Brazil")
+
+# Number of documents read by one get_many operation
+GET_MANY_SIZE = 10
+
+# Maximum number of documents read by one query operation
+QUERY_LIMIT = 10
+
+
+class LoadTestCitySchema(Schema):
+    city_name = fields.Raw()
+
+    country = fields.Raw()
+    capital = fields.Raw()
+    population = fields.Integer()
+
+
+def get_city_cls():
+    """ Returns the model of the cities of the workload. The model is
+            declared on the first call rather than on import, so that
+            importing the module does not register a model.
+    """
+    city_cls = ModelRegistry.get_cls_from_name("LoadTestCity")
+    if city_cls is None:
+        class LoadTestCity(PrimaryObject):
+            class Meta:
+                schema_cls = LoadTestCitySchema
+                collection_name = "LoadTestCity"
+        city_cls = LoadTestCity
+    return city_cls
+
+
+# Latency statistics of an operation type, in milliseconds
+OpStats = namedtuple(
+    "OpStats",
+    ['op', 'count', 'errors', 'p50', 'p95', 'p99', 'throughput', 'rpcs']
+)
+
+
+def parse_mix(s) -> dict:
+    """ Returns the ratios of operations from "get=60,save=40".
+    """
+    mix = dict()
+    for item in s.split(","):
+        op, _, weight = item.partition("=")
+        op = op.strip()
+        if op not in OPERATIONS:
+            raise ValueError("Unknown operation: {}. Choose from {}"
+                             .format(op, OPERATIONS))
+        mix[op] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("Mix has no operations: {}".format(s))
+    return mix
+
+
+def percentile(sorted_vals, q):
+    """ Returns the q-th percentile (nearest rank) of sorted values.
+    """
+    if len(sorted_vals) == 0:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_vals)))
+    return sorted_vals[min(rank, len(sorted_vals)) - 1]
+
+
+def _doc_id(i):
+    return "city{}".format(i)
+
+
+def _new_city(doc_id, rng):
+    return get_city_cls().new(
+        doc_id=doc_id, city_name="City {}".format(doc_id),
+        country=rng.choice(COUNTRIES), capital=rng.random() < 0.1,
+        population=rng.randrange(1000, 10000000))
+
+
+def seed(n_documents, rng) -> None:
+    """ Saves n_documents cities to be read by the workload.
+    """
+    get_city_cls().save_many(
+        [_new_city(_doc_id(i), rng) for i in range(n_documents)])
+
+
+class Workload:
+    """
+    Picks and runs operations at random with the ratios of a mix.
+    """
+
+    def __init__(self, mix, n_documents):
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.n_documents = n_documents
+        self.city_cls = get_city_cls()
+
+    def pick(self, rng):
+        return rng.choices(self.ops, weights=self.weights)[0]
+
+    def _random_id(self, rng):
+        return _doc_id(rng.randrange(self.n_documents))
+
+    def run(self, op, rng) -> None:
+        if op == "get":
+            self.city_cls.get(doc_id=self._random_id(rng))
+        elif op == "get_many":
+            self.city_cls.get_many(doc_ids=[self._random_id(rng)
+                                            for _ in range(GET_MANY_SIZE)])
+        elif op == "save":
+            _new_city(self._random_id(rng), rng).save()
+        elif op == "query":
+            list(self.city_cls.where(country=rng.choice(COUNTRIES),
+                                     limit=QUERY_LIMIT))
+
+    async def arun(self, op, rng) -> None:
+        """ Runs op with the async API. get_many has no async variant,
+                and runs in a thread.
+        """
+        if op == "get":
+            await self.city_cls.aget(doc_id=self._random_id(rng))
+        elif op == "get_many":
+            await asyncio.to_thread(self.run, op, rng)
+        elif op == "save":
+            await _new_city(self._random_id(rng), rng).asave()
+        elif op == "query":
+            async for _ in self.city_cls.awhere(
+                    country=rng.choice(COUNTRIES), limit=QUERY_LIMIT):
+                pass
+
+
+class Recorder:
+    """
+    Collects the latency of each operation, and its errors.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, op, seconds, error=None) -> None:
+        with self._lock:
+            if error is not None:
+                self.errors[op] += 1
+            else:
+                self.latencies[op].append(seconds)
+
+
+def _tag(op):
+    """ Returns a context manager that attributes the RPCs of op, if
+            the backend counts them.
+    """
+    tag = getattr(CTX.backend, "tag", None)
+    if tag is None:
+        return _NullContext()
+    return tag(op)
+
+
+class _NullContext:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def run_threads(workload, recorder, workers, duration, operations,
+                seed_val) -> None:
+    """ Runs the workload in workers threads until duration seconds have
+            passed or operations operations have run.
+    """
+    deadline = time.perf_counter() + duration if duration else None
+    remaining = [operations]
+    lock = threading.Lock()
+
+    def take():
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        if operations is None:
+            return True
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(i):
+        rng = random.Random(seed_val + i)
+        while take():
+            op = workload.pick(rng)
+            start = time.perf_counter()
+            try:
+                with _tag(op):
+                    workload.run(op, rng)
+            except Exception as e:
+                recorder.record(op, None, error=e)
+            else:
+                recorder.record(op, time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(worker, range(workers)))
+
+
+def run_asyncio(workload, recorder, workers, duration, operations,
+                seed_val) -> None:
+    """ Runs the workload in workers asyncio tasks. See run_threads.
+    """
+    async def main():
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [operations]
+
+        def take():
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            if operations is None:
+                return True
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+        async def worker(i):
+            rng = random.Random(seed_val + i)
+            while take():
+                op = workload.pick(rng)
+                start = time.perf_counter()
+                try:
+                    with _tag(op):
+                        await workload.arun(op, rng)
+                except Exception as e:
+                    recorder.record(op, None, error=e)
+                else:
+                    recorder.record(op, time.perf_counter() - start)
+
+        await asyncio.gather(*(worker(i) for i in range(workers)))
+
+    asyncio.run(main())
+
+
+def summarize(recorder, elapsed, tagged_rpc_counts=None) -> list:
+    """ Returns OpStats for each operation type, and for all operations
+            ("total").
+
+    :param recorder: Recorder
+    :param elapsed: seconds the workload ran for
+    :param tagged_rpc_counts: counts of (op, rpc), or None if the
+                backend does not count RPCs
+    :return:
+    """
+    def stats(op, latencies, errors, rpcs):
+        latencies = sorted(latencies)
+        ms = [percentile(latencies, q) for q in (50, 95, 99)]
+        return OpStats(
+            op=op, count=len(latencies), errors=errors,
+            p50=None if ms[0] is None else ms[0] * 1000,
+            p95=None if ms[1] is None else ms[1] * 1000,
+            p99=None if ms[2] is None else ms[2] * 1000,
+            throughput=len(latencies) / elapsed if elapsed else 0.0,
+            rpcs=rpcs)
+
+    def rpcs_of(ops):
+        if tagged_rpc_counts is None:
+            return None
+        res = defaultdict(int)
+        for (op, rpc), n in tagged_rpc_counts.items():
+            if op in ops:
+                res[rpc] += n
+        return dict(res)
+
+    ops = [op for op in OPERATIONS
+           if op in recorder.latencies or op in recorder.errors]
+    results = [stats(op, recorder.latencies[op], recorder.errors[op],
+                     rpcs_of([op]))
+               for op in ops]
+    results.append(stats(
+        "total",
+        [t for op in ops for t in recorder.latencies[op]],
+        sum(recorder.errors[op] for op in ops),
+        rpcs_of(ops)))
+    return results
+
+
+def format_report(results) -> str:
+    def ms(val):
+        return "-" if val is None else "{:.2f}".format(val)
+
+    def rpcs(stat):
+        if stat.rpcs is None:
+            return "-"
+        n = max(stat.count + stat.errors, 1)
+        return " ".join("{}:{:.2f}".format(rpc, count / n)
+                        for rpc, count in sorted(stat.rpcs.items()))
+
+    lines = ["{:<10} {:>8} {:>7} {:>9} {:>9} {:>9} {:>10}  {}".format(
+        "op", "count", "errors", "p50 ms", "p95 ms", "p99 ms", "ops/sec",
+        "rpcs/op")]
+    for stat in results:
+        lines.append(
+            "{:<10} {:>8} {:>7} {:>9} {:>9} {:>9} {:>10.1f}  {}".format(
+                stat.op, stat.count, stat.errors, ms(stat.p50),
+                ms(stat.p95), ms(stat.p99), stat.throughput, rpcs(stat)))
+    return "\n".join(lines)
+
+
+def _make_backend(args):
+    if args.backend == "memory":
+        from firestore_odm.memory import MemoryBackend
+        latency, jitter = args.latency_ms / 1000, args.jitter_ms / 1000
+        if jitter:
+            rng = random.Random(args.seed)
+            return MemoryBackend(
+                latency=lambda: max(0.0, rng.gauss(latency, jitter)))
+        return MemoryBackend(latency=latency)
+    return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m firestore_odm.loadtest",
+        description="Load test of firestore_odm model operations")
+    parser.add_argument("--mix", default="get=60,get_many=10,save=20,query=10",
+                        help="ratios of operations, eg. get=60,save=40 "
+                             "(operations: {})".format(", ".join(OPERATIONS)))
+    parser.add_argument("--workers", type=int, default=8,
+                        help="number of threads or asyncio tasks")
+    parser.add_argument("--mode", choices=("threads", "asyncio"),
+                        default="threads")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="seconds to run for")
+    parser.add_argument("--operations", type=int, default=None,
+                        help="stop after this many operations")
+    parser.add_argument("--documents", type=int, default=1000,
+                        help="number of documents seeded")
+    parser.add_argument("--backend", choices=("memory", "firestore"),
+                        default="memory")
+    parser.add_argument("--certificate-path", default=None,
+                        help="service account JSON for --backend firestore")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="latency of each RPC of the memory backend")
+    parser.add_argument("--jitter-ms", type=float, default=0.0,
+                        help="standard deviation of the latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true",
+                        help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.backend == "firestore" and args.certificate_path is None:
+        parser.error("--backend firestore requires --certificate-path")
+
+    mix = parse_mix(args.mix)
+    config = Config(certificate_path=args.certificate_path,
+                    app_name="firestore-odm-loadtest",
+                    backend=_make_backend(args))
+    CTX.read(config)
+
+    rng = random.Random(args.seed)
+    seed(args.documents, rng)
+    counts = getattr(CTX.backend, "tagged_rpc_counts", None)
+    if counts is not None:
+        CTX.backend.reset_counts()
+
+    workload = Workload(mix, n_documents=args.documents)
+    recorder = Recorder()
+    run = run_threads if args.mode == "threads" else run_asyncio
+    duration = None if args.operations is not None else args.duration
+    start = time.perf_counter()
+    run(workload, recorder, workers=args.workers, duration=duration,
+        operations=args.operations, seed_val=args.seed)
+    elapsed = time.perf_counter() - start
+
+    results = summarize(recorder, elapsed, tagged_rpc_counts=counts)
+    if args.json:
+        print(json.dumps({"elapsed": elapsed,
+                          "results": [stat._asdict() for stat in results]},
+                         indent=2))
+    else:
+        print("{} workers ({}), {:.1f}s, backend: {}".format(
+            args.workers, args.mode, elapsed, args.backend))
+        print(format_report(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,950 @@
+"""
+In-process stand-in for Firestore, for tests, benchmarks and load tests
+    that run without credentials. See MemoryBackend.
+
+Implements the subset of the client API that firestore_odm uses:
+    document get/set/update/delete, collection streams, queries (where,
+    select, order_by, cursors, offset, limit), get_all, WriteBatch'es,
+    transactions (including firestore.transactional), and snapshot
+    listeners, with a sync and an async client.
+"""
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from functools import cmp_to_key
+from itertools import count
+
+from google.api_core.exceptions import NotFound, AlreadyExists, Aborted
+from google.cloud.firestore import DocumentSnapshot, DocumentReference, \
+    DELETE_FIELD, SERVER_TIMESTAMP
+from google.cloud.firestore_v1.async_document import AsyncDocumentReference
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
+from google.cloud.firestore_v1.field_path import FieldPath, \
+    parse_field_path
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+from .backend import Backend
+from .utils import random_id
+
+
+# Tag of the RPCs made in the current context (see MemoryBackend.tag)
+_rpc_tag = contextvars.ContextVar("firestore_odm_rpc_tag", default=None)
+
+
+class MemoryBackend(Backend):
+    """
+    Backend with documents stored in memory (MemoryStore), shared by
+        the clients it creates, eg.
+
+        backend = MemoryBackend(latency=0.005)
+        Context.use_backend(backend)
+        ...
+        backend.rpc_counts["commit"]
+
+    Each call that would be an RPC to Firestore ("get", "get_all",
+        "run_query", "commit", "listen") is counted in rpc_counts and
+        waits for the injected latency. RPCs made in a tag block are
+        also counted in tagged_rpc_counts under (tag, rpc).
+    """
+
+    def __init__(self, latency=0.0):
+        """
+
+        :param latency: seconds each RPC waits for, or a function that
+                    returns the seconds (eg. to add jitter)
+        """
+        self.latency = latency
+        self.store = MemoryStore()
+        self.rpc_counts = Counter()
+        self.tagged_rpc_counts = Counter()
+        self._lock = threading.Lock()
+
+    def client(self, config=None):
+        return MemoryClient(self)
+
+    def async_client(self, config=None):
+        return MemoryAsyncClient(self)
+
+    def _count(self, rpc) -> float:
+        tag = _rpc_tag.get()
+        with self._lock:
+            self.rpc_counts[rpc] += 1
+            if tag is not None:
+                self.tagged_rpc_counts[(tag, rpc)] += 1
+        return self.latency() if callable(self.latency) else self.latency
+
+    def rpc(self, rpc) -> None:
+        """ Counts an RPC and waits for the latency.
+        """
+        latency = self._count(rpc)
+        if latency:
+            time.sleep(latency)
+
+    async def arpc(self, rpc) -> None:
+        """ Counts an RPC and waits for the latency without blocking the
+                event loop.
+        """
+        latency = self._count(rpc)
+        if latency:
+            await asyncio.sleep(latency)
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.rpc_counts.clear()
+            self.tagged_rpc_counts.clear()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def tag(tag):
+        """ Context manager that tags the RPCs made in the current thread
+                or asyncio task, eg. with the operation that makes them.
+        """
+        token = _rpc_tag.set(tag)
+        try:
+            yield
+        finally:
+            _rpc_tag.reset(token)
+
+
+class MemoryStore:
+    """
+    Documents of a MemoryBackend, as dictionaries keyed by collection
+        path and document id. Stored dictionaries are never modified:
+        each write replaces the dictionary of the document, so that
+        they are copied into snapshots outside of the lock.
+    """
+
+    def __init__(self):
+        self.collections = dict()
+        self.versions = dict()
+        self.listeners = list()
+        self._lock = threading.RLock()
+        self._listener_lock = threading.RLock()
+
+    def get(self, path):
+        """ Returns (data, version) of the document at path, where data
+                is None for a missing document.
+        """
+        collection_path, _, doc_id = path.rpartition("/")
+        with self._lock:
+            d = self.collections.get(collection_path, dict()).get(doc_id)
+            return d, self.versions.get(path, 0)
+
+    def list(self, collection_path):
+        """ Returns a list of (doc_id, data) in a collection.
+        """
+        with self._lock:
+            return list(self.collections.get(collection_path,
+                                             dict()).items())
+
+    def commit(self, writes, reads=None) -> None:
+        """ Applies writes atomically, and notifies listeners.
+
+        :param writes: a list of (op, path, data, option), where op is
+                    "set" (option is merge), "update", "create" or
+                    "delete"
+        :param reads: a dictionary from paths read in a transaction to
+                    the versions read. If a document changed since,
+                    raises Aborted and applies nothing.
+        :return:
+        """
+        with self._lock:
+            for path, version in (reads or dict()).items():
+                if self.versions.get(path, 0) != version:
+                    raise Aborted("Document changed in transaction: {}"
+                                  .format(path))
+
+            staged = dict()
+            for op, path, data, option in writes:
+                cur = staged[path] if path in staged \
+                    else self.get(path)[0]
+                staged[path] = _apply_write(cur, op, path, data, option)
+
+            for path, d in staged.items():
+                collection_path, _, doc_id = path.rpartition("/")
+                docs = self.collections.setdefault(collection_path, dict())
+                if d is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = d
+                self.versions[path] = self.versions.get(path, 0) + 1
+
+        self.notify()
+
+    def add_listener(self, watch) -> None:
+        with self._listener_lock:
+            self.listeners.append(watch)
+            watch.notify()
+
+    def remove_listener(self, watch) -> None:
+        with self._listener_lock:
+            if watch in self.listeners:
+                self.listeners.remove(watch)
+
+    def notify(self) -> None:
+        """ Sends changes to listeners, one commit at a time.
+        """
+        with self._listener_lock:
+            for watch in list(self.listeners):
+                watch.notify()
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _resolve(val):
+    """ Returns a copy of a value written, with SERVER_TIMESTAMP
+            replaced by the current time.
+    """
+    if val is SERVER_TIMESTAMP:
+        return _now()
+    elif isinstance(val, dict):
+        return {key: _resolve(elem) for key, elem in val.items()
+                if elem is not DELETE_FIELD}
+    elif isinstance(val, (list, tuple)):
+        return [_resolve(elem) for elem in val]
+    else:
+        return val
+
+
+def _split_path(field_path):
+    """ Returns the parts of a field path (string or FieldPath).
+    """
+    if isinstance(field_path, FieldPath):
+        return list(field_path.parts)
+    return parse_field_path(field_path)
+
+
+def _set_field(d, parts, val) -> None:
+    """ Sets the value at parts of d, copying the dictionaries on the
+            way so that the stored dictionaries are not modified.
+    """
+    for key in parts[:-1]:
+        child = d.get(key, None)
+        child = dict(child) if isinstance(child, dict) else dict()
+        d[key] = child
+        d = child
+    if val is DELETE_FIELD:
+        d.pop(parts[-1], None)
+    else:
+        d[parts[-1]] = _resolve(val)
+
+
+def _merge(d, data) -> dict:
+    res = dict(d)
+    for key, val in data.items():
+        if isinstance(val, dict) and isinstance(res.get(key, None), dict):
+            res[key] = _merge(res[key], val)
+        elif val is DELETE_FIELD:
+            res.pop(key, None)
+        else:
+            res[key] = _resolve(val)
+    return res
+
+
+def _apply_write(cur, op, path, data, option):
+    """ Returns the data of a document after a write.
+
+    :param cur: data of the document before the write (None if missing)
+    :return: data, or None if the document is deleted
+    """
+    if op == "set":
+        if option and cur is not None:
+            return _merge(cur, data)
+        return _resolve(data)
+    elif op == "create":
+        if cur is not None:
+            raise AlreadyExists("Document already exists: {}".format(path))
+        return _resolve(data)
+    elif op == "update":
+        if cur is None:
+            raise NotFound("No document to update: {}".format(path))
+        res = dict(cur)
+        for field_path, val in data.items():
+            _set_field(res, _split_path(field_path), val)
+        return res
+    elif op == "delete":
+        return None
+    else:
+        raise ValueError("Unknown write op: {}".format(op))
+
+
+# Returned by _get_field when a field is not set
+_MISSING = object()
+
+
+def _get_field(d, parts):
+    for key in parts:
+        if not isinstance(d, dict) or key not in d:
+            return _MISSING
+        d = d[key]
+    return d
+
+
+def _type_rank(val) -> int:
+    """ Returns the position of the type of val in the Firestore
+            ordering of value types.
+    """
+    if val is None:
+        return 0
+    elif isinstance(val, bool):
+        return 1
+    elif isinstance(val, (int, float)):
+        return 2
+    elif isinstance(val, datetime):
+        return 3
+    elif isinstance(val, str):
+        return 4
+    elif isinstance(val, bytes):
+        return 5
+    elif isinstance(val, BaseDocumentReference):
+        return 6
+    elif isinstance(val, (list, tuple)):
+        return 8
+    elif isinstance(val, dict):
+        return 9
+    else:
+        return 7
+
+
+def _sort_key(val):
+    """ Returns a key that orders values as Firestore does.
+    """
+    rank = _type_rank(val)
+    if rank == 0:
+        return rank,
+    elif isinstance(val, BaseDocumentReference):
+        return rank, tuple(val.path.split("/"))
+    elif rank == 8:
+        return rank, tuple(_sort_key(elem) for elem in val)
+    elif rank == 9:
+        return rank, tuple((key, _sort_key(elem))
+                           for key, elem in sorted(val.items()))
+    elif rank == 7:
+        return rank, repr(val)
+    else:
+        return rank, val
+
+
+def _eq(a, b) -> bool:
+    return _type_rank(a) == _type_rank(b) and _sort_key(a) == _sort_key(b)
+
+
+def _match(val, op_string, value) -> bool:
+    """ Returns whether a field value matches a filter.
+    """
+    if val is _MISSING:
+        return False
+    if op_string == "==":
+        return _eq(val, value)
+    elif op_string == "!=":
+        return not _eq(val, value)
+    elif op_string in ("<", "<=", ">", ">="):
+        if _type_rank(val) != _type_rank(value):
+            return False
+        a, b = _sort_key(val), _sort_key(value)
+        return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op_string]
+    elif op_string == "in":
+        return any(_eq(val, elem) for elem in value)
+    elif op_string == "not-in":
+        return not any(_eq(val, elem) for elem in value)
+    elif op_string == "array_contains":
+        return isinstance(val, list) and any(_eq(elem, value) for elem in val)
+    elif op_string == "array_contains_any":
+        return isinstance(val, list) and any(
+            _eq(elem, other) for elem in val for other in value)
+    else:
+        raise ValueError("Unsupported operator: {}".format(op_string))
+
+
+# Field path string of the document name, used to order by document
+_NAME = "__name__"
+
+_INEQUALITY_OPS = ("<", "<=", ">", ">=", "!=", "not-in")
+
+
+class MemoryQuery:
+    """
+    Query on a collection of a MemoryStore, with the interface of
+        google.cloud.firestore.Query. Queries are immutable: each
+        method returns a new query.
+    """
+
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, parent, filters=(), projection=None, orders=(),
+                 offset=None, limit=None, start=None, end=None):
+        """
+
+        :param parent: MemoryCollectionReference
+        :param filters: a tuple of (field_path, op_string, value)
+        :param projection: field paths selected, or None for all
+        :param orders: a tuple of (field_path, direction)
+        :param start: (cursor, before) or None
+        :param end: (cursor, before) or None
+        """
+        self._parent = parent
+        self._filters = filters
+        self._projection = projection
+        self._orders = orders
+        self._offset = offset
+        self._limit = limit
+        self._start = start
+        self._end = end
+
+    def _copy(self, **kwargs):
+        attrs = dict(
+            filters=self._filters,
+            projection=self._projection,
+            orders=self._orders,
+            offset=self._offset,
+            limit=self._limit,
+            start=self._start,
+            end=self._end,
+        )
+        attrs.update(kwargs)
+        return self._query_cls(self._parent, **attrs)
+
+    @property
+    def _query_cls(self):
+        return MemoryQuery
+
+    def where(self, field_path=None, op_string=None, value=None,
+              filter=None):
+        if filter is not None:
+            field_path, op_string, value = \
+                filter.field_path, filter.op_string, filter.value
+        return self._copy(
+            filters=self._filters + ((field_path, op_string, value),))
+
+    def select(self, field_paths):
+        return self._copy(projection=list(field_paths))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip):
+        return self._copy(offset=num_to_skip)
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, True))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, False))
+
+    def end_at(self, document_fields_or_snapshot):
+        return self._copy(end=(document_fields_or_snapshot, False))
+
+    def end_before(self, document_fields_or_snapshot):
+        return self._copy(end=(document_fields_or_snapshot, True))
+
+    def _get_orders(self):
+        """ Returns the orders with the implicit orders of Firestore:
+                by the field of an inequality filter if there is no
+                order, then by document name.
+        """
+        orders = list(self._orders)
+        if len(orders) == 0:
+            for field_path, op_string, _ in self._filters:
+                if op_string in _INEQUALITY_OPS:
+                    orders.append((field_path, self.ASCENDING))
+                    break
+        if all(field_path != _NAME for field_path, _ in orders):
+            direction = orders[-1][1] if orders else self.ASCENDING
+            orders.append((_NAME, direction))
+        return orders
+
+    def _cursor_values(self, cursor, orders):
+        if isinstance(cursor, DocumentSnapshot):
+            return [_order_value(cursor.reference.path,
+                                 cursor.to_dict() or dict(), field_path)
+                    for field_path, _ in orders]
+        elif isinstance(cursor, dict):
+            return [cursor[field_path] for field_path, _ in orders
+                    if field_path in cursor]
+        else:
+            return list(cursor)
+
+    def _run(self):
+        """ Returns the snapshots of the results.
+        """
+        client = self._parent._client
+        collection_path = self._parent.path
+        filters = [(_split_path(field_path), op_string, value)
+                   for field_path, op_string, value in self._filters]
+        orders = self._get_orders()
+
+        rows = list()
+        for doc_id, d in client._backend.store.list(collection_path):
+            if not all(_match(_get_field(d, parts), op_string, value)
+                       for parts, op_string, value in filters):
+                continue
+            path = collection_path + "/" + doc_id
+            key = [_order_value(path, d, field_path)
+                   for field_path, _ in orders]
+            if any(val is _MISSING for val in key):
+                # Documents without an order field are not in results
+                continue
+            rows.append((key, path, d))
+
+        def cmp_keys(a, b):
+            for (field_path, direction), x, y in zip(orders, a, b):
+                x, y = _sort_key(x), _sort_key(y)
+                if x != y:
+                    res = -1 if x < y else 1
+                    return -res if direction == self.DESCENDING else res
+            return 0
+
+        rows.sort(key=cmp_to_key(lambda a, b: cmp_keys(a[0], b[0])))
+
+        if self._start is not None:
+            cursor, before = self._start
+            values = self._cursor_values(cursor, orders)
+            rows = [row for row in rows
+                    if (cmp_keys(row[0], values) >= 0 if before
+                        else cmp_keys(row[0], values) > 0)]
+        if self._end is not None:
+            cursor, before = self._end
+            values = self._cursor_values(cursor, orders)
+            rows = [row for row in rows
+                    if (cmp_keys(row[0], values) < 0 if before
+                        else cmp_keys(row[0], values) <= 0)]
+
+        if self._offset is not None:
+            rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+
+        return [client._snapshot(path, self._project(d))
+                for _, path, d in rows]
+
+    def _project(self, d):
+        if self._projection is None:
+            return d
+        res = dict()
+        for field_path in self._projection:
+            parts = _split_path(field_path)
+            val = _get_field(d, parts)
+            if val is not _MISSING:
+                _set_field(res, parts, val)
+        return res
+
+    def stream(self, transaction=None):
+        self._parent._client._backend.rpc("run_query")
+        docs = self._run()
+        if transaction is not None:
+            for snapshot in docs:
+                transaction._record_read(snapshot.reference.path)
+        yield from docs
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+    def on_snapshot(self, callback):
+        """ Calls callback(docs, changes, read_time) with the results
+                now and after each commit that changes them.
+
+        :return: MemoryWatch; call unsubscribe() to stop
+        """
+        return MemoryWatch(self._parent._client, self._run, callback)
+
+
+def _order_value(path, d, field_path):
+    if field_path == _NAME:
+        return DocumentReference(*path.split("/"))
+    return _get_field(d, _split_path(field_path))
+
+
+class MemoryCollectionReference(MemoryQuery):
+    """
+    Collection of a MemoryStore, with the interface of
+        google.cloud.firestore.CollectionReference.
+    """
+
+    def __init__(self, client, *path):
+        super().__init__(parent=self)
+        self._client = client
+        self._path = path
+
+    def _copy(self, **kwargs):
+        return self._query_cls(self, **kwargs)
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    @property
+    def path(self):
+        return "/".join(self._path)
+
+    @property
+    def parent(self):
+        if len(self._path) == 1:
+            return None
+        return self._client.document(*self._path[:-1])
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = random_id()
+        return self._client.document(*(self._path + (document_id,)))
+
+    def add(self, document_data, document_id=None):
+        doc_ref = self.document(document_id)
+        return _now(), doc_ref.create(document_data)
+
+    def list_documents(self, page_size=None):
+        return [self.document(doc_id) for doc_id, _ in
+                self._client._backend.store.list(self.path)]
+
+
+class MemoryDocumentReference(DocumentReference):
+    """
+    Document of a MemoryStore. A DocumentReference, so that values and
+        isinstance checks behave as with Firestore.
+    """
+
+    def get(self, field_paths=None, transaction=None, **kwargs):
+        self._client._backend.rpc("get")
+        return self._client._get(self, transaction=transaction)
+
+    def _commit(self, op, data=None, option=None):
+        self._client._backend.rpc("commit")
+        self._client._backend.store.commit([(op, self.path, data, option)])
+        return _now()
+
+    def set(self, document_data, merge=False, **kwargs):
+        return self._commit("set", document_data, merge)
+
+    def create(self, document_data, **kwargs):
+        return self._commit("create", document_data)
+
+    def update(self, field_updates, option=None, **kwargs):
+        return self._commit("update", field_updates)
+
+    def delete(self, option=None, **kwargs):
+        return self._commit("delete")
+
+    def on_snapshot(self, callback):
+        def read():
+            snapshot = self._client._get(self)
+            return [snapshot] if snapshot.exists else []
+        return MemoryWatch(self._client, read, callback)
+
+
+class MemoryWriteBatch:
+    """
+    WriteBatch of a MemoryStore, committed atomically.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = list()
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference.path, document_data, merge))
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference.path, document_data, None))
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(("update", reference.path, field_updates, None))
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference.path, None, None))
+
+    def commit(self, **kwargs):
+        self._client._backend.rpc("commit")
+        self._client._backend.store.commit(self._writes)
+        results = [_now() for _ in self._writes]
+        self._writes = list()
+        return results
+
+
+# Ids of transactions
+_transaction_ids = count(1)
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """
+    Transaction of a MemoryStore, usable with firestore.transactional.
+        The commit is aborted (and retried by firestore.transactional)
+        if a document read in the transaction changed since it was read.
+    """
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._reads = dict()
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    @property
+    def id(self):
+        return self._id
+
+    def _record_read(self, path) -> None:
+        if path not in self._reads:
+            self._reads[path] = self._client._backend.store.get(path)[1]
+
+    def _clean_up(self) -> None:
+        self._writes = list()
+        self._reads = dict()
+        self._id = None
+
+    def _begin(self, retry_id=None) -> None:
+        self._id = str(next(_transaction_ids)).encode("ascii")
+
+    def _rollback(self) -> None:
+        self._clean_up()
+
+    def _commit_writes(self):
+        """ Commits the writes if no document read changed since, and
+                ends the transaction.
+        """
+        writes, reads = self._writes, self._reads
+        self._clean_up()
+        self._client._backend.store.commit(writes, reads=reads)
+        return [_now() for _ in writes]
+
+    def _commit(self):
+        self._client._backend.rpc("commit")
+        return self._commit_writes()
+
+    def commit(self, **kwargs):
+        return self._commit()
+
+    def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+
+class MemoryWatch:
+    """
+    Snapshot listener: calls callback(docs, changes, read_time) with the
+        documents read and the DocumentChange's since the last call.
+    """
+
+    def __init__(self, client, read, callback):
+        self._client = client
+        self._read = read
+        self._callback = callback
+        self._docs = None
+        self._versions = None
+        client._backend.rpc("listen")
+        client._backend.store.add_listener(self)
+
+    def notify(self) -> None:
+        docs = self._read()
+        versions = self._client._backend.store.versions
+        cur = {snapshot.reference.path: snapshot for snapshot in docs}
+        cur_versions = {path: versions.get(path, 0) for path in cur}
+        prev, prev_versions = self._docs, self._versions
+        changes = list()
+        if prev is not None:
+            for i, (path, snapshot) in enumerate(prev.items()):
+                if path not in cur:
+                    changes.append(DocumentChange(ChangeType.REMOVED,
+                                                  snapshot, i, -1))
+        for i, (path, snapshot) in enumerate(cur.items()):
+            if prev is None or path not in prev:
+                changes.append(DocumentChange(ChangeType.ADDED,
+                                              snapshot, -1, i))
+            elif prev_versions[path] != cur_versions[path]:
+                changes.append(DocumentChange(ChangeType.MODIFIED,
+                                              snapshot, i, i))
+        self._docs, self._versions = cur, cur_versions
+        if prev is None or len(changes) != 0:
+            self._callback(docs, changes, _now())
+
+    def unsubscribe(self) -> None:
+        self._client._backend.store.remove_listener(self)
+
+
+class MemoryClient:
+    """
+    Client of a MemoryBackend, with the interface of
+        google.cloud.firestore.Client.
+    """
+
+    _collection_cls = MemoryCollectionReference
+    _document_cls = MemoryDocumentReference
+
+    def __init__(self, backend: MemoryBackend):
+        self._backend = backend
+
+    def collection(self, *collection_path):
+        path = tuple("/".join(collection_path).split("/"))
+        return self._collection_cls(self, *path)
+
+    def document(self, *document_path):
+        path = tuple("/".join(document_path).split("/"))
+        return self._document_cls(*path, client=self)
+
+    def _snapshot(self, path, d):
+        return DocumentSnapshot(
+            self.document(path), d, exists=d is not None,
+            read_time=None, create_time=None, update_time=None)
+
+    def _get(self, doc_ref, transaction=None):
+        path = doc_ref.path
+        if transaction is not None:
+            transaction._record_read(path)
+        d, _ = self._backend.store.get(path)
+        return DocumentSnapshot(
+            doc_ref, d, exists=d is not None,
+            read_time=None, create_time=None, update_time=None)
+
+    def get_all(self, references, field_paths=None, transaction=None,
+                **kwargs):
+        self._backend.rpc("get_all")
+        for doc_ref in references:
+            yield self._get(doc_ref, transaction=transaction)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return MemoryTransaction(self, max_attempts=max_attempts,
+                                 read_only=read_only)
+
+    def collections(self):
+        return [self.collection(path) for path
+                in self._backend.store.collections if "/" not in path]
+
+
+class MemoryAsyncQuery(MemoryQuery):
+    """
+    MemoryQuery with the interface of
+        google.cloud.firestore.AsyncQuery.
+    """
+
+    @property
+    def _query_cls(self):
+        return MemoryAsyncQuery
+
+    async def stream(self, transaction=None):
+        await self._parent._client._backend.arpc("run_query")
+        for snapshot in self._run():
+            if transaction is not None:
+                transaction._record_read(snapshot.reference.path)
+            yield snapshot
+
+    async def get(self, transaction=None):
+        return [snapshot async for snapshot
+                in self.stream(transaction=transaction)]
+
+
+class MemoryAsyncCollectionReference(MemoryAsyncQuery,
+                                     MemoryCollectionReference):
+    """
+    Collection of a MemoryStore for the async client.
+    """
+
+    async def add(self, document_data, document_id=None):
+        doc_ref = self.document(document_id)
+        return _now(), await doc_ref.create(document_data)
+
+
+class MemoryAsyncDocumentReference(AsyncDocumentReference):
+    """
+    Document of a MemoryStore for the async client.
+    """
+
+    async def get(self, field_paths=None, transaction=None, **kwargs):
+        await self._client._backend.arpc("get")
+        return self._client._get(self, transaction=transaction)
+
+    async def _commit(self, op, data=None, option=None):
+        await self._client._backend.arpc("commit")
+        self._client._backend.store.commit([(op, self.path, data, option)])
+        return _now()
+
+    async def set(self, document_data, merge=False, **kwargs):
+        return await self._commit("set", document_data, merge)
+
+    async def create(self, document_data, **kwargs):
+        return await self._commit("create", document_data)
+
+    async def update(self, field_updates, option=None, **kwargs):
+        return await self._commit("update", field_updates)
+
+    async def delete(self, option=None, **kwargs):
+        return await self._commit("delete")
+
+
+class MemoryAsyncWriteBatch(MemoryWriteBatch):
+
+    async def commit(self, **kwargs):
+        await self._client._backend.arpc("commit")
+        self._client._backend.store.commit(self._writes)
+        results = [_now() for _ in self._writes]
+        self._writes = list()
+        return results
+
+
+class MemoryAsyncTransaction(MemoryTransaction):
+    """
+    Transaction of a MemoryStore for the async client, usable with
+        firestore.async_transactional. See MemoryTransaction.
+    """
+
+    async def _begin(self, retry_id=None) -> None:
+        super()._begin(retry_id=retry_id)
+
+    async def _rollback(self) -> None:
+        super()._rollback()
+
+    async def _commit(self):
+        await self._client._backend.arpc("commit")
+        return self._commit_writes()
+
+    async def commit(self, **kwargs):
+        return await self._commit()
+
+    async def get_all(self, references, **kwargs):
+        return self._client.get_all(references, transaction=self)
+
+    async def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, BaseDocumentReference):
+            return self._client.get_all([ref_or_query], transaction=self)
+        return ref_or_query.stream(transaction=self)
+
+
+class MemoryAsyncClient(MemoryClient):
+    """
+    Client of a MemoryBackend, with the interface of
+        google.cloud.firestore.AsyncClient.
+    """
+
+    _collection_cls = MemoryAsyncCollectionReference
+    _document_cls = MemoryAsyncDocumentReference
+
+    async def get_all(self, references, field_paths=None, transaction=None,
+                      **kwargs):
+        await self._backend.arpc("get_all")
+        for doc_ref in references:
+            yield self._get(doc_ref, transaction=transaction)
+
+    def batch(self):
+        return MemoryAsyncWriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return MemoryAsyncTransaction(self, max_attempts=max_attempts,
+                                      read_only=read_only)
@@ -36,6 +36,11 @@ class ModelRegistry(type):
                 mcs._tree[base.__name__].add(new_cls.__name__)
                 mcs._tree_r[new_cls.__name__].add(base.__name__)
 
+        # Notifies ancestors so that they may invalidate their caches
+        for ancestor in new_cls.__mro__[1:]:
+            if isinstance(ancestor, ModelRegistry):
+                ancestor._on_descendant_registered(new_cls)
+
         return new_cls
 
     @classmethod
@@ -63,6 +68,32 @@ class ModelRegistry(type):
 
 class BaseRegisteredModel(metaclass=ModelRegistry):
 
+    __slots__ = ()
+
+    @classmethod
+    def _on_descendant_registered(cls, descendant):
+        """ Called when a subclass (direct or not) of the class is
+                registered. No-op by default.
+
+        :param descendant: the subclass registered
+        :return:
+        """
+        pass
+
+    @classmethod
+    def _get_descendants(cls):
+        """ Returns all registered subclasses of the class, direct
+                or not.
+        """
+        res = set()
+        stack = [cls]
+        while len(stack) != 0:
+            for child in stack.pop()._get_children():
+                if child not in res:
+                    res.add(child)
+                    stack.append(child)
+        return res
+
     @classmethod
     def _get_children(cls):
         return {cls.get_cls_from_name(c_str)
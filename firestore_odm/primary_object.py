@@ -17,6 +17,8 @@ class PrimaryObjectMeta(SerializableMeta):
             meta = klass.Meta
             if hasattr(meta, "collection_name"):
                 klass._collection_name = meta.collection_name
+            if hasattr(meta, "cache"):
+                klass._cache = meta.cache
         return klass
 
 
@@ -34,6 +36,8 @@ class PrimaryObject(FirestoreObject, QueryMixin, metaclass=PrimaryObjectMeta):
 
     """
 
+    __slots__ = ()
+
     # Abstract property: MUST OVERRIDE
     # TODO: add abstract property decorator
     _collection_name = None
@@ -41,25 +45,47 @@ class PrimaryObject(FirestoreObject, QueryMixin, metaclass=PrimaryObjectMeta):
     @classmethod
     def get_schema_cls(cls):
         """ Returns schema_cls or the union of all schemas
-                of subclasses. Should only be used on the root
-                DomainModel.
-            Does not cache the result.
+                of subclasses (direct or not). Should only be used
+                on the root DomainModel.
+            The union is cached on the class until a new subclass
+                is registered.
         :return:
         """
-        d = dict()
-        if cls._schema_cls is None:
-            for child in cls._get_children():
-                for key, val in child.get_schema_obj().fields.items():
-                    field_cls = val.__class__
+        if cls._schema_cls is not None:
+            return cls._schema_cls
 
-                    if key in d and d[key] != field_cls:
-                        raise ValueError
+        tmp_schema = cls.__dict__.get("_union_schema_cls", None)
+        if tmp_schema is None:
+            tmp_schema = cls._get_union_schema_cls()
+            cls._union_schema_cls = tmp_schema
+        return tmp_schema
 
-                    d[key] = field_cls
-            tmp_schema = Schema.from_dict(d)
-            return tmp_schema
-        else:
-            return cls._schema_cls
+    @classmethod
+    def _get_union_schema_cls(cls):
+        d = dict()
+        for child in cls._get_descendants():
+            if child._schema_cls is None:
+                continue
+            for key, val in child.get_schema_obj().fields.items():
+                if key in d and d[key].__class__ != val.__class__:
+                    raise ValueError(
+                        "Field {} of {} conflicts with field of "
+                        "the same name in another subclass. "
+                        .format(key, child.__name__))
+
+                d[key] = val
+        return Schema.from_dict(d)
+
+    @classmethod
+    def _on_descendant_registered(cls, descendant):
+        """ Invalidates the cached union schema, and the schema object
+                and plans compiled from it.
+        """
+        if "_union_schema_cls" in cls.__dict__:
+            for name in ("_union_schema_cls", "_schema_obj", "_export_plan",
+                         "_import_plan", "_construction_plan"):
+                if name in cls.__dict__:
+                    delattr(cls, name)
 
     def __init__(self, doc_id=None, doc_ref=None, **kwargs):
         if doc_ref is None:
@@ -116,3 +142,64 @@ class PrimaryObject(FirestoreObject, QueryMixin, metaclass=PrimaryObjectMeta):
             doc_ref = cls._get_collection().document(doc_id)
 
         return super().get(doc_ref=doc_ref, transaction=transaction)
+
+    @classmethod
+    async def aget(cls, *, doc_ref_str=None, doc_ref=None, doc_id=None,
+                   transaction=None):
+        """ Returns the instance from doc_id, read with the async
+                client (CTX.adb). See get.
+
+        :param doc_ref_str: DocumentReference path string
+        :param doc_ref: DocumentReference
+        :param doc_id: gets the instance from self.collection.document(doc_id)
+        :param transaction: async firestore transaction
+        :return:
+        """
+
+        if doc_ref_str is not None:
+            doc_ref = CTX.db.document(doc_ref_str)
+
+        if doc_ref is None:
+            doc_ref = cls._get_collection().document(doc_id)
+
+        return await super().aget(doc_ref=doc_ref, transaction=transaction)
+
+    @classmethod
+    def get_many(cls, *, doc_ids=None, doc_refs=None,
+                 transaction: Transaction=None):
+        """ Returns instances from a list of doc_id with the multi-get
+                RPC of the client.
+
+        :param doc_ids: gets the instances from
+                    self.collection.document(doc_id) for each doc_id
+        :param doc_refs: DocumentReferences (used when doc_ids is None)
+        :param transaction: firestore transaction
+        :return: a list of instances in the order of doc_ids, with None
+                    in place of documents that do not exist
+        """
+        if doc_refs is None:
+            collection = cls._get_collection()
+            doc_refs = [collection.document(doc_id) for doc_id in doc_ids]
+
+        return super().get_many(doc_refs=doc_refs, transaction=transaction)
+
+    @classmethod
+    def _to_doc_ref(cls, item):
+        """ Returns the DocumentReference of an item passed to
+                delete_many, where a string is read as a doc_id.
+        """
+        if isinstance(item, str):
+            return cls._get_collection().document(item)
+        return super()._to_doc_ref(item)
+
+    @classmethod
+    def delete_many(cls, objs_or_ids, *, max_workers=None):
+        """ Deletes documents with WriteBatch commits.
+
+        :param objs_or_ids: objects, DocumentReferences, or doc_id's
+                    of documents in the collection of the class
+        :param max_workers: If set, up to max_workers commits run
+                    concurrently.
+        :return:
+        """
+        return super().delete_many(objs_or_ids, max_workers=max_workers)
@@ -1,7 +1,67 @@
-from google.cloud.firestore import DocumentSnapshot, CollectionReference, Query
+import asyncio
+import base64
+import json
+from datetime import datetime
+from itertools import islice
+
+from google.cloud.firestore import DocumentSnapshot, CollectionReference, \
+    Query, DocumentReference
 
 from firestore_odm import cmp
-from firestore_odm.utils import snapshot_to_obj
+from firestore_odm.context import Context as CTX
+from firestore_odm.fanout import FanoutQuery, FANOUT_OPS, split_filters, \
+    implicit_order
+from firestore_odm.helpers import Page
+from firestore_odm.instrumentation import instrument_stream
+from firestore_odm.live_cache import LiveCache
+from firestore_odm.utils import snapshot_to_obj, to_sync_snapshot
+
+
+# Keyword arguments of QueryMixin._get_query other than filters
+_QUERY_OPTIONS = (
+    "acsending",
+    "descending",
+    "end_at",
+    "end_before",
+    "limit",
+    "offset",
+    "order_by",
+    "select",
+    "start_after",
+    "start_at",
+)
+
+# Options of where that paginate sets for each page
+_PAGINATE_OPTIONS = ("limit", "start_at", "start_after")
+
+# Number of query results hydrated together when relationships
+#   are prefetched
+PREFETCH_PAGE_SIZE = 100
+
+
+def _encode_cursor_value(val):
+    """ Returns a JSON value for a value of a page cursor.
+    """
+    if isinstance(val, datetime):
+        return {"datetime": val.isoformat()}
+    elif isinstance(val, DocumentReference):
+        return {"ref": val.path}
+    elif val is None or isinstance(val, (bool, int, float, str)):
+        return val
+    elif isinstance(val, list):
+        return [_encode_cursor_value(elem) for elem in val]
+    raise ValueError("Cannot encode value in a page cursor: {!r}"
+                     .format(val))
+
+
+def _decode_cursor_value(val):
+    if isinstance(val, dict):
+        if "datetime" in val:
+            return datetime.fromisoformat(val["datetime"])
+        return CTX.db.document(val["ref"])
+    elif isinstance(val, list):
+        return [_decode_cursor_value(elem) for elem in val]
+    return val
 
 
 def convert_query_ref(func):
@@ -11,27 +71,75 @@ def convert_query_ref(func):
     :param super_cls:
     :return:
     """
-    def call(cls, *args, **kwargs):
+    def call(cls, *args, prefetch=None, **kwargs):
         query_ref = func(cls, *args, **kwargs)
-        for res in query_ref.stream():
-            assert isinstance(res, DocumentSnapshot)
-            yield snapshot_to_obj(snapshot=res, super_cls=cls)
+        return cls._stream_objs(query_ref, prefetch=prefetch,
+                                select=kwargs.get("select", None))
     return call
 
 
 class QueryMixin:
+
+    __slots__ = ()
+
+    @classmethod
+    def _hydrate(cls, snapshot, select=None):
+        """ Returns the object for a document snapshot of a query.
+
+        :param snapshot: firestore document snapshot
+        :param select: attribute names of the projection of the query.
+                    If set, the object is marked as a partial object
+                    with these fields loaded.
+        :return:
+        """
+        # Partial objects are not added to the Session
+        obj = snapshot_to_obj(snapshot=snapshot, super_cls=cls,
+                              use_session=select is None)
+        if select is not None and obj is not None:
+            obj._mark_partial(select)
+        return obj
+
     @classmethod
-    def all(cls):
+    @instrument_stream("query")
+    def _stream_objs(cls, query_ref, prefetch=None, select=None):
+        """ Generator for objects from the documents streamed from a
+                query or collection reference.
+
+        :param query_ref: firestore Query or CollectionReference
+        :param prefetch: names of relationship attributes to prefetch.
+                    If set, results are hydrated in pages of
+                    PREFETCH_PAGE_SIZE, and documents referenced in each
+                    page are retrieved with batched multi-gets.
+        :param select: attribute names of the projection of the query
+                    (see _hydrate)
+        :return:
+        """
+        docs = query_ref.stream()
+
+        if not prefetch:
+            for doc in docs:
+                assert isinstance(doc, DocumentSnapshot)
+                yield cls._hydrate(doc, select=select)
+            return
+
+        while True:
+            page = list(islice(docs, PREFETCH_PAGE_SIZE))
+            if len(page) == 0:
+                return
+            objs = [cls._hydrate(doc, select=select) for doc in page]
+            cls.prefetch_related(objs, attributes=prefetch)
+            yield from objs
+
+    @classmethod
+    def all(cls, prefetch=None):
         """ Generator for all objects in the collection
 
+        :param prefetch: names of relationship attributes to prefetch
+                    (see _stream_objs)
         :return:
         """
         docs_ref: CollectionReference = cls._get_collection()
-        docs = docs_ref.stream()
-        for doc in docs:
-            assert isinstance(doc, DocumentSnapshot)
-
-            yield snapshot_to_obj(snapshot=doc, super_cls=cls)
+        return cls._stream_objs(docs_ref, prefetch=prefetch)
 
     @staticmethod
     def _append_original(*args, cur_where=None) -> Query:
@@ -58,9 +166,10 @@ class QueryMixin:
         if cur_where is None:
             raise ValueError
 
+        schema_cls = cls.get_schema_cls()
         for key, val in kwargs.items():
             comp, other = val if isinstance(val, tuple) else ("==", val)
-            firestore_key = cls.get_schema_cls().f(key)
+            firestore_key = schema_cls.f(key)
             cur_where = cur_where.where(firestore_key, comp, other)
         return cur_where
 
@@ -72,13 +181,14 @@ class QueryMixin:
 
         if len(args) != 0:
 
+            schema_cls = cls.get_schema_cls()
             arg_stack = list( args )
 
             while len(arg_stack) != 0:
 
                 condition = arg_stack.pop(0)
                 key = condition.fieldname
-                firestore_key = cls.get_schema_cls().f(key)
+                firestore_key = schema_cls.f(key)
 
                 for comp, other in condition.constraints:
                     if comp == "_in":
@@ -100,45 +210,544 @@ class QueryMixin:
             raise ValueError
 
         cmp_args = [arg for arg in args if isinstance(arg, cmp.Condition)]
-        remaining_args = [arg for arg in args if arg not in cmp_args]
+        # Note that "arg not in cmp_args" would call Condition.__eq__,
+        #   which appends a constraint to the condition
+        remaining_args = [arg for arg in args
+                          if not isinstance(arg, cmp.Condition)]
         cur_where = cls._append_cmp_style(*cmp_args, cur_where=cur_where)
         cur_where = cls._append_original(*remaining_args, cur_where=cur_where)
         cur_where = cls._append_new_style(**kwargs, cur_where=cur_where)
         return cur_where
 
+    @classmethod
+    def _get_query(cls, *args, cur_where=None, **kwargs):
+        """ Returns the query for the arguments of where.
+
+        :param cur_where: See _build_query
+        :param kwargs: filters (see _append_new_style) and options
+                    (see _build_query)
+        :return:
+        """
+        options = {key: kwargs.pop(key) for key in _QUERY_OPTIONS
+                   if key in kwargs}
+        filters, branches = cls._get_filters(*args, **kwargs)
+        return cls._build_query(filters, branches=branches,
+                                cur_where=cur_where, **options)
+
+    @classmethod
+    def _get_filters(cls, *args, **kwargs):
+        """ Returns the filters for the arguments of where, as
+                (field_path, op_string, value).
+
+        :return: (filters, branches) where branches is None, or a list
+                    of filter lists, one for each combination of the
+                    branches of cmp.Disjunction arguments
+        """
+        disjunctions = [arg for arg in args
+                        if isinstance(arg, cmp.Disjunction)]
+        args = [arg for arg in args if not isinstance(arg, cmp.Disjunction)]
+
+        filters = cls._where_query(*args, cur_where=_FilterRecorder(),
+                                   **kwargs).filters
+
+        branches = None
+        for disjunction in disjunctions:
+            branch_filters = [
+                cls._where_query(*branch, cur_where=_FilterRecorder()).filters
+                for branch in disjunction.branches
+            ]
+            if branches is None:
+                branches = branch_filters
+            else:
+                branches = [a + b for a in branches for b in branch_filters]
+        return filters, branches
+
+    @classmethod
+    def _build_query(cls, filters,
+                     branches=None,
+                     cur_where=None,
+                     acsending=None,
+                     descending=None,
+                     end_at=None,
+                     end_before=None,
+                     limit=None,
+                     offset=None,
+                     order_by=None,
+                     select=None,
+                     start_after=None,
+                     start_at=None):
+        """ Returns the query for filters and options. If an "in"
+                filter has more values than Firestore accepts in one
+                query, or branches are set, returns a FanoutQuery of
+                sub-queries instead.
+
+        :param filters: a list of (field_path, op_string, value)
+        :param branches: None, or a list of filter lists. If set, a
+                    sub-query is run for each branch (with filters) and
+                    results are unioned in a FanoutQuery.
+        :param cur_where: the query to append conditions to. Defaults
+                    to a query on the collection of the class.
+        :param select: attribute names of the fields to read. Results
+                    are partial objects (see FirestoreObject.save).
+        :param order_by: attribute name, or a list of attribute names
+                    to order results by
+        :param descending: If set to True, results are ordered in
+                    descending order of the order_by fields.
+        :param acsending: If set to False, same as descending=True.
+        :param start_at: cursor (see _to_cursor)
+        :param start_after: cursor (see _to_cursor)
+        :param end_at: cursor (see _to_cursor)
+        :param end_before: cursor (see _to_cursor)
+        :param offset: number of results to skip
+        :param limit: maximum number of results
+        :return:
+        """
+
+        if cur_where is None:
+            # Queries are built from the collection of the client in
+            #   Context, so that any Backend can run them
+            cur_where = cls._get_collection()
+
+        schema_cls = cls.get_schema_cls()
+
+        if select is not None:
+            # obj_type is always read to resolve the class of results
+            field_paths = [schema_cls.f(key) for key in select]
+            if "obj_type" not in field_paths:
+                field_paths.append("obj_type")
+            cur_where = cur_where.select(field_paths)
+
+        descending = bool(descending or acsending is False)
+        order_paths = None
+        if order_by is not None:
+            direction = Query.DESCENDING if descending else Query.ASCENDING
+            keys = order_by if isinstance(order_by, list) else [order_by]
+            order_paths = [schema_cls.f(key) for key in keys]
+            for field_path in order_paths:
+                cur_where = cur_where.order_by(
+                    field_path, direction=direction)
+
+        cursors = (
+            ("start_at", start_at),
+            ("start_after", start_after),
+            ("end_at", end_at),
+            ("end_before", end_before),
+        )
+        for method_name, cursor in cursors:
+            if cursor is not None:
+                cur_where = getattr(cur_where, method_name)(
+                    cls._to_cursor(cursor))
+
+        if branches is None:
+            filter_sets = split_filters(filters)
+        else:
+            filter_sets = [filter_set for branch in branches
+                           for filter_set in split_filters(filters + branch)]
+
+        if len(filter_sets) == 1:
+            for f in filter_sets[0]:
+                cur_where = cur_where.where(*f)
+            if offset is not None:
+                cur_where = cur_where.offset(offset)
+            if limit is not None:
+                cur_where = cur_where.limit(count=limit)
+            return cur_where
+
+        # offset is applied to the merged results of sub-queries
+        queries = list()
+        for filter_set in filter_sets:
+            query = cur_where
+            for f in filter_set:
+                query = query.where(*f)
+            if limit is not None:
+                query = query.limit(count=limit + (offset or 0))
+            queries.append(query)
+        if order_paths is None:
+            # Sub-queries are merged in the order Firestore returns
+            #   their results in (assumed to be the same for each)
+            return FanoutQuery(queries,
+                               order_by=implicit_order(filter_sets[0]),
+                               offset=offset, limit=limit)
+        return FanoutQuery(queries, order_by=order_paths,
+                           descending=descending, offset=offset, limit=limit)
+
+    @classmethod
+    def _to_cursor(cls, cursor):
+        """ Returns a cursor for the Query methods start_at, etc.
+
+        :param cursor: a dictionary from attribute names to values of
+                    the order_by fields, a list of values in the order
+                    of order_by, or a DocumentSnapshot
+        :return:
+        """
+        if isinstance(cursor, dict):
+            schema_cls = cls.get_schema_cls()
+            return {schema_cls.f(key): val for key, val in cursor.items()}
+        return cursor
+
+    @classmethod
+    def paginate(cls, *args, page_size, cursor=None, prefetch=None,
+                 **kwargs):
+        """ Returns a generator for pages of the results of
+                where(*args, **kwargs), each read with one query of up
+                to page_size documents that starts after the last
+                document of the previous page.
+
+        :param page_size: maximum number of objects in a page
+        :param cursor: resumes after the last document of a Page
+                    returned earlier, with no read, even if that
+                    document was since deleted or changed
+        :param prefetch: names of relationship attributes to prefetch
+                    for each page (see _stream_objs)
+        :param kwargs: See where. offset skips results before the
+                    first page, and is ignored when resuming from a
+                    cursor. limit, start_at and start_after are set
+                    for each page, and are not accepted.
+        :return: a generator of Page(objs, cursor), where cursor is None
+                    for the last page
+        """
+        for key in _PAGINATE_OPTIONS:
+            if key in kwargs:
+                raise ValueError("paginate sets {} for each page; "
+                                 "use cursor to resume from a page"
+                                 .format(key))
+        offset = kwargs.pop("offset", None)
+        cursor_fields = cls._get_cursor_fields(*args, **kwargs)
+        last_snapshot = None
+        if cursor is not None:
+            last_snapshot = cls._decode_page_cursor(cursor)
+            offset = None
+        return cls._paginate(args, kwargs, page_size=page_size,
+                             offset=offset, last_snapshot=last_snapshot,
+                             cursor_fields=cursor_fields, prefetch=prefetch)
+
+    @classmethod
+    def _paginate(cls, args, kwargs, page_size, offset, last_snapshot,
+                  cursor_fields, prefetch):
+        while True:
+            query = cls._get_query(*args, limit=page_size, offset=offset,
+                                   start_after=last_snapshot, **kwargs)
+            offset = None
+            docs = list(query.stream())
+            if len(docs) == 0:
+                return
+
+            objs = [cls._hydrate(doc, select=kwargs.get("select", None))
+                    for doc in docs]
+            if prefetch:
+                cls.prefetch_related(objs, attributes=prefetch)
+
+            if len(docs) < page_size:
+                yield Page(objs=objs, cursor=None)
+                return
+
+            last_snapshot = docs[-1]
+            yield Page(objs=objs, cursor=cls._encode_page_cursor(
+                last_snapshot, cursor_fields))
+
+    @classmethod
+    def _get_cursor_fields(cls, *args, order_by=None, **kwargs):
+        """ Returns the Firestore field paths that results of
+                where(*args, **kwargs) are ordered by before the
+                document path: the order_by fields, or the field that
+                Firestore orders by implicitly (see fanout.implicit_order).
+        """
+        if order_by is not None:
+            schema_cls = cls.get_schema_cls()
+            keys = order_by if isinstance(order_by, list) else [order_by]
+            return [schema_cls.f(key) for key in keys]
+        filter_kwargs = {key: val for key, val in kwargs.items()
+                         if key not in _QUERY_OPTIONS}
+        filters, branches = cls._get_filters(*args, **filter_kwargs)
+        if branches is not None:
+            filters = filters + branches[0]
+        return implicit_order(filters)
+
+    @staticmethod
+    def _encode_page_cursor(snapshot: DocumentSnapshot,
+                            cursor_fields) -> str:
+        """ Returns an opaque keyset cursor for the page ending in
+                snapshot: the path of the document and the values of
+                cursor_fields.
+        """
+        values = list()
+        for field_path in cursor_fields:
+            try:
+                val = snapshot.get(field_path)
+            except KeyError:
+                val = None
+            values.append([field_path, _encode_cursor_value(val)])
+        s = json.dumps({"path": snapshot.reference.path, "values": values},
+                       separators=(",", ":"))
+        return base64.urlsafe_b64encode(s.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_page_cursor(cursor: str) -> DocumentSnapshot:
+        """ Returns a snapshot with the path and the values of the
+                ordered fields of the last document of the page that
+                cursor was created for, to pass to start_after. The
+                document is not read.
+        """
+        try:
+            s = base64.urlsafe_b64decode(cursor.encode("ascii"))
+            d = json.loads(s.decode("utf-8"))
+            path, values = d["path"], d["values"]
+        except (ValueError, TypeError, KeyError) as e:
+            raise ValueError("Invalid page cursor: {}".format(cursor)) from e
+
+        data = dict()
+        for field_path, val in values:
+            parent = data
+            *parents, key = field_path.split(".")
+            for name in parents:
+                parent = parent.setdefault(name, dict())
+            parent[key] = _decode_cursor_value(val)
+        return DocumentSnapshot(
+            CTX.db.document(path), data, exists=True,
+            read_time=None, create_time=None, update_time=None)
+
+    @classmethod
+    def prepare(cls, *args, prefetch=None, **kwargs):
+        """ Returns a PreparedQuery for the arguments of where, where
+                values may be cmp.Param placeholders that are bound
+                each time the query is run. For example,
+                    q = City.prepare(v.country == Param("country"),
+                                     limit=Param("n"))
+                    cities = list(q.run(country="USA", n=10))
+
+        :param args: See where
+        :param prefetch: See _stream_objs
+        :param kwargs: See where
+        :return:
+        """
+        return PreparedQuery(cls, *args, prefetch=prefetch, **kwargs)
+
     @classmethod
     @convert_query_ref
-    def where(cls, *args,
-              acsending=None,
-              descending=None,
-              end_at=None,
-              end_before=None,
-              limit=None,
-              offset=None,
-              order_by=None,
-              select=None,
-              start_after=None,
-              start_at=None,
-              **kwargs,):
+    def where(cls, *args, **kwargs):
         """ Note that indexes may need to be added from the link provided
                 by firestore in the error messages
 
         TODO: add error handling and argument checking
-        TODO: implement limit, orderby, etc.
+
+        Accepts the options of _get_query (order_by, limit, cursors,
+            etc.).
+
+        Accepts keyword argument "prefetch" with names of relationship
+            attributes to prefetch for the results (see _stream_objs).
+
+        Queries with only equality filters and no options are answered
+            from memory when the class has a live cache (see live_cache).
 
         :param args:
         :param kwargs:
         :return:
         """
+        options = {key: kwargs.pop(key) for key in _QUERY_OPTIONS
+                   if key in kwargs}
+        filters, branches = cls._get_filters(*args, **kwargs)
+        if cls._live_cache is not None and not options and branches is None:
+            live_query = cls._live_cache.query(filters)
+            if live_query is not None:
+                return live_query
+        return cls._build_query(filters, branches=branches, **options)
 
-        cur_where = Query(parent=cls._get_collection(),
-                          # TODO: pass caught kwargs to Query constructor
-                          )
+    @classmethod
+    def live_cache(cls, query=None) -> LiveCache:
+        """ Attaches a snapshot listener to query, and serves get (and
+                where with only equality filters) for the class from
+                the documents it keeps in memory. Replaces the live
+                cache attached earlier. For small collections read
+                often, eg. lookup tables.
+
+        :param query: firestore Query to listen to. Defaults to the
+                    collection of the class. Where is only answered
+                    from memory for the whole collection.
+        :return: LiveCache; call close() to detach the listener
+        """
+        if cls.__dict__.get("_live_cache", None) is not None:
+            cls._live_cache.close()
+        complete = query is None
+        if query is None:
+            query = cls._get_collection()
+        cls._live_cache = LiveCache(cls, query=query, complete=complete)
+        return cls._live_cache
+
+    @classmethod
+    async def _astream_objs(cls, docs, prefetch=None, select=None):
+        """ Async generator for objects from the documents streamed
+                from an async query or collection reference. See
+                _stream_objs. The documents referenced are prefetched
+                with prefetch_related in a thread, since multi-gets
+                are run with the sync client.
+        """
+        page = list()
+        async for doc in docs:
+            doc = to_sync_snapshot(doc)
+            if not prefetch:
+                yield cls._hydrate(doc, select=select)
+                continue
+            page.append(cls._hydrate(doc, select=select))
+            if len(page) == PREFETCH_PAGE_SIZE:
+                await asyncio.to_thread(cls.prefetch_related, page,
+                                        attributes=prefetch)
+                for obj in page:
+                    yield obj
+                page = list()
 
-        cur_where = cls._where_query(*args, **kwargs,
-                                     cur_where=cur_where)
+        if len(page) != 0:
+            await asyncio.to_thread(cls.prefetch_related, page,
+                                    attributes=prefetch)
+            for obj in page:
+                yield obj
 
-        if limit is not None:
-            cur_where = cur_where.limit(count=limit)
+    @classmethod
+    @instrument_stream("query")
+    async def awhere(cls, *args, prefetch=None, **kwargs):
+        """ Async generator for objects from a query run with the async
+                client (CTX.adb). Accepts the arguments of where.
 
-        return cur_where
+        :param args:
+        :param prefetch: names of relationship attributes to prefetch
+                    (see _astream_objs)
+        :param kwargs:
+        :return:
+        """
+        cur_where = cls._get_async_collection()
+        query = cls._get_query(*args, cur_where=cur_where, **kwargs)
+        docs = query.astream() if isinstance(query, FanoutQuery) \
+            else query.stream()
+        async for obj in cls._astream_objs(
+                docs, prefetch=prefetch, select=kwargs.get("select", None)):
+            yield obj
+
+    @classmethod
+    @instrument_stream("query")
+    async def aall(cls, prefetch=None):
+        """ Async generator for all objects in the collection, read
+                with the async client (CTX.adb).
+
+        :param prefetch: names of relationship attributes to prefetch
+                    (see _astream_objs)
+        :return:
+        """
+        docs = cls._get_async_collection().stream()
+        async for obj in cls._astream_objs(docs, prefetch=prefetch):
+            yield obj
+
+
+class _FilterRecorder:
+    """
+    Stands in for a Query to record the filters appended by
+        QueryMixin._where_query as (field_path, op_string, value).
+    """
+
+    def __init__(self):
+        self.filters = list()
+
+    def where(self, field_path, op_string, value):
+        self.filters.append((field_path, op_string, value))
+        return self
+
+
+class PreparedQuery:
+    """
+    A query with the filters translated to Firestore field paths once.
+        The part of the query without cmp.Param values is built once
+        and extended with the bound values when the query is run.
+        See QueryMixin.prepare.
+    """
+
+    def __init__(self, obj_cls, *args, prefetch=None, **kwargs):
+        self.obj_cls = obj_cls
+        self.prefetch = prefetch
+        self.select = kwargs.get("select", None)
+
+        options = {key: kwargs.pop(key) for key in _QUERY_OPTIONS
+                   if key in kwargs}
+
+        filters, self.branches = obj_cls._get_filters(*args, **kwargs)
+        # Filters that may be split into sub-queries (see fanout) are
+        #   applied when the query is run
+        self.static_filters = list()
+        self.param_filters = list()
+        for f in filters:
+            if any(isinstance(val, cmp.Param) for val in f) \
+                    or f[1] in FANOUT_OPS:
+                self.param_filters.append(f)
+            else:
+                self.static_filters.append(f)
+
+        self.options = options
+        static_options = {key: val for key, val in options.items()
+                          if not isinstance(val, cmp.Param)}
+        self.param_options = {key: val for key, val in options.items()
+                              if isinstance(val, cmp.Param)}
+
+        branch_filters = [f for branch in self.branches or [] for f in branch]
+        self.param_names = frozenset(
+            [val.name for f in self.param_filters + branch_filters
+             for val in f if isinstance(val, cmp.Param)]
+            + [val.name for val in self.param_options.values()]
+        )
+
+        if self.branches is None:
+            self.base_query = obj_cls._build_query(self.static_filters,
+                                                   **static_options)
+        else:
+            # Sub-queries of disjunctions are built when the query is run
+            self.base_query = None
+
+    def get_query(self, **params):
+        """ Returns the query (Query or FanoutQuery) with params bound
+                to the placeholders.
+
+        :param params: a value for each cmp.Param by name
+        :return:
+        """
+        if params.keys() != self.param_names:
+            raise ValueError(
+                "Params {} are not set and params {} are unexpected"
+                .format(set(self.param_names - params.keys()),
+                        set(params.keys() - self.param_names)))
+
+        def bind(val):
+            return params[val.name] if isinstance(val, cmp.Param) else val
+
+        def bind_filters(filters):
+            return [tuple(bind(val) for val in f) for f in filters]
+
+        param_filters = bind_filters(self.param_filters)
+
+        if self.base_query is None or len(split_filters(param_filters)) != 1:
+            options = {key: bind(val) for key, val in self.options.items()}
+            branches = None
+            if self.branches is not None:
+                branches = [bind_filters(branch) for branch in self.branches]
+            return self.obj_cls._build_query(
+                self.static_filters + param_filters, branches=branches,
+                **options)
+
+        query = self.base_query
+        for f in param_filters:
+            query = query.where(*f)
+
+        if len(self.param_options) != 0:
+            options = {key: bind(val)
+                       for key, val in self.param_options.items()}
+            query = self.obj_cls._build_query([], cur_where=query, **options)
+        return query
+
+    def run(self, **params):
+        """ Generator for objects from the query with params bound
+                (see get_query).
+
+        :param params:
+        :return:
+        """
+        query = self.get_query(**params)
+        select = self.select
+        if isinstance(select, cmp.Param):
+            select = params[select.name]
+        return self.obj_cls._stream_objs(query, prefetch=self.prefetch,
+                                         select=select)
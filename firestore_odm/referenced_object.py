@@ -8,6 +8,8 @@ class ReferencedObject(FirestoreObject):
     ReferencedObject may be placed anywhere in the database.
     """
 
+    __slots__ = ()
+
     @property
     def doc_ref(self):
         return self._doc_ref
@@ -21,3 +23,14 @@ class ReferencedObject(FirestoreObject):
         :return:
         """
         return super().get(doc_ref=doc_ref, transaction=transaction)
+
+    @classmethod
+    def get_many(cls, *, doc_refs, transaction: Transaction = None):
+        """ Returns instances from firestore document references.
+
+        :param doc_refs: firestore document references
+        :param transaction: firestore transaction
+        :return: a list of instances in the order of doc_refs, with None
+                    in place of documents that do not exist
+        """
+        return super().get_many(doc_refs=doc_refs, transaction=transaction)
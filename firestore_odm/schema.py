@@ -10,32 +10,72 @@ from marshmallow import post_dump, pre_load, post_load, EXCLUDE
 
 
 class SchemaMixin:
+    """
+    Attributes:
+    ============
+    _f_mapping: dict
+        Maps attribute names to Firestore keys (data_key) of the fields
+            bound to the schema. Built on each Schema class when the
+            class is first instantiated.
+    _g_mapping: dict
+        Maps Firestore keys (data_key) to attribute names.
+    """
+
+    @classmethod
+    def _get_key_mappings(cls):
+        """ Returns (_f_mapping, _g_mapping) of the Schema class.
+        """
+        if "_f_mapping" not in cls.__dict__:
+            # Fields are bound when the schema is instantiated
+            cls()
+        if "_f_mapping" not in cls.__dict__:
+            # No field is bound to the schema
+            cls._f_mapping = dict()
+            cls._g_mapping = dict()
+        return cls._f_mapping, cls._g_mapping
 
-    f = staticmethod(attr_name_to_firestore_key)
-    g = staticmethod(firestore_key_to_attr_name)
+    @classmethod
+    def f(cls, attr_name):
+        """ Returns the Firestore key (data_key) for an attribute name.
+        """
+        f_mapping, _ = cls._get_key_mappings()
+        if attr_name in f_mapping:
+            return f_mapping[attr_name]
+        else:
+            return attr_name_to_firestore_key(attr_name)
+
+    @classmethod
+    def g(cls, firestore_key):
+        """ Returns the attribute name for a Firestore key (data_key).
+        """
+        _, g_mapping = cls._get_key_mappings()
+        if firestore_key in g_mapping:
+            return g_mapping[firestore_key]
+        else:
+            return firestore_key_to_attr_name(firestore_key)
 
     def on_bind_field(self, field_name, field_obj):
         """Hook to modify a field when it is bound to the `Schema`.
 
-        No-op by default.
+        Sets attribute and data_key of the field if they are not
+            declared, and records them in the mappings of the
+            Schema class.
         """
 
         if field_obj.attribute is None:
             field_obj.attribute = field_name
 
         if field_obj.data_key is None:
-            default_data_key = self.f(field_obj.attribute)
+            default_data_key = attr_name_to_firestore_key(
+                field_obj.attribute)
             field_obj.data_key = default_data_key
 
-        # if field_obj.attribute in self.f_mapping:
-        #     raise ValueError
-        # else:
-        #     self.f_mapping[field_obj.attribute] = field_obj.data_key
-        #
-        # if field_obj.data_key in self.g_mapping:
-        #     raise ValueError
-        # else:
-        #     self.g_mapping[field_obj.data_key] = field_obj.attribute
+        schema_cls = type(self)
+        if "_f_mapping" not in schema_cls.__dict__:
+            schema_cls._f_mapping = dict()
+            schema_cls._g_mapping = dict()
+        schema_cls._f_mapping[field_obj.attribute] = field_obj.data_key
+        schema_cls._g_mapping[field_obj.data_key] = field_obj.attribute
 
     def __init__(self, *args, **kwargs):
         if "unknown" not in kwargs:
@@ -51,9 +91,6 @@ class SchemaMixin:
             *args,
             unknown=unknown,
             **kwargs)
-        #
-        # self.f_mapping = dict()
-        # self.g_mapping = dict()
 
 
 class BusinessPropertyStoreSchemaMixin():
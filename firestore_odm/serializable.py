@@ -3,6 +3,9 @@ from typing import TypeVar
 from marshmallow.utils import is_iterable_but_not_string
 
 from firestore_odm.helpers import EmbeddedElement
+from .compiler import ExportPlan, ImportPlan, ConstructionPlan
+from .context import Context as CTX
+from .instrumentation import operation, record_data
 from .model_registry import BaseRegisteredModel, ModelRegistry
 
 
@@ -11,6 +14,8 @@ from .model_registry import BaseRegisteredModel, ModelRegistry
 
 class SchemedBase:
 
+    __slots__ = ()
+
     @property
     def schema_obj(self):
         raise NotImplementedError
@@ -26,6 +31,8 @@ class Schemed(SchemedBase):
         and deserialization.
     """
 
+    __slots__ = ()
+
     _schema_obj = None
     _schema_cls = None
 
@@ -42,11 +49,15 @@ class Schemed(SchemedBase):
     @classmethod
     def get_schema_obj(cls):
         """ Returns an instantiated object for Schema associated
-                with the model class
+                with the model class. The object is cached on each
+                class, so that a subclass declaring another schema
+                does not read the object cached by its parent.
         """
-        if cls._schema_obj is None:
-            cls._schema_obj = cls._schema_cls()
-        return cls._schema_obj
+        schema_obj = cls.__dict__.get("_schema_obj", None)
+        if schema_obj is None:
+            schema_obj = cls.get_schema_cls()()
+            cls._schema_obj = schema_obj
+        return schema_obj
 
     @property
     def schema_cls(self):
@@ -86,6 +97,8 @@ class Importable:
         be deserialized/loaded/set from a dictionary.
     """
 
+    __slots__ = ()
+
     def _import_val(self, val, to_get=False):
 
         def embed_element(val: EmbeddedElement):
@@ -129,19 +142,28 @@ class Importable:
         else:
             return val
 
+    @classmethod
+    def _get_import_plan(cls) -> ImportPlan:
+        """ Returns the import plan compiled from the schema of the
+                class. The plan is compiled once for each class.
+        """
+        plan = cls.__dict__.get("_import_plan", None)
+        if plan is None:
+            plan = ImportPlan(cls.get_schema_obj())
+            cls._import_plan = plan
+        return plan
+
     def _import_properties(self, d: dict, to_get=False) -> None:
-        """ TODO: implement iterable support
-        TODO: test
-        TODO: note that this method is not well-tested and most likely
-                will fail for nested structures
+        """ Sets instance variables from a dictionary of the format
+                stored in Firestore.
+
         :param d:
+        :param to_get: If set to True, documents referenced by a nested
+                    relationship will be retrieved.
         :return:
         """
-        d = self.schema_obj.load(d)
-
-        for key, val in d.items():
-            # if key not in self.__get_dump_only_fields__():
-            setattr(self, key, self._import_val(val, to_get=to_get))
+        self._get_import_plan()(self, d, to_get=to_get,
+                                set_attr=_get_untracked_setattr(type(self)))
 
     def update_vals(self, with_dict=None):
         if with_dict is None:
@@ -162,6 +184,8 @@ class Exportable:
         be serialized/dumped/output into a dictionary.
     """
 
+    __slots__ = ()
+
     def _export_val(self, val, to_save=False):
         """
         Private method for serializing an instance variable of the object.
@@ -198,21 +222,38 @@ class Exportable:
         else:
             return val
 
+    @classmethod
+    def _get_export_plan(cls) -> ExportPlan:
+        """ Returns the export plan compiled from the schema of the
+                class. The plan is compiled once for each class.
+        """
+        plan = cls.__dict__.get("_export_plan", None)
+        if plan is None:
+            plan = ExportPlan(cls.get_schema_obj())
+            cls._export_plan = plan
+        return plan
+
     def _export_as_dict(self, to_save=False) -> dict:
         """ Map/dict is only supported at root level for now
         TODO: implement iterable support
         :return:
         """
-        d = self.schema_obj.dump(self)
-
-        # print("----")
-        # print(d)
-
-        res = dict()
-        for key, val in d.items():
-            res[key] = self._export_val(val, to_save=to_save)
-
-        return res
+        if CTX.hooks:
+            with operation("export", type(self)):
+                d = self._get_export_plan()(self, to_save=to_save)
+                record_data(d)
+                return d
+        return self._get_export_plan()(self, to_save=to_save)
+
+    def _export_changes(self, to_save=False) -> dict:
+        """ Exports fields changed since the object was loaded or saved.
+
+        :param to_save: See _export_val
+        :return: a dictionary from paths (tuples of Firestore keys,
+                    eg. ("target", "earliest") for a field of an
+                    embedded object) to exported values
+        """
+        return self._get_export_plan().export_changes(self, to_save=to_save)
 
     def _export_val_view(self, val):
 
@@ -262,6 +303,8 @@ class NewMixin:
     Mixin class for initializing instance variable on creation.
     """
 
+    __slots__ = ()
+
     @classmethod
     def new(cls, allow_default=True, **kwargs):
         """ Instantiates a new instance to the model.
@@ -276,27 +319,31 @@ class NewMixin:
         :return:
         """
 
-        fd = cls._get_fields()  # Calls classmethod
-
-        field_keys = {key for key, field in fd.items() if not field.dump_only}
-        kwargs_keys = set(kwargs.keys())
+        plan = cls._get_construction_plan()
 
-        required_keys = {val for key, val in fd.items() if val.required}
+        if not allow_default and not plan.field_keys <= kwargs.keys():
+            raise ValueError("{} are not set".format(
+                set(plan.field_keys) - kwargs.keys()))
 
-        # Keys to set value from keyword arguments
-        keys_to_set = kwargs_keys & field_keys
-        # Keys to set to default value read from Field object from schema
-        keys_default = field_keys - keys_to_set
-        if not allow_default and len(keys_default) != 0:
-            raise ValueError("{} are not set".format(keys_default))
-        keys_super = kwargs_keys - keys_to_set - keys_default
+        d_super = {key: val for key, val in kwargs.items()
+                   if key not in plan.field_keys}
 
-        d_val_default = {key: field.default_value
-                for key, field in fd.items() if key in keys_default}
-        d_val_provided = {key: kwargs[key] for key in keys_to_set}
-        d_super = {key: kwargs[key] for key in keys_super}
+        return cls(_with_dict=plan.get_values(kwargs), **d_super)
 
-        return cls(_with_dict={**d_val_default, **d_val_provided}, **d_super)
+    @classmethod
+    def _get_construction_plan(cls) -> ConstructionPlan:
+        """ Returns the construction plan of the class. The plan is
+                built on the first call for each class, and built again
+                after a class attribute named as a field is assigned or
+                deleted (see SerializableMeta), so that attributes
+                assigned to the class after the class is declared
+                (eg. properties) are taken into account.
+        """
+        plan = cls.__dict__.get("_construction_plan", None)
+        if plan is None:
+            plan = ConstructionPlan(cls)
+            cls._construction_plan = plan
+        return plan
 
     def __init__(self, _with_dict=None, **kwargs):
         """ Private initializer; do not call directly.
@@ -305,38 +352,177 @@ class NewMixin:
         :param _with_dict:
         :param kwargs:
         """
-        if _with_dict is None:
-            _with_dict = dict()
-
-        for key, val in _with_dict.items():
-            if key not in dir(self):
-                setattr(self, key, val)
+        if _with_dict is not None:
+            plan = self._get_construction_plan()
+            set_attr = _get_untracked_setattr(type(self))
+            instance_attrs = getattr(self, "__dict__", ())
+            for key, val in _with_dict.items():
+                if key in plan.class_attrs or key in instance_attrs:
+                    continue
+                if key in plan.slot_attrs and hasattr(self, key):
+                    continue
+                set_attr(self, key, val)
 
         super().__init__(**kwargs)
 
 
+def _get_untracked_setattr(obj_cls):
+    """ Returns the function that construction and import use to set
+            instance variables of obj_cls. Changes are not tracked
+            at that point, so the variables are set with
+            object.__setattr__ rather than through
+            ChangeTrackingMixin.__setattr__, unless obj_cls defines
+            its own __setattr__.
+    """
+    if obj_cls.__setattr__ in (object.__setattr__,
+                               ChangeTrackingMixin.__setattr__):
+        return object.__setattr__
+    return setattr
+
+
+class ChangeTrackingMixin:
+    """
+    Mixin class for tracking the instance variables assigned since the
+        object was loaded (imported) or saved. Objects that have not
+        been loaded or saved do not track changes.
+
+    Note that changes made in place (eg. appending to a list) are not
+        tracked; assign the value again to mark the field as changed.
+    """
+
+    __slots__ = ()
+
+    # Instance variables to declare as slots in a model with Meta.slots
+    _slotted_attrs = ("_changed_fields",)
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, "_changed_fields", None)
+        super().__init__(*args, **kwargs)
+
+    def __setattr__(self, key, value):
+        super().__setattr__(key, value)
+        changed_fields = getattr(self, "_changed_fields", None)
+        if changed_fields is not None:
+            changed_fields.add(key)
+
+    def _import_properties(self, d: dict, to_get=False) -> None:
+        super()._import_properties(d, to_get=to_get)
+        object.__setattr__(self, "_changed_fields", set())
+
+    def _clear_changes(self):
+        """ Starts tracking changes from the current state of the object
+                and of objects embedded in it.
+        """
+        object.__setattr__(self, "_changed_fields", set())
+        for attribute in self._get_export_plan().embedded:
+            val = getattr(self, attribute, None)
+            if isinstance(val, dict):
+                elems = val.values()
+            elif isinstance(val, list):
+                elems = val
+            else:
+                elems = [val]
+            for elem in elems:
+                if isinstance(elem, ChangeTrackingMixin):
+                    elem._clear_changes()
+
+
 class SerializableMeta(ModelRegistry):
     """
     Metaclass for serializable models.
+
+    Options read from Model.Meta:
+    ============
+    schema_cls:
+        The Schema class of the model.
+    slots:
+        If set to True, instance variables of the model are declared as
+            __slots__ generated from the fields of the schema, so that
+            instances are stored without a __dict__. Every base class
+            of the model must also declare __slots__ (eg. a base model
+            declared with Meta.slots, or "__slots__ = ()").
     """
 
     def __new__(mcs, name, bases, attrs):
+        if getattr(attrs.get("Meta", None), "slots", False):
+            attrs = dict(attrs, __slots__=mcs._get_slots(bases, attrs))
         klass = super().__new__(mcs, name, bases, attrs)
         if hasattr(klass, "Meta"):
             # Moves Model.Meta.schema_cls to Model._schema_cls
             meta = klass.Meta
             if hasattr(meta, "schema_cls"):
                 klass._schema_cls = meta.schema_cls
+        if klass._schema_cls is not None:
+            # Compiles plans for the schema at class creation
+            klass._get_export_plan()
+            klass._get_import_plan()
         return klass
 
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        cls._on_class_attr_changed(name)
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        cls._on_class_attr_changed(name)
+
+    def _on_class_attr_changed(cls, name):
+        """ Discards the construction plans of the class and its
+                subclasses that a change of the class attribute name
+                invalidates: new does not assign a field that is
+                shadowed by a class attribute (eg. a property).
+        """
+        for klass in (cls, *cls._get_descendants()):
+            plan = klass.__dict__.get("_construction_plan", None)
+            if plan is not None and name in plan.field_keys:
+                type.__delattr__(klass, "_construction_plan")
+
+    @staticmethod
+    def _get_slots(bases, attrs) -> tuple:
+        """ Returns names of instance variables to declare as __slots__
+                for a model: attributes of the fields in the schema and
+                _slotted_attrs of the base classes, except those already
+                declared by the class or its base classes (eg. doc_id
+                as a property).
+
+        :param bases: base classes of the model
+        :param attrs: attributes declared in the body of the model
+        :return:
+        """
+        meta = attrs["Meta"]
+        schema_cls = getattr(meta, "schema_cls", None) or \
+            attrs.get("_schema_cls", None)
+        if schema_cls is None:
+            schema_cls = next(
+                (base._schema_cls for base in bases
+                 if getattr(base, "_schema_cls", None) is not None),
+                None)
+
+        names = list()
+        if schema_cls is not None:
+            names += [field.attribute or key
+                      for key, field in schema_cls().fields.items()]
+        for base in bases:
+            for klass in base.__mro__:
+                names += klass.__dict__.get("_slotted_attrs", ())
+
+        slots = list()
+        for name in names:
+            if "." in name or name in attrs or name in slots:
+                continue
+            if any(hasattr(base, name) for base in bases):
+                continue
+            slots.append(name)
+        return tuple(slots)
+
 
 class Mutable(BaseRegisteredModel,
-              Schemed, Importable, NewMixin, Exportable):
-    pass
+              Schemed, ChangeTrackingMixin, Importable, NewMixin, Exportable):
+    __slots__ = ()
 
 
 class Immutable(BaseRegisteredModel, Schemed, NewMixin, Exportable):
-    pass
+    __slots__ = ()
 
 
 class Serializable(Mutable, metaclass=SerializableMeta):
@@ -347,7 +533,7 @@ class Serializable(Mutable, metaclass=SerializableMeta):
     #     """
     #     schema_cls = None
 
-    pass
+    __slots__ = ()
 
 
 T = TypeVar('T')
@@ -0,0 +1,79 @@
+"""
+Identity map of the objects loaded in a unit of work (eg. a request).
+    See Session.
+"""
+import contextvars
+
+# Session entered in the current thread or asyncio task
+_current_session = contextvars.ContextVar("firestore_odm_session",
+                                          default=None)
+
+
+def current_session():
+    """ Returns the Session entered in the current context, or None.
+    """
+    return _current_session.get()
+
+
+class Session:
+    """
+    Context manager that keeps one object per document path for the
+        objects loaded while it is entered, so that a document is read
+        once, and get, queries and relationship loads return the same
+        instance, eg.
+
+        with Session():
+            a = City.get(doc_id="SF")
+            b = City.get(doc_id="SF")  # no read
+            assert a is b
+
+    Reads and writes in a transaction and partial objects are not
+        added to the session.
+    """
+
+    def __init__(self):
+        # Document path to object, or None for a missing document
+        self.identity_map = dict()
+        self._tokens = list()
+
+    def __enter__(self):
+        self._tokens.append(_current_session.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_session.reset(self._tokens.pop())
+
+    def __contains__(self, path):
+        return path in self.identity_map
+
+    def __len__(self):
+        return len(self.identity_map)
+
+    def get(self, path, default=None):
+        """ Returns the object for the document at path, None for a
+                missing document, or default if the document is not in
+                the session.
+        """
+        return self.identity_map.get(path, default)
+
+    def add(self, obj) -> None:
+        """ Adds an object to the session, replacing the object for the
+                same document.
+        """
+        self.identity_map[obj.doc_ref.path] = obj
+
+    def set_missing(self, path) -> None:
+        """ Records that the document at path does not exist.
+        """
+        self.identity_map[path] = None
+
+    def discard(self, path) -> None:
+        """ Removes the document at path from the session, so that it
+                is read again on the next load.
+        """
+        self.identity_map.pop(path, None)
+
+    def clear(self) -> None:
+        """ Removes every object from the session.
+        """
+        self.identity_map.clear()
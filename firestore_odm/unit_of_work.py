@@ -0,0 +1,194 @@
+"""
+Defers saves and deletes so that they are committed together.
+    See UnitOfWork.
+"""
+import contextvars
+from collections import namedtuple
+
+from .batch import Write, commit_writes, acommit_writes
+from .instrumentation import commit_operation
+
+# UnitOfWork entered in the current thread or asyncio task
+_current_unit_of_work = contextvars.ContextVar("firestore_odm_unit_of_work",
+                                               default=None)
+
+# Final operation registered for a document. op is "save" or "delete"
+_Pending = namedtuple("_Pending", ['op', 'obj', 'doc_ref', 'partial'])
+
+
+def current_unit_of_work():
+    """ Returns the UnitOfWork entered in the current context, or None.
+    """
+    return _current_unit_of_work.get()
+
+
+class UnitOfWork:
+    """
+    Context manager that registers FirestoreObject.save and delete calls
+        instead of writing, and commits the final state of each document
+        once on exit, eg.
+
+        with UnitOfWork():
+            city.population += 1
+            city.save()
+            city.save()     # one write for city
+            other.delete()
+        # committed here in one WriteBatch
+
+    Writes are committed in WriteBatch'es of up to MAX_WRITES_PER_BATCH
+        (see batch.commit_writes), or added to the transaction. If the
+        block raises, registered writes are discarded. Note that reads
+        in the block do not see registered writes.
+    """
+
+    def __init__(self, transaction=None):
+        """
+
+        :param transaction: firestore transaction to add writes to on
+                    exit. Also set by the first save or delete in the
+                    block called with a transaction.
+        """
+        self.transaction = transaction
+        self.pending = dict()
+        self._tokens = list()
+
+    def __enter__(self):
+        self._tokens.append(_current_unit_of_work.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_unit_of_work.reset(self._tokens.pop())
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.flush()
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _current_unit_of_work.reset(self._tokens.pop())
+        if exc_type is not None:
+            self.discard()
+        else:
+            await self.aflush()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def _use_transaction(self, transaction) -> None:
+        if transaction is None:
+            return
+        if self.transaction is None:
+            self.transaction = transaction
+        elif transaction is not self.transaction:
+            raise ValueError("UnitOfWork is bound to another transaction")
+
+    def register_save(self, obj, partial=False, transaction=None) -> None:
+        """ Registers that obj is to be saved. Saves of a document are
+                coalesced: the state of the object at flush is written
+                once, and partial only applies if every save of the
+                document was partial.
+
+        :param obj: FirestoreObject
+        :param partial: See FirestoreObject.save
+        :param transaction: See UnitOfWork.__init__
+        :return:
+        """
+        self._use_transaction(transaction)
+        path = obj.doc_ref.path
+        prev = self.pending.get(path, None)
+        if prev is not None:
+            # A document deleted earlier in the block is written in full
+            partial = partial and prev.op == "save" and prev.partial
+        self.pending[path] = _Pending(op="save", obj=obj,
+                                      doc_ref=obj.doc_ref, partial=partial)
+
+    def register_delete(self, doc_ref, obj=None, transaction=None) -> None:
+        """ Registers that the document at doc_ref is to be deleted,
+                replacing saves of the document registered earlier.
+
+        :param doc_ref: firestore document reference
+        :param obj: the object deleted, if any
+        :param transaction: See UnitOfWork.__init__
+        :return:
+        """
+        self._use_transaction(transaction)
+        self.pending[doc_ref.path] = _Pending(op="delete", obj=obj,
+                                              doc_ref=doc_ref, partial=False)
+
+    def _get_writes(self):
+        """ Returns (graph_writes, deletes) for the registered operations,
+                where graph_writes are (obj, write) for each object
+                saved, including objects nested in relationships of the
+                objects saved (see FirestoreObject.save), and deletes
+                are (obj, write).
+        """
+        visited = dict()
+        for pending in self.pending.values():
+            if pending.op == "save":
+                pending.obj._visit_graph(visited)
+
+        graph_writes = list()
+        for path, obj in visited.items():
+            pending = self.pending.get(path, None)
+            if pending is not None and pending.op == "delete":
+                continue
+            partial = pending is not None and pending.partial
+            graph_writes.append((obj, obj._get_write(partial=partial)))
+
+        deletes = [(pending.obj, Write(op="delete", doc_ref=pending.doc_ref))
+                   for pending in self.pending.values()
+                   if pending.op == "delete"]
+        return graph_writes, deletes
+
+    def _on_committed(self, graph_writes, deletes) -> None:
+        in_transaction = self.transaction is not None
+        for obj, write in graph_writes:
+            if write is not None:
+                obj._update_cache(write, in_transaction=in_transaction)
+            obj._add_to_session()
+            obj._clear_changes()
+        for obj, write in deletes:
+            if obj is not None:
+                obj._update_cache(write, in_transaction=in_transaction)
+        self.pending.clear()
+
+    @staticmethod
+    def _get_reported_writes(graph_writes, deletes):
+        """ Returns (op, model_cls, write) for each write to commit,
+                as reported to instrumentation hooks (see
+                instrumentation.commit_operation).
+        """
+        res = [("save", type(obj), write)
+               for obj, write in graph_writes if write is not None]
+        res += [("delete", None if obj is None else type(obj), write)
+                for obj, write in deletes]
+        return res
+
+    def flush(self) -> None:
+        """ Commits the registered writes (see UnitOfWork), and clears
+                them.
+        """
+        graph_writes, deletes = self._get_writes()
+        reported = self._get_reported_writes(graph_writes, deletes)
+        with commit_operation(reported):
+            commit_writes([write for _, _, write in reported],
+                          transaction=self.transaction)
+        self._on_committed(graph_writes, deletes)
+
+    async def aflush(self) -> None:
+        """ Commits the registered writes with the async client (CTX.adb).
+                See flush.
+        """
+        graph_writes, deletes = self._get_writes()
+        reported = self._get_reported_writes(graph_writes, deletes)
+        with commit_operation(reported):
+            await acommit_writes([write for _, _, write in reported],
+                                 transaction=self.transaction)
+        self._on_committed(graph_writes, deletes)
+
+    def discard(self) -> None:
+        """ Discards the registered writes.
+        """
+        self.pending.clear()
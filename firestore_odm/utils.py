@@ -6,12 +6,16 @@ from typing import TypeVar
 # Generate a random string
 # with 32 characters.
 # https://www.geeksforgeeks.org/generating-random-ids-python/
-from functools import partial
+from functools import partial, lru_cache
 
-from google.cloud.firestore import DocumentSnapshot
+from google.cloud.firestore import DocumentSnapshot, DocumentReference
+from google.cloud.firestore_v1.base_document import BaseDocumentReference
 from inflection import camelize, underscore
 
+from .context import Context as CTX
+from .instrumentation import hydrate_operation
 from .model_registry import ModelRegistry
+from .session import current_session
 
 
 def random_id():
@@ -39,6 +43,12 @@ def obj_type_deserialize(value):
     return value
 
 
+# Number of names to memoize for conversions between attribute
+#   names and Firestore keys
+_KEY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_KEY_CACHE_SIZE)
 def attr_name_to_firestore_key(s):
     res = camelize(s, uppercase_first_letter=False)
     if firestore_key_to_attr_name(res) != s:
@@ -49,7 +59,7 @@ def attr_name_to_firestore_key(s):
         return res
 
 
-firestore_key_to_attr_name = underscore
+firestore_key_to_attr_name = lru_cache(maxsize=_KEY_CACHE_SIZE)(underscore)
 
 
 T = TypeVar('T', covariant=True)
@@ -57,18 +67,53 @@ T = TypeVar('T', covariant=True)
 
 def snapshot_to_obj(
         snapshot: DocumentSnapshot,
-        super_cls: T = None) -> T:
+        super_cls: T = None,
+        use_session=True) -> T:
     """ Converts a firestore document snapshot to FirestoreObject
 
     :param snapshot: firestore document snapshot
     :param super_cls: subclass of FirestoreObject
+    :param use_session: See dict_to_obj
     :return:
     """
-
-    if not snapshot.exists:
+    d = snapshot.to_dict() if snapshot.exists else None
+    if CTX.hooks:
+        with hydrate_operation(super_cls, d):
+            return _snapshot_to_obj(snapshot, d, super_cls, use_session)
+    return _snapshot_to_obj(snapshot, d, super_cls, use_session)
+
+
+def _snapshot_to_obj(snapshot, d, super_cls, use_session):
+    if d is None:
+        session = current_session() if use_session else None
+        if session is not None:
+            session.set_missing(snapshot.reference.path)
         return None
 
-    d = snapshot.to_dict()
+    return dict_to_obj(d=d, doc_ref=snapshot.reference,
+                       super_cls=super_cls, use_session=use_session)
+
+
+def dict_to_obj(d: dict, doc_ref, super_cls: T = None,
+                use_session=True) -> T:
+    """ Converts the data of a firestore document to FirestoreObject
+
+    :param d: document data
+    :param doc_ref: firestore document reference
+    :param super_cls: subclass of FirestoreObject
+    :param use_session: If set to True and a Session is entered,
+                returns the object in the session for the document
+                if there is one, and adds the new object otherwise.
+    :return:
+    """
+
+    session = current_session() if use_session else None
+    obj = session.get(doc_ref.path) if session is not None else None
+    if obj is not None:
+        if super_cls is not None:
+            assert isinstance(obj, super_cls)
+        return obj
+
     obj_type = d["obj_type"]
     obj_cls = ModelRegistry.get_cls_from_name(obj_type)
 
@@ -80,5 +125,39 @@ def snapshot_to_obj(
     if super_cls is not None:
         assert issubclass(obj_cls, super_cls)
 
-    obj = obj_cls.from_dict(d=d, doc_ref=snapshot.reference)
+    obj = obj_cls.from_dict(d=d, doc_ref=doc_ref)
+    if session is not None:
+        session.add(obj)
     return obj
+
+
+def _to_sync_val(val):
+    if isinstance(val, BaseDocumentReference) \
+            and not isinstance(val, DocumentReference):
+        return CTX.db.document(val.path)
+    elif isinstance(val, dict):
+        return {key: _to_sync_val(elem) for key, elem in val.items()}
+    elif isinstance(val, list):
+        return [_to_sync_val(elem) for elem in val]
+    else:
+        return val
+
+
+def to_sync_snapshot(snapshot: DocumentSnapshot) -> DocumentSnapshot:
+    """ Converts a document snapshot read with the async client
+            (CTX.adb) to a snapshot with DocumentReference's of the
+            sync client (CTX.db), so that it is hydrated in the same
+            way as snapshots read with the sync client.
+
+    :param snapshot: firestore document snapshot
+    :return:
+    """
+    data = snapshot.to_dict() if snapshot.exists else None
+    return DocumentSnapshot(
+        reference=CTX.db.document(snapshot.reference.path),
+        data=_to_sync_val(data),
+        exists=snapshot.exists,
+        read_time=snapshot.read_time,
+        create_time=snapshot.create_time,
+        update_time=snapshot.update_time
+    )
@@ -20,7 +20,8 @@ setuptools.setup(name='firestore_odm',
                      "celery"
                  ],
                  license='MIT License',
-                 packages=setuptools.find_packages(),
+                 packages=setuptools.find_packages(
+                     exclude=["benchmarks", "benchmarks.*"]),
                  zip_safe=False,
                  keywords=["firebase", "firestore", "ORM",
                            "backend", "nosql"],
@@ -1,22 +1,39 @@
+import os
+
 import pytest
 
+# Set FIRESTORE_ODM_TEST_BACKEND=memory to run without credentials
+USE_MEMORY_BACKEND = os.environ.get("FIRESTORE_ODM_TEST_BACKEND") == "memory"
 
-@pytest.fixture
-def CTX():
-    """
-    Note that pytest.fixture(scope="package") is experimental according
-        to pytest documentations
-    :return:
-    """
 
+def read_test_context():
+    """ Reads the test config into Context, with the in-memory backend
+            if USE_MEMORY_BACKEND is set, and returns Context.
+    """
     from firestore_odm.context import Context as TST_CTX
     from firestore_odm.config import Config
 
+    backend = None
+    if USE_MEMORY_BACKEND:
+        from firestore_odm.memory import MemoryBackend
+        backend = MemoryBackend()
+
     config = Config(
         app_name="flask-boiler-testing",
         debug=True,
         testing=True,
-        certificate_filename="flask-boiler-testing-firebase-adminsdk-4m0ec-7505aaef8d.json"
+        certificate_filename="flask-boiler-testing-firebase-adminsdk-4m0ec-7505aaef8d.json",
+        backend=backend
     )
     TST_CTX.read(config)
     return TST_CTX
+
+
+@pytest.fixture
+def CTX():
+    """
+    Note that pytest.fixture(scope="package") is experimental according
+        to pytest documentations
+    :return:
+    """
+    return read_test_context()
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from firestore_odm import batch
+from firestore_odm.batch import Write, commit_writes
+from firestore_odm.context import Context as CTX
+
+
+def test_commit_writes_in_chunks(monkeypatch):
+    batches = list()
+
+    def new_batch():
+        b = mock.MagicMock()
+        batches.append(b)
+        return b
+
+    monkeypatch.setattr(CTX, "db", mock.MagicMock(batch=new_batch))
+    monkeypatch.setattr(batch, "MAX_WRITES_PER_BATCH", 2)
+
+    writes = [
+        Write(op="set", doc_ref="a", data={"x": 1}),
+        Write(op="update", doc_ref="b", data={"y.z": 2}),
+        Write(op="delete", doc_ref="c"),
+    ]
+    commit_writes(writes)
+
+    assert len(batches) == 2
+    batches[0].set.assert_called_once_with("a", {"x": 1})
+    batches[0].update.assert_called_once_with("b", {"y.z": 2})
+    batches[1].delete.assert_called_once_with("c")
+    assert all(b.commit.call_count == 1 for b in batches)
+
+
+def test_commit_writes_in_transaction():
+    transaction = mock.MagicMock()
+    commit_writes([Write(op="delete", doc_ref="c")] * 3,
+                  transaction=transaction)
+    assert transaction.delete.call_count == 3
+    transaction.commit.assert_not_called()
+
+
+def test_chunk_writes_by_payload_size(monkeypatch):
+    monkeypatch.setattr(batch, "MAX_BATCH_PAYLOAD_BYTES", 1000)
+
+    writes = [Write(op="set", doc_ref="a/b", data={"s": "x" * 400})] * 5
+    assert batch.chunk_writes(writes) == [[0, 1], [2, 3], [4]]
+
+    # A write larger than the limit is committed on its own
+    writes = [Write(op="set", doc_ref="a/b", data={"s": "x" * 2000})] * 2
+    assert batch.chunk_writes(writes) == [[0], [1]]
+
+
+def test_bulk_commit_reports_failures(monkeypatch):
+
+    class FailingBatch:
+
+        def __init__(self):
+            self.refs = list()
+
+        def delete(self, doc_ref):
+            self.refs.append(doc_ref)
+
+        def commit(self):
+            if "fail" in self.refs:
+                raise RuntimeError
+
+    monkeypatch.setattr(CTX, "db", mock.MagicMock(batch=FailingBatch))
+    monkeypatch.setattr(batch, "MAX_WRITES_PER_BATCH", 2)
+
+    writes = [Write(op="delete", doc_ref=doc_ref)
+              for doc_ref in ["a", "b", "fail", "c", "d"]]
+    failures = batch.bulk_commit(writes, max_workers=2)
+    assert [i for i, _ in failures] == [2, 3]
+    assert all(isinstance(e, RuntimeError) for _, e in failures)
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks import run
+from benchmarks.cases import BENCHMARKS
+from firestore_odm.context import Context as CTX
+from firestore_odm.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def restore_context(monkeypatch):
+    for attr in ("db", "adb", "backend"):
+        monkeypatch.setattr(CTX, attr, getattr(CTX, attr))
+
+
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_benchmark_case(restore_context, name):
+    result = run.run_case(name, min_time=0.001, repeat=1)
+    assert result.ops_per_sec > 0
+    assert result.peak_bytes >= 0
+
+
+def test_compare():
+    result = run.Result(name="export_flat", ops_per_sec=70,
+                        peak_bytes=100)
+    baseline = {"export_flat": {"ops_per_sec": 100, "peak_bytes": 100}}
+    assert run.compare(result, baseline, tolerance=0.2) == \
+        (pytest.approx(0.7), True)
+    assert run.compare(result, baseline, tolerance=0.4)[1] is False
+    assert run.compare(result, dict(), tolerance=0.2) == (None, False)
+
+
+def test_models_declared_lazily():
+    from benchmarks import models
+
+    # Importing the cases does not register models
+    code = ("import benchmarks.cases\n"
+            "from firestore_odm.model_registry import ModelRegistry\n"
+            "assert ModelRegistry.get_cls_from_name('BenchCity') is None\n")
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    assert models.get_model("BenchCity") is \
+        ModelRegistry.get_cls_from_name("BenchCity")
+    assert issubclass(models.get_model("BenchTouristCity"),
+                      models.get_model("BenchCity"))
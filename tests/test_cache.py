@@ -0,0 +1,109 @@
+from unittest import mock
+
+from firestore_odm.cache import DocumentCache, NOT_CACHED
+from .city_fixtures import City
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_lru_eviction():
+    cache = DocumentCache(max_size=2)
+    cache.set("City/SF", {"a": 1})
+    cache.set("City/LA", {"a": 2})
+    assert cache.get("City/SF") == {"a": 1}
+    cache.set("City/DC", {"a": 3})
+
+    assert cache.get("City/LA") is NOT_CACHED
+    assert cache.get("City/SF") == {"a": 1}
+    assert cache.get("City/DC") == {"a": 3}
+    assert len(cache) == 2
+
+
+def test_cache_ttl():
+    clock = FakeClock()
+    cache = DocumentCache(ttl=10, negative_ttl=1, clock=clock)
+    cache.set("City/SF", {"a": 1})
+    cache.set_missing("City/LA")
+    assert cache.get("City/LA") is None
+
+    clock.now = 5
+    assert cache.get("City/SF") == {"a": 1}
+    assert cache.get("City/LA") is NOT_CACHED
+
+    clock.now = 10
+    assert cache.get("City/SF") is NOT_CACHED
+    assert len(cache) == 0
+
+
+def test_cache_returns_copies():
+    cache = DocumentCache()
+    d = {"regions": ["west_coast"], "nested": {"a": 1}}
+    cache.set("City/SF", d)
+    d["regions"].append("socal")
+
+    cached = cache.get("City/SF")
+    assert cached == {"regions": ["west_coast"], "nested": {"a": 1}}
+    cached["nested"]["a"] = 2
+    assert cache.get("City/SF")["nested"] == {"a": 1}
+
+
+def test_cache_invalidate():
+    cache = DocumentCache()
+    cache.set("City/SF", {"a": 1})
+    cache.set("City/LA", {"a": 2})
+    cache.invalidate("City/SF")
+    assert cache.get("City/SF") is NOT_CACHED
+    cache.clear()
+    assert cache.get("City/LA") is NOT_CACHED
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def _doc_ref(path, d):
+    snapshot = mock.MagicMock(exists=d is not None)
+    snapshot.to_dict.return_value = d
+    doc_ref = mock.MagicMock(path=path)
+    doc_ref.get.return_value = snapshot
+    snapshot.reference = doc_ref
+    return doc_ref
+
+
+def test_get_reads_through_cache(monkeypatch):
+    monkeypatch.setattr(City, "_cache", DocumentCache())
+    d = {"cityName": "San Francisco", "obj_type": "City"}
+    doc_ref = _doc_ref("City/SF", d)
+
+    assert City.get(doc_ref=doc_ref).city_name == "San Francisco"
+    assert City.get(doc_ref=doc_ref).city_name == "San Francisco"
+    assert doc_ref.get.call_count == 1
+
+    missing_ref = _doc_ref("City/XX", None)
+    assert City.get(doc_ref=missing_ref) is None
+    assert City.get(doc_ref=missing_ref) is None
+    assert missing_ref.get.call_count == 1
+
+
+def test_save_and_delete_write_through(monkeypatch):
+    monkeypatch.setattr(City, "_cache", DocumentCache())
+    doc_ref = _doc_ref("City/SF", None)
+    city = City.from_dict(
+        d={"cityName": "San Francisco", "country": "USA", "capital": False,
+           "obj_type": "City"},
+        doc_ref=doc_ref)
+
+    city.save()
+    assert City.get(doc_ref=doc_ref).city_name == "San Francisco"
+    doc_ref.get.assert_not_called()
+
+    city.save(transaction=mock.MagicMock())
+    assert City._cache.get("City/SF") is NOT_CACHED
+
+    city.delete()
+    assert City.get(doc_ref=doc_ref) is None
+    doc_ref.get.assert_not_called()
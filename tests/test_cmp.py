@@ -44,6 +44,20 @@ class MyTestCase(unittest.TestCase):
         assert b.constraints == [("_in", "user_k")]
         assert b.fieldname == "friends"
 
+    def test_is_in(self):
+        a = cmp.CMP().country
+        b = a.is_in(["USA", "Japan"])
+        assert isinstance(b, cmp.Condition)
+        assert b.constraints == [("in", ["USA", "Japan"])]
+
+    def test_any(self):
+        c = cmp.CMP()
+        d = c.any(c.country == "USA", [c.capital == True, c.size > 5])
+        assert isinstance(d, cmp.Disjunction)
+        assert len(d.branches) == 2
+        assert [cond.fieldname for cond in d.branches[1]] == \
+            ["capital", "size"]
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,14 @@
+import pytest
+
 from firestore_odm import config
 from firestore_odm import context
+from .fixtures import USE_MEMORY_BACKEND
 
 
 Config = config.Config
 
+@pytest.mark.skipif(USE_MEMORY_BACKEND,
+                    reason="the in-memory backend has no firebase app")
 def test_firebase_app_context():
     config = Config(
         app_name="flask-boiler-testing",
@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+from firestore_odm import fanout
+from firestore_odm.fanout import FanoutQuery, split_filters
+
+
+def test_split_filters(monkeypatch):
+    monkeypatch.setattr(fanout, "IN_QUERY_LIMIT", 2)
+
+    filters = [("country", "==", "USA"), ("cityName", "in", [1, 2, 3])]
+    assert split_filters(filters) == [
+        [("country", "==", "USA"), ("cityName", "in", [1, 2])],
+        [("country", "==", "USA"), ("cityName", "in", [3])],
+    ]
+
+    filters = [("cityName", "in", [1, 2])]
+    assert split_filters(filters) == [filters]
+
+
+Reference = namedtuple("Reference", ["path"])
+
+
+class Snapshot:
+
+    def __init__(self, path, d):
+        self.reference = Reference(path=path)
+        self.d = d
+
+    def get(self, field_path):
+        return self.d[field_path]
+
+
+class Stream:
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def stream(self):
+        return iter(self.snapshots)
+
+
+def test_fanout_query_merge():
+    a = [Snapshot("C/a", {"p": 1}), Snapshot("C/c", {"p": 3}),
+         Snapshot("C/e", {"p": 5})]
+    b = [Snapshot("C/b", {"p": 2}), Snapshot("C/c", {"p": 3}),
+         Snapshot("C/d", {"p": 4})]
+
+    query = FanoutQuery([Stream(a), Stream(b)], order_by=["p"])
+    assert [s.reference.path for s in query.stream()] == \
+        ["C/a", "C/b", "C/c", "C/d", "C/e"]
+
+    query = FanoutQuery([Stream(a[::-1]), Stream(b[::-1])], order_by=["p"],
+                        descending=True, offset=1, limit=2)
+    assert [s.reference.path for s in query.stream()] == ["C/d", "C/c"]
+
+
+def test_fanout_query_merge_by_path():
+    a = [Snapshot("C/a", {}), Snapshot("C/d", {}), Snapshot("C/e", {})]
+    b = [Snapshot("C/b", {}), Snapshot("C/c", {}), Snapshot("C/d", {})]
+
+    # Without order_by, sub-queries are ordered by document path
+    query = FanoutQuery([Stream(a), Stream(b)])
+    assert [s.reference.path for s in query.stream()] == \
+        ["C/a", "C/b", "C/c", "C/d", "C/e"]
+
+    query = FanoutQuery([Stream(a), Stream(b)], offset=1, limit=2)
+    assert [s.reference.path for s in query.stream()] == ["C/b", "C/c"]
+
+
+def test_implicit_order():
+    assert fanout.implicit_order([("a", "==", 1), ("b", ">", 2),
+                                  ("c", "<", 3)]) == ["b"]
+    assert fanout.implicit_order([("a", "in", [1, 2])]) == []
+
+
+class EndlessStream:
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.count = 0
+
+    def stream(self):
+        while True:
+            self.count += 1
+            yield Snapshot("C/{}{}".format(self.prefix, self.count),
+                           {"p": self.count})
+
+
+def test_fanout_query_stops_at_limit():
+    a, b = EndlessStream("a"), EndlessStream("b")
+
+    query = FanoutQuery([a, b], order_by=["p"], limit=4)
+    res = [s.d["p"] for s in query.stream()]
+    assert res == [1, 1, 2, 2]
+
+    query = FanoutQuery([a, b], limit=3)
+    assert len(list(query.stream())) == 3
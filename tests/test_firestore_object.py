@@ -2,20 +2,14 @@ import pytest
 from testfixtures import compare
 
 from firestore_odm import schema, fields
-from firestore_odm.context import Context as CTX
-from firestore_odm.config import Config
 from firestore_odm.firestore_object import FirestoreObject, \
     FirestoreObjectClsFactory
 from firestore_odm.primary_object import PrimaryObject
+from .fixtures import read_test_context, USE_MEMORY_BACKEND
 
-config = Config(
-    app_name="flask-boiler-testing",
-    debug=True,
-    testing=True,
-    certificate_filename="flask-boiler-testing-firebase-adminsdk-4m0ec-7505aaef8d.json"
-)
-CTX.read(config)
-assert CTX.firebase_app.project_id == "flask-boiler-testing"
+CTX = read_test_context()
+if not USE_MEMORY_BACKEND:
+    assert CTX.firebase_app.project_id == "flask-boiler-testing"
 
 
 # Creates a schema for serializing and deserializing to firestore database
@@ -185,3 +179,273 @@ def test_stream_objects():
 
     for obj in TestObject.all():
         obj.delete()
+
+
+def test_prefetch_relationship():
+    setup_object(doc_id="testObjId4")
+
+    class PrefetchMasterSchema(schema.Schema):
+        nested_ref = fields.Relationship(nested=False)
+
+    PrefetchMaster = FirestoreObjectClsFactory.create(
+        name="PrefetchMaster",
+        schema=PrefetchMasterSchema,
+        base=PrimaryObject
+    )
+
+    for doc_id in ["prefetchMaster1", "prefetchMaster2"]:
+        master_obj = PrefetchMaster.new(doc_id=doc_id)
+        master_obj.nested_ref = CTX.db.document("TestObject/testObjId4")
+        master_obj.save()
+
+    for obj in PrefetchMaster.all(prefetch=["nested_ref"]):
+        assert "TestObject/testObjId4" in obj._prefetched
+        assert obj._export_as_view_dict()["nestedRef"].items() >= {
+            "intA": 1,
+            "intB": 2,
+        }.items()
+        obj.delete()
+
+    delete_object(doc_id="testObjId4")
+
+
+def test_async_prefetch_relationship():
+    import asyncio
+
+    setup_object(doc_id="testObjId8")
+
+    class AsyncPrefetchMasterSchema(schema.Schema):
+        nested_ref = fields.Relationship(nested=False)
+
+    AsyncPrefetchMaster = FirestoreObjectClsFactory.create(
+        name="AsyncPrefetchMaster",
+        schema=AsyncPrefetchMasterSchema,
+        base=PrimaryObject
+    )
+
+    for doc_id in ["asyncPrefetchMaster1", "asyncPrefetchMaster2"]:
+        master_obj = AsyncPrefetchMaster.new(doc_id=doc_id)
+        master_obj.nested_ref = CTX.db.document("TestObject/testObjId8")
+        master_obj.save()
+
+    async def run():
+        return ([obj async for obj in AsyncPrefetchMaster.awhere(
+                    prefetch=["nested_ref"])],
+                [obj async for obj in AsyncPrefetchMaster.aall(
+                    prefetch=["nested_ref"])])
+
+    for objs in asyncio.run(run()):
+        assert len(objs) == 2
+        for obj in objs:
+            assert "TestObject/testObjId8" in obj._prefetched
+
+    for obj in AsyncPrefetchMaster.all():
+        obj.delete()
+    delete_object(doc_id="testObjId8")
+
+
+def test_prefetch_unknown_attribute():
+
+    class PrefetchCheckSchema(schema.Schema):
+        int_a = fields.Integer()
+        nested_ref = fields.Relationship(nested=False)
+
+    PrefetchCheck = FirestoreObjectClsFactory.create(
+        name="PrefetchCheck",
+        schema=PrefetchCheckSchema,
+        base=PrimaryObject
+    )
+
+    obj = PrefetchCheck.new(doc_id="prefetchCheck1")
+    for attribute in ["nested_rel", "int_a"]:
+        with pytest.raises(ValueError, match=attribute):
+            PrefetchCheck.prefetch_related([obj], attributes=[attribute])
+
+    obj.nested_ref = CTX.db.document("TestObject/testObjId7")
+    obj.save()
+    with pytest.raises(ValueError, match="int_a"):
+        list(PrefetchCheck.all(prefetch=["int_a"]))
+    obj.delete()
+
+
+def test_import_nested_relationships_with_one_read():
+
+    class NestedGetMasterSchema(schema.Schema):
+        nested_objs = fields.Relationship(nested=True, many=True)
+
+    NestedGetMaster = FirestoreObjectClsFactory.create(
+        name="NestedGetMaster",
+        schema=NestedGetMasterSchema,
+        base=PrimaryObject
+    )
+
+    doc_ids = ["testObjNestedGet{}".format(i) for i in range(3)]
+    for i, doc_id in enumerate(doc_ids):
+        TestObject.new(doc_id=doc_id, int_a=i, int_b=0).save()
+    d = {"obj_type": "NestedGetMaster",
+         "nestedObjs": [CTX.db.document("TestObject/" + doc_id)
+                        for doc_id in doc_ids]}
+
+    if USE_MEMORY_BACKEND:
+        CTX.backend.reset_counts()
+    obj = NestedGetMaster.from_dict(d, to_get=True, doc_id="nestedGet1")
+    assert [elem["intA"] for elem in obj.nested_objs] == [0, 1, 2]
+    if USE_MEMORY_BACKEND:
+        # Read with one multi-get rather than a get for each reference
+        assert dict(CTX.backend.rpc_counts) == {"get_all": 1}
+
+    for doc_id in doc_ids:
+        delete_object(doc_id=doc_id)
+
+
+def test_relationship_nested_graph_save():
+    referenced_obj = TestObject.new(doc_id="testObjId5")
+    referenced_obj.int_a = 1
+    referenced_obj.int_b = 2
+
+    class GraphMasterSchema(schema.Schema):
+        nested_obj = fields.Relationship(nested=True)
+        nested_objs = fields.Relationship(nested=True, many=True)
+
+    GraphMaster = FirestoreObjectClsFactory.create(
+        name="GraphMaster",
+        schema=GraphMasterSchema,
+        base=PrimaryObject
+    )
+
+    master_obj = GraphMaster.new(doc_id="graphMaster1")
+    # The same object is saved once
+    master_obj.nested_obj = referenced_obj
+    master_obj.nested_objs = [referenced_obj]
+
+    master_obj.save(graph=True)
+
+    assert CTX.db.document("TestObject/testObjId5").get().to_dict() == \
+           {
+               "intA": 1,
+               "intB": 2,
+               "obj_type": "TestObject",
+               'doc_id': 'testObjId5',
+               'doc_ref': "TestObject/testObjId5"
+           }
+    assert CTX.db.document("GraphMaster/graphMaster1").get().to_dict()[
+               "nestedObjs"] == [referenced_obj.doc_ref]
+
+    master_obj.delete()
+    CTX.db.document("TestObject/testObjId5").delete()
+
+
+def test_save_many():
+    objs = [TestObject.new(doc_id="testObjMany{}".format(i), int_a=i)
+            for i in range(3)]
+
+    TestObject.save_many(objs)
+    assert CTX.db.document("TestObject/testObjMany2").get().to_dict()[
+               "intA"] == 2
+
+    TestObject.delete_many(["testObjMany0", objs[1], objs[2].doc_ref])
+    assert not CTX.db.document("TestObject/testObjMany2").get().exists
+
+
+def test_async_api():
+    import asyncio
+
+    async def run():
+        obj = TestObject.new(doc_id="testObjAsync1", int_a=1, int_b=2)
+        await obj.asave()
+
+        res = await TestObject.aget(doc_id="testObjAsync1")
+        assert isinstance(res.doc_ref, type(obj.doc_ref))
+        assert res.int_a == 1
+
+        doc_ids = [o.doc_id async for o in TestObject.awhere(int_a=1)]
+        assert "testObjAsync1" in doc_ids
+
+        await res.adelete()
+        assert await TestObject.aget(doc_id="testObjAsync1") is None
+
+    asyncio.run(run())
+
+
+def test_async_graph_save():
+    import asyncio
+
+    class AsyncGraphMasterSchema(schema.Schema):
+        nested_obj = fields.Relationship(nested=True)
+
+    AsyncGraphMaster = FirestoreObjectClsFactory.create(
+        name="AsyncGraphMaster",
+        schema=AsyncGraphMasterSchema,
+        base=PrimaryObject
+    )
+
+    async def run():
+        referenced_obj = TestObject.new(doc_id="testObjAsync2", int_a=1)
+        master_obj = AsyncGraphMaster.new(doc_id="asyncGraphMaster1")
+        master_obj.nested_obj = referenced_obj
+
+        # As with save, nested objects are saved with a separate write
+        await master_obj.asave()
+        assert CTX.db.document("TestObject/testObjAsync2").get().to_dict()[
+                   "intA"] == 1
+
+        # and with partial, only when the relationship field is changed
+        referenced_obj.int_a = 2
+        await master_obj.asave(partial=True)
+        assert CTX.db.document("TestObject/testObjAsync2").get().to_dict()[
+                   "intA"] == 1
+
+        await master_obj.asave(partial=True, graph=True)
+        assert CTX.db.document("TestObject/testObjAsync2").get().to_dict()[
+                   "intA"] == 2
+
+        await master_obj.adelete()
+        await referenced_obj.adelete()
+
+    asyncio.run(run())
+
+
+def test_slots():
+    setup_object(doc_id="testObjId6")
+
+    class SlottedObjectSchema(schema.Schema):
+        int_a = fields.Integer()
+        int_b = fields.Integer()
+        nested_ref = fields.Relationship(nested=False)
+
+    class SlottedObject(PrimaryObject):
+        class Meta:
+            schema_cls = SlottedObjectSchema
+            slots = True
+
+    assert set(SlottedObject.__slots__) >= {
+        "int_a", "int_b", "nested_ref",
+        "_changed_fields", "_prefetched", "_loaded_fields"}
+
+    obj = SlottedObject.new(doc_id="slottedObj1", int_a=1, int_b=2)
+    assert not hasattr(obj, "__dict__")
+    obj.nested_ref = CTX.db.document("TestObject/testObjId6")
+    obj.save()
+
+    retrieved_obj = SlottedObject.get(doc_id="slottedObj1")
+    assert not hasattr(retrieved_obj, "__dict__")
+    assert (retrieved_obj.int_a, retrieved_obj.int_b) == (1, 2)
+    assert retrieved_obj._changed_fields == set()
+
+    # Only the changed field is sent with a partial save
+    retrieved_obj.int_b = 3
+    assert retrieved_obj._changed_fields == {"int_b"}
+    assert retrieved_obj._get_field_updates(to_save=True) == {"intB": 3}
+    CTX.db.document("SlottedObject/slottedObj1").update({"intA": 5})
+    retrieved_obj.save(partial=True)
+    assert retrieved_obj._changed_fields == set()
+    assert CTX.db.document("SlottedObject/slottedObj1").get().to_dict()[
+               "intA"] == 5
+    assert SlottedObject.get(doc_id="slottedObj1").int_b == 3
+
+    SlottedObject.prefetch_related([retrieved_obj],
+                                   attributes=["nested_ref"])
+    assert "TestObject/testObjId6" in retrieved_obj._prefetched
+
+    retrieved_obj.delete()
+    delete_object(doc_id="testObjId6")
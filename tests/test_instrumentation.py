@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+
+from firestore_odm.context import Context as CTX
+from firestore_odm.instrumentation import Aggregator, Event, \
+    to_prometheus_text
+from firestore_odm.memory import MemoryBackend
+from .city_fixtures import City
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    for attr in ("db", "adb", "backend", "hooks"):
+        monkeypatch.setattr(CTX, attr, getattr(CTX, attr))
+    CTX.use_backend(MemoryBackend())
+
+
+@pytest.fixture
+def events(memory):
+    events = list()
+    CTX.add_hook(events.append)
+    return events
+
+
+def _new_city(doc_id):
+    return City.new(doc_id=doc_id, city_name=doc_id, country="USA",
+                    capital=False)
+
+
+def _ops(events):
+    return [(event.model_cls, event.op, event.count) for event in events]
+
+
+def test_no_hooks(memory):
+    assert CTX.hooks == ()
+    _new_city("SF").save()
+    assert City.get(doc_id="SF").city_name == "SF"
+
+
+def test_add_and_remove_hook(memory):
+    events = list()
+    hook = CTX.add_hook(events.append)
+    _new_city("SF").save()
+    CTX.remove_hook(hook)
+    _new_city("LA").save()
+    assert [event.op for event in events] == ["export", "save"]
+
+
+def test_get_save_delete(events):
+    sf = _new_city("SF")
+    sf.save()
+    City.get(doc_id="SF")
+    City.get(doc_id="LA")
+    sf.delete()
+    # Documents read are counted by the read, not again by hydrate
+    assert _ops(events) == [
+        (City, "export", 1), (City, "save", 1),
+        (City, "hydrate", 0), (City, "get", 1),
+        (City, "hydrate", 0), (City, "get", 0),
+        (City, "delete", 1),
+    ]
+    save = events[1]
+    assert save.bytes > events[0].bytes > 0
+    assert events[3].bytes > 0
+    assert all(event.duration >= 0 and not event.error
+               for event in events)
+
+
+def test_read_counted_once(events, monkeypatch):
+    from google.cloud.firestore import DocumentSnapshot
+    from firestore_odm.utils import snapshot_to_obj
+
+    _new_city("SF").save()
+    to_dict = DocumentSnapshot.to_dict
+    calls = list()
+
+    def counted_to_dict(snapshot):
+        calls.append(snapshot.reference.path)
+        return to_dict(snapshot)
+
+    monkeypatch.setattr(DocumentSnapshot, "to_dict", counted_to_dict)
+    del events[:]
+    City.get(doc_id="SF")
+    list(City.where(country="USA"))
+    assert calls == ["City/SF", "City/SF"]
+    assert [(op, count) for _, op, count in _ops(events)] == [
+        ("hydrate", 0), ("get", 1), ("hydrate", 0), ("query", 1)]
+
+    # Hydration outside of a read counts the document
+    del events[:]
+    snapshot_to_obj(CTX.db.document("City/SF").get(), super_cls=City)
+    assert _ops(events) == [(City, "hydrate", 1)]
+
+
+def test_unit_of_work(events):
+    from firestore_odm.unit_of_work import UnitOfWork
+
+    dc = _new_city("DC")
+    dc.save()
+    del events[:]
+
+    with UnitOfWork():
+        _new_city("SF").save()
+        _new_city("LA").save()
+        dc.delete()
+    # Registered calls write nothing; the writes are reported on flush
+    assert [(model_cls, op, count) for model_cls, op, count in _ops(events)
+            if op in ("save", "delete")] == [
+        (City, "save", 0), (City, "save", 0), (City, "delete", 0),
+        (City, "save", 2), (City, "delete", 1),
+    ]
+    assert events[-2].bytes > 0 and events[-1].bytes > 0
+
+
+def test_query(events):
+    City.save_many([_new_city("SF"), _new_city("LA")])
+    del events[:]
+
+    res = City.where(country="USA")
+    assert events == []
+    assert len(list(res)) == 2
+    assert _ops(events)[-1] == (City, "query", 2)
+
+    del events[:]
+    res = City.where(country="USA")
+    next(res)
+    res.close()
+    assert _ops(events)[-1] == (City, "query", 1)
+
+
+def test_async(events):
+    async def run():
+        sf = _new_city("SF")
+        await sf.asave()
+        await City.aget(doc_id="SF")
+        objs = [obj async for obj in City.awhere(country="USA")]
+        await sf.adelete()
+        return objs
+
+    assert len(asyncio.run(run())) == 1
+    assert [op for _, op, _ in _ops(events) if op not in
+            ("export", "hydrate")] == ["save", "get", "query", "delete"]
+
+
+def test_error(events, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ValueError
+
+    monkeypatch.setattr(type(CTX.db.document("City/SF")), "get", fail)
+    with pytest.raises(ValueError):
+        City.get(doc_id="SF")
+    assert events[-1].op == "get"
+    assert events[-1].error
+
+
+def test_failing_hook_is_logged(memory, caplog):
+    def fail(event):
+        raise ValueError
+
+    CTX.add_hook(fail)
+    _new_city("SF").save()
+    assert "Error in instrumentation hook" in caplog.text
+
+
+def test_aggregator_and_prometheus_text():
+    aggregator = Aggregator(buckets=(0.01, 0.1))
+    aggregator(Event(model_cls=City, op="get", duration=0.005, count=1,
+                     bytes=100))
+    aggregator(Event(model_cls=City, op="get", duration=0.05, count=0,
+                     bytes=0, error=True))
+
+    totals = aggregator.totals()[("City", "get")]
+    assert totals.calls == 2
+    assert totals.errors == 1
+    assert totals.duration == pytest.approx(0.055)
+    assert totals.documents == 1
+    assert totals.bytes == 100
+    assert totals.buckets == (1, 2)
+
+    text = to_prometheus_text(aggregator)
+    assert "# TYPE firestore_odm_operation_duration_seconds histogram" \
+        in text
+    assert 'firestore_odm_operation_duration_seconds_bucket' \
+           '{model="City",op="get",le="0.01"} 1' in text
+    assert 'firestore_odm_operation_duration_seconds_bucket' \
+           '{model="City",op="get",le="+Inf"} 2' in text
+    assert 'firestore_odm_operation_duration_seconds_count' \
+           '{model="City",op="get"} 2' in text
+    assert 'firestore_odm_documents_total{model="City",op="get"} 1' in text
+    assert 'firestore_odm_bytes_total{model="City",op="get"} 100' in text
+    assert 'firestore_odm_operation_errors_total{model="City",op="get"} 1' \
+        in text
+
+    aggregator.reset()
+    assert aggregator.totals() == dict()
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from google.cloud.firestore import DocumentSnapshot
+
+from firestore_odm.cmp import v
+from .city_fixtures import City
+
+
+class FakeQuery:
+    """ Stand-in for a firestore query that emits document changes to
+            its snapshot listener.
+    """
+
+    def __init__(self):
+        self.callback = None
+        self.watch = mock.MagicMock()
+
+    def on_snapshot(self, callback):
+        self.callback = callback
+        return self.watch
+
+    def emit(self, *changes):
+        self.callback([], [SimpleNamespace(type=SimpleNamespace(name=name),
+                                           document=_snapshot(doc_id, d))
+                           for name, doc_id, d in changes], None)
+
+
+def _snapshot(doc_id, d):
+    doc_ref = mock.MagicMock(id=doc_id, path="City/" + doc_id)
+    doc_ref.get.side_effect = AssertionError("read from Firestore")
+    return DocumentSnapshot(doc_ref, d, exists=d is not None,
+                            read_time=None, create_time=None,
+                            update_time=None)
+
+
+def _city(name, country):
+    return {"cityName": name, "country": country, "capital": False,
+            "obj_type": "City"}
+
+
+def test_live_cache(monkeypatch):
+    query = FakeQuery()
+    monkeypatch.setattr(City, "_live_cache", None)
+    monkeypatch.setattr(City, "_get_collection", lambda: query)
+    live_cache = City.live_cache()
+    assert not live_cache.ready
+
+    query.emit(("ADDED", "SF", _city("San Francisco", "USA")),
+               ("ADDED", "LA", _city("Los Angeles", "USA")),
+               ("ADDED", "TOK", _city("Tokyo", "Japan")))
+    sf_ref = _snapshot("SF", None).reference
+    assert City.get(doc_ref=sf_ref).city_name == "San Francisco"
+    assert [city.city_name for city in City.where(v.country == "USA")] \
+        == ["Los Angeles", "San Francisco"]
+
+    query.emit(("MODIFIED", "SF", _city("SF", "USA")),
+               ("REMOVED", "LA", _city("Los Angeles", "USA")))
+    assert City.get(doc_ref=sf_ref).city_name == "SF"
+    assert City.get(doc_ref=_snapshot("LA", None).reference) is None
+    assert [city.city_name for city in City.where(country="USA")] == ["SF"]
+
+    live_cache.close()
+    query.watch.unsubscribe.assert_called_once_with()
+    assert City._live_cache is None
+
+
+def test_live_cache_for_query(monkeypatch):
+    query = FakeQuery()
+    monkeypatch.setattr(City, "_live_cache", None)
+    live_cache = City.live_cache(query=query)
+    query.emit(("ADDED", "SF", _city("San Francisco", "USA")))
+
+    sf_ref = _snapshot("SF", None).reference
+    assert City.get(doc_ref=sf_ref).city_name == "San Francisco"
+    # Documents outside of the query and where are not served from memory
+    la_ref = _snapshot("LA", None).reference
+    la_ref.get.side_effect = None
+    la_ref.get.return_value = _snapshot("LA", None)
+    assert City.get(doc_ref=la_ref) is None
+    la_ref.get.assert_called_once_with()
+    assert live_cache.query([("country", "==", "USA")]) is None
+    live_cache.close()
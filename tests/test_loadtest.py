@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from firestore_odm import loadtest
+from firestore_odm.context import Context as CTX
+from firestore_odm.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def restore_context(monkeypatch):
+    for attr in ("db", "adb", "backend", "config"):
+        monkeypatch.setattr(CTX, attr, getattr(CTX, attr, None))
+
+
+def test_parse_mix():
+    assert loadtest.parse_mix("get=3,save=1") == {"get": 3.0, "save": 1.0}
+    with pytest.raises(ValueError):
+        loadtest.parse_mix("scan=1")
+    with pytest.raises(ValueError):
+        loadtest.parse_mix("get=0")
+
+
+def test_percentile():
+    vals = list(range(1, 101))
+    assert loadtest.percentile(vals, 50) == 50
+    assert loadtest.percentile(vals, 99) == 99
+    assert loadtest.percentile([7], 95) == 7
+    assert loadtest.percentile([], 50) is None
+
+
+@pytest.mark.parametrize("mode", ["threads", "asyncio"])
+def test_main(restore_context, capsys, mode):
+    assert loadtest.main(["--mode", mode, "--operations", "80",
+                          "--workers", "4", "--documents", "20",
+                          "--json"]) == 0
+    results = {stat["op"]: stat
+               for stat in json.loads(capsys.readouterr().out)["results"]}
+    assert results["total"]["count"] == 80
+    assert results["total"]["errors"] == 0
+    assert set(results) == {"get", "get_many", "save", "query", "total"}
+    assert results["get"]["rpcs"] == {"get": results["get"]["count"]}
+    assert results["save"]["rpcs"] == {"commit": results["save"]["count"]}
+
+
+def test_city_cls_declared_lazily():
+    # Importing the module does not register a model
+    code = ("from firestore_odm import loadtest\n"
+            "from firestore_odm.model_registry import ModelRegistry\n"
+            "assert ModelRegistry.get_cls_from_name('LoadTestCity') is None\n")
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    assert loadtest.get_city_cls() is loadtest.get_city_cls()
+    assert ModelRegistry.get_cls_from_name("LoadTestCity") is \
+        loadtest.get_city_cls()
@@ -0,0 +1,248 @@
+import asyncio
+
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+
+from firestore_odm.context import Context as CTX
+from firestore_odm.memory import MemoryBackend
+
+
+@pytest.fixture
+def backend():
+    return MemoryBackend()
+
+
+@pytest.fixture
+def db(backend):
+    return backend.client()
+
+
+def _add_cities(db):
+    cities = db.collection("City")
+    cities.document("SF").set({"name": "San Francisco", "state": "CA",
+                               "population": 860000, "regions": ["west"]})
+    cities.document("LA").set({"name": "Los Angeles", "state": "CA",
+                               "population": 3900000, "regions": ["west"]})
+    cities.document("DC").set({"name": "Washington", "state": None,
+                               "population": 680000, "regions": ["east"]})
+    cities.document("TOK").set({"name": "Tokyo", "country": "Japan",
+                                "population": 9000000})
+    return cities
+
+
+def test_document_get_set_update_delete(db):
+    doc_ref = db.document("City/SF")
+    assert not doc_ref.get().exists
+
+    doc_ref.set({"name": "San Francisco", "info": {"state": "CA"}})
+    doc_ref.update({"info.zip": "94016", "name": firestore.DELETE_FIELD})
+    assert doc_ref.get().to_dict() == {"info": {"state": "CA",
+                                                "zip": "94016"}}
+
+    doc_ref.set({"country": "USA"}, merge=True)
+    assert doc_ref.get().to_dict()["country"] == "USA"
+
+    doc_ref.delete()
+    assert not doc_ref.get().exists
+    with pytest.raises(NotFound):
+        doc_ref.update({"name": "SF"})
+
+
+def test_query(db):
+    cities = _add_cities(db)
+
+    def ids(query):
+        return [snapshot.id for snapshot in query.stream()]
+
+    assert ids(cities) == ["DC", "LA", "SF", "TOK"]
+    assert ids(cities.where("state", "==", "CA")) == ["LA", "SF"]
+    assert ids(cities.where("population", ">", 800000)) == \
+        ["SF", "LA", "TOK"]
+    assert ids(cities.where("regions", "array_contains", "east")) == ["DC"]
+    assert ids(cities.where("state", "in", ["CA", None])) == \
+        ["DC", "LA", "SF"]
+    assert ids(cities.order_by("population", direction="DESCENDING")
+               .limit(2)) == ["TOK", "LA"]
+    assert ids(cities.order_by("population").offset(1).limit(2)) == \
+        ["SF", "LA"]
+    # Documents without the order field are not in results
+    assert ids(cities.order_by("state")) == ["DC", "LA", "SF"]
+
+    sf = db.document("City/SF").get()
+    assert ids(cities.order_by("population").start_after(sf)) == \
+        ["LA", "TOK"]
+    assert ids(cities.order_by("population")
+               .end_before({"population": 3900000})) == ["DC", "SF"]
+
+    selected = list(cities.where("state", "==", "CA").select(["name"])
+                    .stream())
+    assert selected[0].to_dict() == {"name": "Los Angeles"}
+
+
+def test_batch_and_get_all(db, backend):
+    batch = db.batch()
+    batch.set(db.document("City/SF"), {"name": "San Francisco"})
+    batch.set(db.document("City/LA"), {"name": "Los Angeles"})
+    batch.delete(db.document("City/SF"))
+    batch.commit()
+    assert backend.rpc_counts["commit"] == 1
+
+    snapshots = list(db.get_all([db.document("City/SF"),
+                                 db.document("City/LA")]))
+    assert [snapshot.exists for snapshot in snapshots] == [False, True]
+
+    batch = db.batch()
+    batch.set(db.document("City/SF"), {"name": "San Francisco"})
+    batch.update(db.document("City/XX"), {"name": "Nowhere"})
+    with pytest.raises(NotFound):
+        batch.commit()
+    # Batches are atomic
+    assert not db.document("City/SF").get().exists
+
+
+def test_transaction_retries_on_conflict(db):
+    doc_ref = db.document("Counter/a")
+    doc_ref.set({"n": 0})
+    attempts = list()
+
+    @firestore.transactional
+    def increment(transaction):
+        n = doc_ref.get(transaction=transaction).to_dict()["n"]
+        if len(attempts) == 0:
+            # Concurrent write: the first attempt is aborted
+            doc_ref.set({"n": 10})
+        attempts.append(n)
+        transaction.update(doc_ref, {"n": n + 1})
+
+    increment(db.transaction())
+    assert attempts == [0, 10]
+    assert doc_ref.get().to_dict() == {"n": 11}
+
+
+def test_async_transaction_retries_on_conflict(backend):
+    adb = backend.async_client()
+    doc_ref = adb.document("Counter/a")
+    attempts = list()
+
+    @firestore.async_transactional
+    async def increment(transaction):
+        snapshot = await doc_ref.get(transaction=transaction)
+        n = snapshot.to_dict()["n"]
+        if len(attempts) == 0:
+            # Concurrent write: the first attempt is aborted
+            await doc_ref.set({"n": 10})
+        attempts.append(n)
+        transaction.update(doc_ref, {"n": n + 1})
+
+    async def run():
+        await doc_ref.set({"n": 0})
+        await increment(adb.transaction())
+        return (await doc_ref.get()).to_dict()
+
+    assert asyncio.run(run()) == {"n": 11}
+    assert attempts == [0, 10]
+
+
+def test_on_snapshot(db):
+    cities = _add_cities(db)
+    received = list()
+
+    def callback(docs, changes, read_time):
+        received.append([(change.type.name, change.document.id)
+                         for change in changes])
+
+    watch = cities.where("state", "==", "CA").on_snapshot(callback)
+    db.document("City/SF").update({"population": 870000})
+    db.document("City/DC").update({"state": "CA"})
+    db.document("City/LA").delete()
+    db.document("City/TOK").update({"population": 1})
+    watch.unsubscribe()
+    db.document("City/SF").delete()
+
+    assert received == [
+        [("ADDED", "LA"), ("ADDED", "SF")],
+        [("MODIFIED", "SF")],
+        [("ADDED", "DC")],
+        [("REMOVED", "LA")],
+    ]
+
+
+def test_latency_and_rpc_counts():
+    backend = MemoryBackend(latency=lambda: 0.0)
+    db = backend.client()
+    db.document("City/SF").set({"name": "San Francisco"})
+    db.document("City/SF").get()
+    list(db.collection("City").stream())
+    assert dict(backend.rpc_counts) == {"commit": 1, "get": 1,
+                                        "run_query": 1}
+    backend.reset_counts()
+    assert len(backend.rpc_counts) == 0
+
+
+def test_tagged_rpc_counts(backend, db):
+    with backend.tag("save"):
+        db.document("City/SF").set({"name": "San Francisco"})
+    with backend.tag("get"):
+        db.document("City/SF").get()
+    db.document("City/SF").get()
+    assert dict(backend.tagged_rpc_counts) == {("save", "commit"): 1,
+                                               ("get", "get"): 1}
+    assert backend.rpc_counts["get"] == 2
+    backend.reset_counts()
+    assert len(backend.tagged_rpc_counts) == 0
+
+
+def test_async_client(backend):
+    db, adb = backend.client(), backend.async_client()
+
+    async def run():
+        await adb.document("City/SF").set({"name": "San Francisco"})
+        batch = adb.batch()
+        batch.set(adb.document("City/LA"), {"name": "Los Angeles"})
+        await batch.commit()
+        names = [snapshot.to_dict()["name"] async for snapshot
+                 in adb.collection("City").order_by("name").stream()]
+        await adb.document("City/LA").delete()
+        return names
+
+    assert asyncio.run(run()) == ["Los Angeles", "San Francisco"]
+    assert db.document("City/SF").get().exists
+    assert not db.document("City/LA").get().exists
+
+
+def test_context_use_backend(monkeypatch, backend):
+    monkeypatch.setattr(CTX, "db", None)
+    monkeypatch.setattr(CTX, "adb", None)
+    monkeypatch.setattr(CTX, "backend", None)
+    CTX.use_backend(backend)
+    CTX.db.document("City/SF").set({"name": "San Francisco"})
+    assert backend.store.get("City/SF")[0] == {"name": "San Francisco"}
+
+
+def test_async_api_in_transaction(monkeypatch, backend):
+    from .city_fixtures import City
+
+    for attr in ("db", "adb", "backend"):
+        monkeypatch.setattr(CTX, attr, getattr(CTX, attr))
+    CTX.use_backend(backend)
+
+    @firestore.async_transactional
+    async def rename(transaction, doc_id, name):
+        city = await City.aget(doc_id=doc_id, transaction=transaction)
+        city.city_name = name
+        await city.asave(transaction=transaction)
+        other = await City.aget(doc_id="LA", transaction=transaction)
+        await other.adelete(transaction=transaction)
+
+    async def run():
+        for doc_id in ("SF", "LA"):
+            await City.new(doc_id=doc_id, city_name=doc_id, country="USA",
+                           capital=False).asave()
+        backend.reset_counts()
+        await rename(CTX.adb.transaction(), "SF", "San Francisco")
+
+    asyncio.run(run())
+    assert backend.rpc_counts["commit"] == 1
+    assert City.get(doc_id="SF").city_name == "San Francisco"
+    assert City.get(doc_id="LA") is None
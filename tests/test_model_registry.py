@@ -30,3 +30,9 @@ def test_get_children():
     assert RModelSup._get_children() == {RModelA, RModelB}
     assert RModelA._get_parents() == {RModelSup,}
 
+
+
+def test_get_descendants():
+
+    assert RModelSup._get_descendants() == {RModelA, RModelAB, RModelB}
+    assert RModelAB._get_descendants() == set()
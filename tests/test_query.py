@@ -96,3 +96,239 @@ def test_query_with_cmp():
     assert res_dict['San Francisco'] == expected_dict['San Francisco']
     assert res_dict['Los Angeles'] == expected_dict['Los Angeles']
 
+
+@pytest.mark.usefixtures("setup_cities")
+def test_get_many():
+
+    res = City.get_many(doc_ids=["LA", "NOT_A_CITY", "SF", "LA"])
+
+    assert [obj.doc_id if obj is not None else None for obj in res] == \
+        ["LA", None, "SF", "LA"]
+    assert res[0].city_name == "Los Angeles"
+    assert res[2].to_dict()["cityName"] == "San Francisco"
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_query_order_by():
+
+    res = [obj.city_name for obj in
+           City.where(country="USA", order_by="city_name", descending=True)]
+    assert res == ['Washington D.C.', 'San Francisco', 'Los Angeles']
+
+    res = [obj.city_name for obj in
+           City.where(order_by="city_name",
+                      start_after={"city_name": "Los Angeles"},
+                      limit=2)]
+    assert res == ['San Francisco', 'Tokyo']
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_paginate():
+
+    pages = list(City.paginate(page_size=2, order_by="city_name"))
+    assert [len(page.objs) for page in pages] == [2, 2, 1]
+    assert pages[-1].cursor is None
+
+    names = [obj.city_name for page in pages for obj in page.objs]
+    assert names == sorted(names)
+
+    # Resumes after the first page
+    resumed = list(City.paginate(page_size=2, order_by="city_name",
+                                 cursor=pages[0].cursor))
+    assert [obj.city_name for page in resumed for obj in page.objs] == \
+        names[2:]
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_paginate_offset():
+
+    pages = list(City.paginate(page_size=2, offset=1, order_by="city_name"))
+    names = [obj.city_name for page in pages for obj in page.objs]
+    assert names == ['Los Angeles', 'San Francisco', 'Tokyo',
+                     'Washington D.C.']
+
+    # offset is not applied again when resuming
+    resumed = list(City.paginate(page_size=2, offset=1, order_by="city_name",
+                                 cursor=pages[0].cursor))
+    assert [obj.city_name for page in resumed for obj in page.objs] == \
+        names[2:]
+
+
+def test_page_cursor_round_trip(CTX):
+    from datetime import datetime, timezone
+    from google.cloud.firestore import DocumentSnapshot
+
+    d = {"cityName": "Tokyo", "info": {"founded": datetime(
+        1457, 1, 1, tzinfo=timezone.utc)}, "mayor": CTX.db.document("P/1")}
+    snapshot = DocumentSnapshot(
+        CTX.db.document("City/TOK"), d, exists=True,
+        read_time=None, create_time=None, update_time=None)
+    cursor = City._encode_page_cursor(
+        snapshot, ["cityName", "info.founded", "mayor"])
+
+    decoded = City._decode_page_cursor(cursor)
+    assert decoded.reference.path == "City/TOK"
+    assert decoded.to_dict() == d
+
+    with pytest.raises(ValueError):
+        City._decode_page_cursor("not a cursor")
+
+
+def test_paginate_rejects_page_options():
+    for key in ("limit", "start_at", "start_after"):
+        with pytest.raises(ValueError):
+            City.paginate(page_size=2, **{key: 1})
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_paginate_resumes_after_deleted_document(CTX):
+
+    pages = list(City.paginate(page_size=2, order_by="city_name"))
+    last = pages[0].objs[-1]
+    assert last.city_name == "Los Angeles"
+    last.delete()
+
+    resumed = list(City.paginate(page_size=2, order_by="city_name",
+                                 cursor=pages[0].cursor))
+    assert [obj.city_name for page in resumed for obj in page.objs] == \
+        ['San Francisco', 'Tokyo', 'Washington D.C.']
+
+    # Without order_by, pages are in document path order
+    pages = list(City.paginate(page_size=2))
+    assert [obj.doc_id for obj in pages[0].objs] == ["BJ", "DC"]
+    CTX.db.document("City/DC").delete()
+    resumed = list(City.paginate(page_size=2, cursor=pages[0].cursor))
+    assert [obj.doc_id for page in resumed for obj in page.objs] == \
+        ["SF", "TOK"]
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_query_select(CTX):
+
+    res = {obj.doc_id: obj for obj in
+           City.where(country="USA", select=["city_name"])}
+    sf = res["SF"]
+    assert sf.city_name == "San Francisco"
+    assert sf.loaded_fields == {"city_name", "obj_type"}
+
+    # Saving a partial object keeps the fields that are not loaded
+    sf.city_name = "SF"
+    sf.save()
+    d = CTX.db.document("City/SF").get().to_dict()
+    assert d["cityName"] == "SF"
+    assert d["regions"] == ['west_coast', 'norcal']
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_prepared_query():
+    from firestore_odm.cmp import Param
+
+    q = City.prepare(v.country == Param("country"),
+                     order_by="city_name", limit=Param("n"))
+
+    res = [obj.city_name for obj in q.run(country="USA", n=2)]
+    assert res == ['Los Angeles', 'San Francisco']
+
+    res = [obj.city_name for obj in q.run(country="Japan", n=2)]
+    assert res == ['Tokyo']
+
+    with pytest.raises(ValueError):
+        list(q.run(country="USA"))
+
+    # select is bound like the other options
+    q = City.prepare(v.country == "USA", select=Param("select"))
+    for select in [["city_name"], ["country"]]:
+        objs = list(q.run(select=select))
+        assert len(objs) == 3
+        assert all(obj.loaded_fields == {*select, "obj_type"}
+                   for obj in objs)
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_query_in_fanout(monkeypatch):
+    from firestore_odm import fanout
+    monkeypatch.setattr(fanout, "IN_QUERY_LIMIT", 2)
+
+    res = [obj.city_name for obj in City.where(
+        v.city_name.is_in(["San Francisco", "Los Angeles", "Tokyo",
+                           "Washington D.C.", "Atlantis"]),
+        order_by="city_name", limit=3)]
+    assert res == ['Los Angeles', 'San Francisco', 'Tokyo']
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_paginate_in_fanout_without_order_by(monkeypatch):
+    from firestore_odm import fanout
+    monkeypatch.setattr(fanout, "IN_QUERY_LIMIT", 2)
+
+    names = ["Tokyo", "San Francisco", "Beijing", "Los Angeles",
+             "Washington D.C.", "Atlantis"]
+    pages = list(City.paginate(v.city_name.is_in(names), page_size=2))
+    res = [obj.doc_id for page in pages for obj in page.objs]
+    assert res == sorted(["BJ", "DC", "LA", "SF", "TOK"])
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_query_any():
+
+    res = [obj.city_name for obj in City.where(
+        v.any(v.country == "Japan", v.city_name == "Beijing",
+              v.country == "China"),
+        order_by="city_name")]
+    assert res == ['Beijing', 'Tokyo']
+
+
+@pytest.mark.usefixtures("setup_cities")
+def test_query_any_single_branch():
+
+    res = [obj.city_name for obj in City.where(v.any(v.country == "Japan"))]
+    assert res == ['Tokyo']
+
+    res = [obj.city_name for obj in City.where(
+        v.country == "USA", v.any([v.capital == False, v.city_state == "CA"]),
+        order_by="city_name")]
+    assert res == ['Los Angeles', 'San Francisco']
+
+    res = [obj.city_name for obj in City.where(
+        v.capital == True, v.any(v.country == "USA"))]
+    assert res == ['Washington D.C.']
+
+
+def test_where_query_filters():
+    from firestore_odm.query_mixin import _FilterRecorder
+
+    condition = v.country == "USA"
+    recorder = City._where_query(condition, "capital", "==", True,
+                                 city_state="CA",
+                                 cur_where=_FilterRecorder())
+
+    assert recorder.filters == [
+        ("country", "==", "USA"),
+        ("capital", "==", True),
+        ("cityState", "==", "CA"),
+    ]
+    # Partitioning the arguments does not add constraints
+    assert condition.constraints == [("==", "USA")]
+
+
+def test_union_schema_cached():
+    from firestore_odm import fields
+    from firestore_odm.schema import Schema
+    from .city_fixtures import DomainModel
+
+    union_schema = DomainModel.get_schema_cls()
+    assert DomainModel.get_schema_cls() is union_schema
+    assert union_schema.f("city_state") == "cityState"
+
+    class CapitalCitySchema(Schema):
+        city_name = fields.Raw()
+        mayor = fields.Raw()
+
+    class CapitalCity(DomainModel):
+        class Meta:
+            schema_cls = CapitalCitySchema
+
+    # Registering a subclass invalidates the union
+    updated_schema = DomainModel.get_schema_cls()
+    assert updated_schema is not union_schema
+    assert {"city_state", "mayor"} <= set(updated_schema().fields.keys())
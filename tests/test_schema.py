@@ -304,3 +304,21 @@ def test_property_get_error_handling():
     """
     with pytest.raises(AttributeError):
         city.non_existent_property
+
+
+def test_key_mappings():
+
+    class MappedCitySchema(Schema):
+        city_name = fields.Raw(data_key="name")
+        city_state = fields.Raw()
+
+    assert MappedCitySchema.f("city_name") == "name"
+    assert MappedCitySchema.f("city_state") == "cityState"
+    assert MappedCitySchema.g("name") == "city_name"
+    assert MappedCitySchema.g("cityState") == "city_state"
+
+    # Falls back to naming convention for names not bound to a field
+    assert MappedCitySchema.f("population_total") == "populationTotal"
+    assert MappedCitySchema.g("populationTotal") == "population_total"
+
+    assert MappedCitySchema._f_mapping["city_name"] == "name"
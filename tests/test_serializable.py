@@ -7,6 +7,7 @@ import json
 
 import pytest as pytest
 from functools import lru_cache
+from marshmallow import ValidationError
 
 from firestore_odm import factory, serializable
 from firestore_odm import schema, fields
@@ -367,3 +368,242 @@ def test_embedded_many_with_dict():
     amur_leopard_deserialized = EndangeredSpecies.from_dict(d)
 
     assert amur_leopard_deserialized.to_dict() == d
+
+
+def test_export_plan_compiled_at_class_creation():
+
+    class PlanTargetSchema(schema.Schema):
+        earliest = fields.Integer()
+        tags = fields.Raw()
+
+    class PlanTarget(serializable.Serializable):
+        _schema_cls = PlanTargetSchema
+
+    class PlanHolderSchema(schema.Schema):
+        targets = fields.Embedded(many=True)
+        primary = fields.Embedded()
+
+    class PlanHolder(serializable.Serializable):
+        _schema_cls = PlanHolderSchema
+
+    assert "_export_plan" in PlanTarget.__dict__
+    assert "_export_plan" in PlanHolder.__dict__
+
+    holder = PlanHolder.new(
+        targets=[PlanTarget.new(earliest=1, tags=["a"])],
+        primary=PlanTarget.new(earliest=2, tags={"b": 1})
+    )
+
+    # Compares with dumping through the schema and walking every value
+    d = holder.schema_obj.dump(holder)
+    expected = {key: holder._export_val(val) for key, val in d.items()}
+
+    assert holder._export_as_dict() == expected == {
+        "obj_type": "PlanHolder",
+        "targets": [
+            {"obj_type": "PlanTarget", "earliest": 1, "tags": ["a"]}
+        ],
+        "primary": {"obj_type": "PlanTarget", "earliest": 2, "tags": {"b": 1}},
+    }
+
+
+def test_schema_obj_not_shared_with_subclass():
+
+    class ParentPSchema(schema.Schema):
+        int_a = fields.Integer()
+
+    class ChildPSchema(ParentPSchema):
+        int_b = fields.Integer()
+
+    class ParentP(serializable.Serializable):
+        _schema_cls = ParentPSchema
+
+    class ChildP(ParentP):
+        _schema_cls = ChildPSchema
+
+    assert isinstance(ParentP.get_schema_obj(), ParentPSchema)
+    assert isinstance(ChildP.get_schema_obj(), ChildPSchema)
+    assert ChildP.new(int_a=1, int_b=2).to_dict() == {
+        "obj_type": "ChildP",
+        "intA": 1,
+        "intB": 2,
+    }
+
+
+def test_import_plan_matches_schema_load(ModelA):
+
+    assert "_import_plan" in ModelA.__dict__
+
+    a = ModelA.new()
+    a._import_properties({
+        "intA": "1",
+        "intB": 2,
+        "unknownKey": 3,
+    })
+
+    # Integer fields still deserialize the value through marshmallow
+    assert a.int_a == 1
+    assert a.int_b == 2
+    assert not hasattr(a, "unknown_key")
+
+    # Errors are the same as loading with the schema
+    with pytest.raises(ValidationError) as excinfo:
+        a._import_properties({"intA": "not an integer"})
+    assert excinfo.value.messages == {"intA": ["Not a valid integer."]}
+
+
+def test_construction_plan(ModelA):
+
+    a = ModelA.new(int_a=5)
+    assert a.int_a == 5
+    assert a.int_b == 0
+
+    plan = ModelA._get_construction_plan()
+    assert plan is ModelA._get_construction_plan()
+    assert plan.field_keys >= {"int_a", "int_b"}
+
+    with pytest.raises(ValueError):
+        ModelA.new(allow_default=False, int_a=1)
+
+
+def test_construction_and_import_skip_change_tracking(ModelASchema):
+
+    assigned = list()
+
+    class ModelTracked(serializable.Serializable):
+        _schema_cls = ModelASchema
+
+    class ModelSetattr(serializable.Serializable):
+        _schema_cls = ModelASchema
+
+        def __setattr__(self, key, value):
+            assigned.append(key)
+            super().__setattr__(key, value)
+
+    assert serializable._get_untracked_setattr(ModelTracked) \
+        is object.__setattr__
+    assert serializable._get_untracked_setattr(ModelSetattr) is setattr
+
+    obj = ModelTracked.new(int_a=1)
+    assert obj._changed_fields is None
+    obj._import_properties({"intA": 2, "intB": 3})
+    assert (obj.int_a, obj.int_b) == (2, 3)
+    assert obj._changed_fields == set()
+    obj.int_b = 4
+    assert obj._changed_fields == {"int_b"}
+
+    # A model that defines __setattr__ is still called on construction
+    #   and import
+    obj = ModelSetattr.new(int_a=1)
+    assert {"int_a", "int_b"} <= set(assigned)
+    del assigned[:]
+    obj._import_properties({"intA": 2})
+    assert assigned == ["int_a"]
+    assert obj._changed_fields == set()
+
+
+def test_construction_plan_invalidated_by_class_attrs():
+
+    class ModelPropSchema(schema.Schema):
+        int_a = fields.Integer()
+        int_b = fields.Integer()
+
+    class ModelProp(serializable.Serializable):
+        _schema_cls = ModelPropSchema
+
+    class ModelPropChild(ModelProp):
+        pass
+
+    assert ModelProp.new(int_a=1).int_a == 1
+    assert ModelPropChild.new(int_a=1).int_a == 1
+
+    # A property assigned after new was called is not overwritten
+    ModelProp.int_a = property(lambda self: 5)
+    assert ModelProp.new(int_a=1).int_a == 5
+    assert ModelPropChild.new(int_a=1).int_a == 5
+
+    del ModelProp.int_a
+    assert ModelProp.new(int_a=2).int_a == 2
+    assert ModelPropChild.new(int_a=2).int_a == 2
+
+
+def test_construction_plan_mutable_default():
+
+    class ModelListSchema(schema.Schema):
+        items = fields.List()
+
+    class ModelList(serializable.Serializable):
+        _schema_cls = ModelListSchema
+
+    first = ModelList.new()
+    second = ModelList.new()
+    first.items.append(1)
+
+    assert second.items == []
+
+
+def test_slots():
+
+    class SlottedTargetSchema(schema.Schema):
+        earliest = fields.Integer()
+        latest = fields.Integer()
+
+    class SlottedTarget(serializable.Serializable):
+        class Meta:
+            schema_cls = SlottedTargetSchema
+            slots = True
+
+    assert set(SlottedTarget.__slots__) >= {"earliest", "latest"}
+
+    t = SlottedTarget.new(earliest=10)
+    assert not hasattr(t, "__dict__")
+    assert t.earliest == 10
+    assert t.latest == 0
+
+    with pytest.raises(AttributeError):
+        t.not_a_field = 1
+
+    assert t.to_dict() == {
+        "obj_type": "SlottedTarget",
+        "earliest": 10,
+        "latest": 0,
+    }
+
+    u = SlottedTarget.from_dict({"earliest": 1, "latest": 2})
+    assert (u.earliest, u.latest) == (1, 2)
+
+
+def test_export_changes():
+
+    class ChangedTargetSchema(schema.Schema):
+        earliest = fields.Integer()
+        latest = fields.Integer()
+
+    class ChangedTarget(serializable.Serializable):
+        _schema_cls = ChangedTargetSchema
+
+    class ChangedPlanSchema(schema.Schema):
+        target = fields.Embedded()
+        name = fields.Str()
+        size = fields.Integer()
+
+    class ChangedPlan(serializable.Serializable):
+        _schema_cls = ChangedPlanSchema
+
+    # Objects that are not loaded do not track changes
+    p = ChangedPlan.new(target=ChangedTarget.new(earliest=1), name="a")
+    assert set(p._export_changes().keys()) == \
+        {("target",), ("name",), ("size",), ("obj_type",)}
+
+    k = ChangedPlan.from_dict(p.to_dict())
+    assert k._export_changes() == dict()
+
+    k.name = "b"
+    k.target.latest = 20
+    assert k._export_changes() == {
+        ("name",): "b",
+        ("target", "latest"): 20,
+    }
+
+    k._clear_changes()
+    assert k._export_changes() == dict()
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from firestore_odm.context import Context as CTX
+from firestore_odm.session import Session, current_session
+from .city_fixtures import City
+
+
+def _doc_ref(path, d):
+    snapshot = mock.MagicMock(exists=d is not None)
+    snapshot.to_dict.return_value = d
+    doc_ref = mock.MagicMock(path=path)
+    doc_ref.get.return_value = snapshot
+    snapshot.reference = doc_ref
+    return doc_ref
+
+
+def _city(name):
+    return {"cityName": name, "country": "USA", "capital": False,
+            "obj_type": "City"}
+
+
+def test_session_identity_map():
+    doc_ref = _doc_ref("City/SF", _city("San Francisco"))
+    assert City.get(doc_ref=doc_ref) is not City.get(doc_ref=doc_ref)
+
+    with Session() as session:
+        assert current_session() is session
+        a = City.get(doc_ref=doc_ref)
+        b = City.get(doc_ref=doc_ref)
+        assert a is b
+        assert session.get("City/SF") is a
+
+        missing_ref = _doc_ref("City/XX", None)
+        assert City.get(doc_ref=missing_ref) is None
+        assert City.get(doc_ref=missing_ref) is None
+        assert missing_ref.get.call_count == 1
+    assert current_session() is None
+    assert doc_ref.get.call_count == 3
+
+
+def test_session_get_many(monkeypatch):
+    sf_ref = _doc_ref("City/SF", _city("San Francisco"))
+    la_ref = _doc_ref("City/LA", _city("Los Angeles"))
+    db = mock.MagicMock()
+    db.get_all.side_effect = lambda refs, transaction=None: \
+        [doc_ref.get() for doc_ref in refs]
+    monkeypatch.setattr(CTX, "db", db)
+
+    with Session():
+        sf = City.get(doc_ref=sf_ref)
+        objs = City.get_many(doc_refs=[sf_ref, la_ref])
+        assert objs[0] is sf
+        assert City.get(doc_ref=la_ref) is objs[1]
+    db.get_all.assert_called_once_with([la_ref], transaction=None)
+
+
+def test_session_save_and_delete():
+    doc_ref = _doc_ref("City/SF", None)
+    with Session() as session:
+        city = City.from_dict(d=_city("San Francisco"), doc_ref=doc_ref)
+        city.save()
+        assert City.get(doc_ref=doc_ref) is city
+
+        city.delete()
+        assert "City/SF" in session
+        assert City.get(doc_ref=doc_ref) is None
+        doc_ref.get.assert_not_called()
+
+
+def test_session_transaction():
+    doc_ref = _doc_ref("City/SF", _city("San Francisco"))
+    with Session() as session:
+        a = City.get(doc_ref=doc_ref)
+        b = City.get(doc_ref=doc_ref, transaction=mock.MagicMock())
+        assert a is not b
+        assert session.get("City/SF") is a
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import pytest
+
+from firestore_odm.context import Context as CTX
+from firestore_odm.unit_of_work import UnitOfWork, current_unit_of_work
+from .city_fixtures import City
+
+
+def _city(doc_id, name):
+    doc_ref = mock.MagicMock(path="City/" + doc_id)
+    return City.from_dict(
+        d={"cityName": name, "country": "USA", "capital": False,
+           "obj_type": "City"},
+        doc_ref=doc_ref)
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    batches = list()
+
+    def new_batch():
+        b = mock.MagicMock()
+        batches.append(b)
+        return b
+
+    monkeypatch.setattr(CTX, "db", mock.MagicMock(batch=new_batch))
+    return batches
+
+
+def test_unit_of_work_coalesces_writes(batches):
+    sf, la, tok = _city("SF", "San Francisco"), _city("LA", "Los Angeles"), \
+        _city("TOK", "Tokyo")
+
+    with UnitOfWork() as unit_of_work:
+        assert current_unit_of_work() is unit_of_work
+        sf.save()
+        sf.city_name = "SF"
+        sf.save()
+        la.save()
+        tok.save()
+        tok.delete()
+        assert len(batches) == 0
+        assert len(unit_of_work) == 3
+    assert current_unit_of_work() is None
+
+    assert len(batches) == 1
+    batch = batches[0]
+    assert batch.set.call_count == 2
+    saved = {call.args[0].path: call.args[1]
+             for call in batch.set.call_args_list}
+    assert saved["City/SF"]["cityName"] == "SF"
+    assert saved["City/LA"]["cityName"] == "Los Angeles"
+    batch.delete.assert_called_once_with(tok.doc_ref)
+    batch.commit.assert_called_once_with()
+    sf.doc_ref.set.assert_not_called()
+
+
+def test_unit_of_work_discards_on_error(batches):
+    sf = _city("SF", "San Francisco")
+    with pytest.raises(RuntimeError):
+        with UnitOfWork():
+            sf.save()
+            raise RuntimeError
+    assert len(batches) == 0
+    assert current_unit_of_work() is None
+
+
+def test_unit_of_work_transaction(batches):
+    sf = _city("SF", "San Francisco")
+    transaction = mock.MagicMock()
+    with UnitOfWork():
+        sf.save(transaction=transaction)
+        sf.delete(transaction=transaction)
+        with pytest.raises(ValueError):
+            sf.save(transaction=mock.MagicMock())
+    assert len(batches) == 0
+    transaction.delete.assert_called_once_with(sf.doc_ref)
+    transaction.set.assert_not_called()
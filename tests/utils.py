@@ -11,11 +11,13 @@ def _delete_all(CTX, collection_name):
     :param collection_name:
     :return:
     """
-    app_name = CTX.firebase_app.name
-    if not app_name.find("testing"):
-        raise Exception("Firebase App Name is {}. "
-                        "Only app name containing testing is supported"
-                        .format(app_name))
+    app_name = CTX.config.APP_NAME
+    if CTX.backend.uses_firebase_app:
+        app_name = CTX.firebase_app.name
+        if not app_name.find("testing"):
+            raise Exception("Firebase App Name is {}. "
+                            "Only app name containing testing is supported"
+                            .format(app_name))
     event_collection: CollectionReference = CTX.db.collection(collection_name)
 
     warnings.warn("Deleting collection: {}, App Name: {}.".format(collection_name, app_name))